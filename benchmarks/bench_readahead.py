@@ -0,0 +1,158 @@
+"""
+Throughput benchmark for plain versus read-ahead batch scans.
+
+Each run scans the whole file through filter_by_timerange. Before every run
+the file is evicted from the page cache so reads hit the storage device.
+With --latency-ms and --bandwidth-mbps every read of the file is slowed
+down to approximate network or spinning storage on a machine with fast disks.
+
+Usage:
+    python benchmarks/bench_readahead.py [--file LOG] [--lines 1000000]
+        [--buffer-size 4M] [--latency-ms 5 --bandwidth-mbps 20] [--runs 3]
+"""
+
+import argparse
+import builtins
+import io
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.parser.parser import filter_by_timerange  # noqa: E402
+from src.utils.utils import parse_size  # noqa: E402
+
+
+def generate_log(path, lines):
+    """Write a synthetic log with the same shape as the sample data."""
+    timestamp = 1704067200
+    with open(path, "w") as f:
+        for _ in range(lines):
+            timestamp += random.randint(0, 3)
+            f.write(
+                f"{timestamp} host{random.randint(1, 1000)} host{random.randint(1, 1000)}\n"
+            )
+
+
+def evict_from_page_cache(path):
+    if hasattr(os, "posix_fadvise"):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+class SimulatedStorage(io.RawIOBase):
+    """
+    Raw file whose every read costs a fixed latency plus transfer time,
+    approximating network or spinning storage on a machine with fast disks.
+    """
+
+    def __init__(self, raw_file, latency, bandwidth):
+        self._file = raw_file
+        self._latency = latency
+        self._bandwidth = bandwidth
+
+    def readable(self):
+        return True
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def readinto(self, buffer):
+        length = self._file.readinto(buffer)
+        transfer = length / self._bandwidth if self._bandwidth else 0.0
+        time.sleep(self._latency + transfer)
+        return length
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def simulated_open(path, latency_ms, bandwidth_mbps):
+    """Return an open() replacement that slows down reads of path only."""
+    real_open = builtins.open
+    latency = latency_ms / 1000
+    bandwidth = bandwidth_mbps * 1024 * 1024
+
+    def fake_open(file, mode="r", buffering=-1, *args, **kwargs):
+        if file != path:
+            return real_open(file, mode, buffering, *args, **kwargs)
+        raw = SimulatedStorage(real_open(path, "rb", buffering=0), latency, bandwidth)
+        if buffering == 0:
+            return raw
+        buffered = io.BufferedReader(raw)
+        if "b" in mode:
+            return buffered
+        return io.TextIOWrapper(buffered)
+
+    return fake_open
+
+
+def time_scan(path, read_ahead, latency_ms, bandwidth_mbps):
+    evict_from_page_cache(path)
+    patcher = None
+    if latency_ms or bandwidth_mbps:
+        patcher = mock.patch(
+            "builtins.open", simulated_open(path, latency_ms, bandwidth_mbps)
+        )
+        patcher.start()
+
+    try:
+        started = time.perf_counter()
+        count = sum(1 for _ in filter_by_timerange(path, read_ahead=read_ahead))
+        elapsed = time.perf_counter() - started
+    finally:
+        if patcher:
+            patcher.stop()
+    return elapsed, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark read-ahead batch scans")
+    parser.add_argument("--file", help="Log file to scan (default: synthetic log)")
+    parser.add_argument("--lines", type=int, default=1_000_000, help="Synthetic log lines")
+    parser.add_argument("--buffer-size", type=parse_size, default=parse_size("4M"))
+    parser.add_argument(
+        "--latency-ms", type=float, default=0.0, help="Simulated latency per read"
+    )
+    parser.add_argument(
+        "--bandwidth-mbps",
+        type=float,
+        default=0.0,
+        help="Simulated storage bandwidth in MB/s",
+    )
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = args.file
+        if not path:
+            path = os.path.join(tmpdir, "synthetic.log")
+            generate_log(path, args.lines)
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+
+        results = {}
+        for name, read_ahead in (("plain", None), ("read-ahead", args.buffer_size)):
+            timings = [
+                time_scan(path, read_ahead, args.latency_ms, args.bandwidth_mbps)[0]
+                for _ in range(args.runs)
+            ]
+            results[name] = statistics.median(timings)
+            print(
+                f"{name:<11} {results[name]:8.2f} s {size_mb / results[name]:8.1f} MB/s"
+            )
+
+    print(f"\nSpeedup: {results['plain'] / results['read-ahead']:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
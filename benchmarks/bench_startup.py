@@ -0,0 +1,108 @@
+"""
+Startup benchmark for the log-parser entry points.
+
+Each entry point is run in a fresh interpreter. Cold runs use an empty
+bytecode cache, warm runs reuse the cache populated by earlier runs.
+cli-batch answers a real query on a tiny log, so it includes every module
+a batch query imports. Exits non-zero if the warm startup of cli or
+cli-batch exceeds the budget.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 10] [--budget-ms 150]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TINY_LOG_LINES = 100
+
+# {log} is replaced with the path of a tiny log written for the run
+ENTRY_POINTS = {
+    "interpreter": ["-c", "pass"],
+    "cli": ["-m", "src", "--help"],
+    "cli-batch": ["-m", "src", "batch", "{log}", "--host", "host1", "--no-cache"],
+    "tui-import": ["-c", "import src.tui"],
+}
+BUDGETED = ("cli", "cli-batch")
+
+
+def write_tiny_log(path):
+    with open(path, "w") as f:
+        for i in range(TINY_LOG_LINES):
+            f.write(f"{1704067200 + i} host{i % 7} host{i % 5}\n")
+
+
+def time_run(args, pycache_prefix):
+    """Run the interpreter once and return the wall time in milliseconds."""
+    env = dict(os.environ, PYTHONPYCACHEPREFIX=pycache_prefix)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable] + args,
+        cwd=REPO_ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    elapsed = (time.perf_counter() - started) * 1000
+    return elapsed if result.returncode == 0 else None
+
+
+def bench_entry_point(args, runs):
+    """Return (cold ms, median warm ms), or None if the entry point fails."""
+    with tempfile.TemporaryDirectory() as pycache_prefix:
+        cold = time_run(args, pycache_prefix)
+        if cold is None:
+            return None
+        warm = [time_run(args, pycache_prefix) for _ in range(runs)]
+    return cold, statistics.median(warm)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure log-parser startup time")
+    parser.add_argument("--runs", type=int, default=10, help="Warm runs per entry point")
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=150.0,
+        help="Maximum warm CLI startup over the bare interpreter, in ms",
+    )
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'entry point':<14} {'cold ms':>10} {'warm ms':>10}")
+    with tempfile.TemporaryDirectory() as log_dir:
+        log_file = os.path.join(log_dir, "tiny.log")
+        write_tiny_log(log_file)
+        for name, entry_args in ENTRY_POINTS.items():
+            entry_args = [arg.replace("{log}", log_file) for arg in entry_args]
+            timing = bench_entry_point(entry_args, args.runs)
+            results[name] = timing
+            if timing is None:
+                print(f"{name:<14} {'failed':>10}")
+            else:
+                print(f"{name:<14} {timing[0]:>10.1f} {timing[1]:>10.1f}")
+
+    if results["interpreter"] is None or any(results[n] is None for n in BUDGETED):
+        print("CLI entry point failed to start")
+        return 1
+
+    failed = False
+    for name in BUDGETED:
+        overhead = results[name][1] - results["interpreter"][1]
+        print(f"\nWarm {name} startup over bare interpreter: {overhead:.1f} ms")
+        if overhead > args.budget_ms:
+            print(f"FAIL: exceeds budget of {args.budget_ms:.0f} ms")
+            failed = True
+        else:
+            print(f"OK: within budget of {args.budget_ms:.0f} ms")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,22 @@
 """Main entry point for the log parsing application."""
 
 import sys
-from src.cli import cli_main
-from src.tui import run_tui
+
 
 def main():
-    """Main entry point that decides whether to run CLI or TUI version."""
+    """
+    Main entry point that decides whether to run CLI or TUI version.
+    Each interface is imported only when it is used, so CLI calls from
+    scripts and cron do not pay for loading the TUI.
+    """
     if len(sys.argv) == 1:
+        from src.tui import run_tui
+
         run_tui()
     else:
-        cli_main()
+        from src.cli import cli_main
+
+        return cli_main()
 
 if __name__ == "__main__":
-    sys.exit(main())
\ No newline at end of file
+    sys.exit(main())
@@ -2,16 +2,20 @@
 
 import argparse
 import logging
+import os
+import sys
 from datetime import datetime
 
-from src.processing.batch_processor import process_batch
-from src.processing.stream_processor import process_stream
+from src.processing.result_cache import DEFAULT_MAX_CACHE_BYTES
+from src.utils.utils import TIME_INTERVALS, parse_size
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 logger = logging.getLogger(__name__)
 
+SAMPLE_TOP_HOSTS = 10
+
 
 def parse_datetime(dt_str):
     """Convert datetime string to datetime object."""
@@ -29,8 +33,88 @@ def parse_datetime(dt_str):
             )
 
 
-def main():
-    """Main CLI command implementation."""
+def read_hosts_file(path):
+    """Read hostnames from a file, one per line, ignoring blanks and # comments."""
+    hosts = []
+    with open(path, "r") as f:
+        for line in f:
+            host = line.split("#", 1)[0].strip()
+            if host:
+                hosts.append(host)
+    return hosts
+
+
+def print_connected_hosts(host, connected_hosts):
+    """Print the hosts that connected to host."""
+    if connected_hosts:
+        print(f"Hosts connected to {host}:")
+        for connected_host in sorted(connected_hosts):
+            print(connected_host)
+    else:
+        print(f"No hosts connected to {host} in the specified time range.")
+
+
+def print_host_results(results):
+    """Print inbound and outbound connections for several hosts."""
+    for host, result in sorted(results.items()):
+        inbound = ", ".join(sorted(result["inbound"])) or "None"
+        outbound = ", ".join(sorted(result["outbound"])) or "None"
+        print(f"{host}:")
+        print(f"  Hosts connected to {host}: {inbound}")
+        print(f"  Hosts {host} connected to: {outbound}")
+
+
+def format_estimate(estimate):
+    """Format an estimated count with its confidence interval."""
+    value, low, high = estimate
+    if low == high:
+        return f"{value:.0f}"
+    return f"~{value:.0f} (95% CI {low:.0f}-{high:.0f})"
+
+
+def print_sample_progress(sample):
+    """Print a one-line summary of a refined sample estimate."""
+    coverage = sample["blocks_sampled"] / max(sample["blocks_total"], 1)
+    line = f"[{coverage:6.1%} sampled, {sample['elapsed']:.1f}s] connections: "
+    line += format_estimate(sample["total"])
+    if sample["most_active"]:
+        host, estimate = sample["most_active"]
+        line += f", most active: {host} {format_estimate(estimate)}"
+    print(line)
+
+
+def print_sample_result(host, sample):
+    """Print the final estimates of a sampled batch query."""
+    coverage = sample["blocks_sampled"] / max(sample["blocks_total"], 1)
+    if sample["exact"]:
+        print("Sampled the whole file, results are exact.")
+    else:
+        print(
+            f"Estimates from {sample['blocks_sampled']} of {sample['blocks_total']} "
+            f"blocks ({coverage:.1%} of the file), with 95% confidence intervals."
+        )
+
+    print(f"Total connections: {format_estimate(sample['total'])}")
+    if sample["most_active"]:
+        most_active_host, estimate = sample["most_active"]
+        print(f"Most active host: {most_active_host} {format_estimate(estimate)}")
+        print("Estimated connections by host:")
+        top_hosts = sorted(sample["counts"].items(), key=lambda x: (-x[1].value, x[0]))
+        for counted_host, estimate in top_hosts[:SAMPLE_TOP_HOSTS]:
+            print(f"  {counted_host}: {format_estimate(estimate)}")
+
+    if sample["exact"]:
+        print_connected_hosts(host, sample["connected_hosts"])
+    elif sample["connected_hosts"]:
+        print(f"Hosts connected to {host} (partial, from the sample):")
+        for connected_host in sorted(sample["connected_hosts"]):
+            print(connected_host)
+    else:
+        print(f"No hosts connected to {host} in the sampled blocks.")
+
+
+def build_parser():
+    """Build the argument parser for all subcommands."""
     parser = argparse.ArgumentParser(description="Log file connection analyzer")
     subparsers = parser.add_subparsers(dest="command", help="Commands")
 
@@ -38,56 +122,720 @@ def main():
     batch_parser = subparsers.add_parser(
         "batch", help="Process a log file with time range"
     )
-    batch_parser.add_argument("file", help="Log file to process")
+    batch_parser.set_defaults(handler=run_batch, command_parser=batch_parser)
     batch_parser.add_argument(
-        "--host", required=True, help="Hostname to analyze"
+        "file",
+        nargs="?",
+        help="Log file, directory of .log files, or - to read stdin "
+        "(optional with --server or --sqlite)",
+    )
+    batch_parser.add_argument(
+        "--host",
+        action="append",
+        default=[],
+        help="Hostname to analyze (repeat for several hosts)",
+    )
+    batch_parser.add_argument(
+        "--hosts-file", help="File with hostnames to analyze, one per line"
     )
     batch_parser.add_argument("--start", help="Start datetime (ISO format)")
     batch_parser.add_argument("--end", help="End datetime (ISO format)")
+    batch_parser.add_argument(
+        "--server",
+        nargs="?",
+        const=True,
+        metavar="SOCKET",
+        help="Query a running 'serve' daemon (default: the daemon's default socket)",
+    )
+    batch_parser.add_argument(
+        "--sqlite",
+        metavar="DB",
+        help="Query a SQLite store built by 'ingest', first ingesting any data "
+        "appended to the given log file",
+    )
+    batch_parser.add_argument(
+        "--no-cache", action="store_true", help="Bypass the query result cache"
+    )
+    batch_parser.add_argument("--cache-dir", help="Directory for the result cache")
+    batch_parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Persist partial aggregates and only scan data appended since the last run",
+    )
+    batch_parser.add_argument(
+        "--mmap",
+        action="store_true",
+        help="Memory-map the file and only parse lines that contain the host",
+    )
+    batch_parser.add_argument(
+        "--read-ahead",
+        type=parse_size,
+        metavar="SIZE",
+        help="Read the file in a background thread with buffers of SIZE, e.g. 4M",
+    )
+    batch_parser.add_argument(
+        "--sample",
+        type=float,
+        metavar="RATE",
+        help="Estimate from a random sample of the file, e.g. 0.05 for 5%%",
+    )
+    batch_parser.add_argument(
+        "--time-budget",
+        type=float,
+        metavar="SECONDS",
+        help="Estimate from random samples, refining until SECONDS have passed",
+    )
+    batch_parser.add_argument(
+        "--cache-size",
+        type=parse_size,
+        default=DEFAULT_MAX_CACHE_BYTES,
+        help="Maximum result cache size, e.g. 64M (default: 64M)",
+    )
+    batch_parser.add_argument(
+        "--explain",
+        action="store_true",
+        help="Show the chosen query plan and its estimated cost instead of running it",
+    )
 
     # Stream processing command
     stream_parser = subparsers.add_parser(
         "stream", help="Process log files in a directory in real-time"
     )
+    stream_parser.set_defaults(handler=run_stream, command_parser=stream_parser)
     stream_parser.add_argument("directory", help="Directory containing log files to monitor")
+    stream_parser.add_argument("--host", help="Hostname to track connections to")
     stream_parser.add_argument(
-        "--host", required=True, help="Hostname to track connections to"
+        "--from-host", help="Hostname to track connections from"
     )
     stream_parser.add_argument(
-        "--from-host", help="Hostname to track connections from"
+        "--chunk-size",
+        type=parse_size,
+        default=parse_size("4M"),
+        metavar="SIZE",
+        help="Most data read from one file per loop iteration (default: 4M)",
+    )
+    stream_parser.add_argument(
+        "--chunk-lines",
+        type=int,
+        metavar="N",
+        help="Most lines read from one file per loop iteration",
+    )
+    stream_parser.add_argument(
+        "--max-memory",
+        type=parse_size,
+        metavar="SIZE",
+        help="Spill per-host counts to temporary files beyond SIZE, e.g. 256M",
+    )
+    stream_parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Tail the files in N worker processes, sharded by path (default: 1)",
+    )
+    stream_parser.add_argument(
+        "--subscriptions",
+        metavar="FILE",
+        help="JSON file of subscriptions, each with its own hosts, window and "
+        "report interval, all served from one pass instead of --host",
+    )
+    stream_parser.add_argument(
+        "--chains",
+        type=int,
+        metavar="SECONDS",
+        help="Instead of --host, report every chain A -> X -> B whose two "
+        "connections are at most SECONDS apart, as soon as it happens",
+    )
+    stream_parser.add_argument(
+        "--pivot",
+        action="append",
+        default=[],
+        help="With --chains, only watch chains through this host (repeatable)",
+    )
+    stream_parser.add_argument(
+        "--max-per-host",
+        type=int,
+        default=1000,
+        metavar="N",
+        help="With --chains, most recent connections kept per host and "
+        "direction (default: 1000)",
+    )
+    stream_parser.add_argument(
+        "--metrics-port",
+        type=int,
+        metavar="PORT",
+        help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics",
+    )
+    stream_parser.add_argument(
+        "--metrics-file",
+        metavar="PATH",
+        help="Write Prometheus metrics to PATH after each report, "
+        "for the node_exporter textfile collector",
     )
 
-    args = parser.parse_args()
+    # Replay load generator
+    replay_parser = subparsers.add_parser(
+        "replay",
+        help="Replay a log into a directory while streaming it, "
+        "to measure ingest rate and latency",
+    )
+    replay_parser.set_defaults(handler=run_replay, command_parser=replay_parser)
+    replay_parser.add_argument(
+        "file", nargs="?", help="Log file to replay (default: synthetic records)"
+    )
+    replay_parser.add_argument(
+        "--target-dir", required=True, help="Directory to write the replayed logs to"
+    )
+    replay_parser.add_argument(
+        "--synthetic",
+        type=int,
+        default=100000,
+        metavar="LINES",
+        help="Number of synthetic records if no file is given (default: 100000)",
+    )
+    replay_parser.add_argument(
+        "--speed",
+        type=float,
+        default=0,
+        help="Speed-up over the original timing; 0 writes as fast as possible "
+        "(default: 0)",
+    )
+    replay_parser.add_argument(
+        "--fan-out",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Spread the records over N files (default: 1)",
+    )
+    replay_parser.add_argument(
+        "--rotate-every",
+        type=float,
+        metavar="SECONDS",
+        help="Rotate the next file every SECONDS",
+    )
+    replay_parser.add_argument(
+        "--truncate-every",
+        type=float,
+        metavar="SECONDS",
+        help="Truncate the next file every SECONDS",
+    )
+    replay_parser.add_argument(
+        "--probe-interval",
+        type=float,
+        default=1.0,
+        metavar="SECONDS",
+        help="Seconds between latency probe records (default: 1)",
+    )
+    replay_parser.add_argument(
+        "--duration",
+        type=float,
+        metavar="SECONDS",
+        help="Stop replaying after SECONDS",
+    )
 
-    if not args.command:
-        parser.print_help()
+    # Time-series rollup commands
+    rollup_parser = subparsers.add_parser(
+        "rollup", help="Build or query per-interval connection count rollups"
+    )
+    rollup_parser.set_defaults(handler=run_rollup, command_parser=rollup_parser)
+    rollup_subparsers = rollup_parser.add_subparsers(dest="rollup_command")
+    rollup_build_parser = rollup_subparsers.add_parser(
+        "build", help="Build a rollup file from a log file in one pass"
+    )
+    rollup_build_parser.add_argument("file", help="Log file to roll up")
+    rollup_build_parser.add_argument(
+        "--output", help="Rollup file to write (default: next to the log file)"
+    )
+    rollup_query_parser = rollup_subparsers.add_parser(
+        "query", help="Answer count and histogram queries from a rollup file"
+    )
+    rollup_query_parser.add_argument("rollup", help="Rollup file to query")
+    rollup_query_parser.add_argument("--host", help="Only count connections from this host")
+    rollup_query_parser.add_argument("--start", help="Start datetime (ISO format)")
+    rollup_query_parser.add_argument("--end", help="End datetime (ISO format)")
+    rollup_query_parser.add_argument(
+        "--interval",
+        choices=list(TIME_INTERVALS),
+        help="Print a histogram with one count per interval",
+    )
+
+    # Time-ordered merge command
+    merge_parser = subparsers.add_parser(
+        "merge", help="Merge log files into one time-sorted log"
+    )
+    merge_parser.set_defaults(handler=run_merge)
+    merge_parser.add_argument(
+        "paths", nargs="+", help="Log files or directories of .log files to merge"
+    )
+    merge_parser.add_argument(
+        "-o", "--output", required=True, help="Sorted log file to write"
+    )
+    merge_parser.add_argument("--start", help="Start datetime (ISO format)")
+    merge_parser.add_argument("--end", help="End datetime (ISO format)")
+    merge_parser.add_argument(
+        "--index",
+        action="store_true",
+        help="Also write a time index so range queries on the output can seek",
+    )
+    merge_parser.add_argument(
+        "--tolerance",
+        type=int,
+        default=300,
+        metavar="SECONDS",
+        help="Maximum disorder within each input file (default: 300)",
+    )
+
+    # SQLite store ingest command
+    ingest_parser = subparsers.add_parser(
+        "ingest", help="Load log files into a SQLite store for indexed queries"
+    )
+    ingest_parser.set_defaults(handler=run_ingest)
+    ingest_parser.add_argument(
+        "paths", nargs="+", help="Log files or directories of .log files to load"
+    )
+    ingest_parser.add_argument(
+        "--sqlite", required=True, metavar="DB", help="SQLite database to load into"
+    )
+
+    # Host Bloom index command
+    bloom_parser = subparsers.add_parser(
+        "bloom", help="Build per-block host Bloom filters to speed up host queries"
+    )
+    bloom_parser.set_defaults(handler=run_bloom)
+    bloom_parser.add_argument(
+        "paths", nargs="+", help="Log files or directories of .log files to index"
+    )
+    bloom_parser.add_argument(
+        "--block-size",
+        type=parse_size,
+        default="4M",
+        metavar="SIZE",
+        help="Size of the blocks the filters cover, e.g. 4M (default: 4M)",
+    )
+
+    # Query daemon command
+    serve_parser = subparsers.add_parser(
+        "serve", help="Index log files in memory and answer batch queries over a socket"
+    )
+    serve_parser.set_defaults(handler=run_serve)
+    serve_parser.add_argument(
+        "paths", nargs="+", help="Log files or directories of .log files to serve"
+    )
+    serve_parser.add_argument(
+        "--socket",
+        help="Unix socket to listen on (default: log-parser.sock in "
+        "$XDG_RUNTIME_DIR, or in the cache directory)",
+    )
+
+    # Result cache maintenance command
+    cache_parser = subparsers.add_parser("cache", help="Inspect or clear the result cache")
+    cache_parser.set_defaults(handler=run_cache)
+    cache_parser.add_argument("action", choices=["stats", "clear"], help="Cache action")
+    cache_parser.add_argument("--cache-dir", help="Directory for the result cache")
+
+    return parser
+
+
+def run_batch(args):
+    """Run a batch query against a log file or a query daemon."""
+    start_time = parse_datetime(args.start) if args.start else None
+    end_time = parse_datetime(args.end) if args.end else None
+
+    hosts = list(args.host)
+    if args.hosts_file:
+        hosts.extend(read_hosts_file(args.hosts_file))
+    if not hosts:
+        args.command_parser.error("at least one --host or a --hosts-file is required")
+
+    if args.file == "-":
+        run_batch_stdin(args, hosts, start_time, end_time)
+        return
+
+    if args.server:
+        from src.processing.query_server import default_socket_path, query_server
+
+        socket_path = default_socket_path() if args.server is True else args.server
+        request = {
+            "file": os.path.abspath(args.file) if args.file else None,
+            "start": int(start_time.timestamp()) if start_time else None,
+            "end": int(end_time.timestamp()) if end_time else None,
+        }
+        if len(hosts) > 1:
+            request.update(query="hosts", hosts=hosts)
+        else:
+            request.update(query="connected", host=hosts[0])
+        result = query_server(socket_path, request)
+        if len(hosts) > 1:
+            print_host_results(result)
+        else:
+            print_connected_hosts(hosts[0], result)
+        return
+
+    if args.sqlite:
+        from src.processing.merge import expand_log_paths
+        from src.processing.sqlite_store import ingest_logs, open_store, query_batch
+
+        log_files = None
+        if args.file:
+            log_files = expand_log_paths([args.file])
+            ingest_logs(args.sqlite, log_files)
+        conn = open_store(args.sqlite)
+        try:
+            results = query_batch(conn, hosts, start_time, end_time, log_files)
+            if len(hosts) > 1:
+                print_host_results(results)
+            else:
+                print_connected_hosts(hosts[0], results[hosts[0]]["inbound"])
+        finally:
+            conn.close()
+        return
+
+    if not args.file:
+        args.command_parser.error(
+            "a log file is required unless --server or --sqlite is used"
+        )
+
+    if args.sample is not None or args.time_budget is not None:
+        if len(hosts) > 1:
+            args.command_parser.error("--sample and --time-budget take a single --host")
+        from src.processing.sampling import iter_sample_estimates
+
+        sample = None
+        for refined in iter_sample_estimates(
+            args.file,
+            hosts[0],
+            start_time,
+            end_time,
+            rate=args.sample,
+            time_budget=args.time_budget,
+        ):
+            # Every estimate but the final one is shown as progress
+            if sample is not None:
+                print_sample_progress(sample)
+            sample = refined
+        print_sample_result(hosts[0], sample)
+        return
+
+    if args.explain:
+        if len(hosts) > 1:
+            args.command_parser.error("--explain takes a single --host")
+        explain_batch(args, hosts[0], start_time, end_time)
+        return
+
+    from src.processing.batch_processor import process_batch, process_batch_hosts
+
+    if len(hosts) > 1:
+        if args.incremental:
+            args.command_parser.error("--incremental takes a single --host")
+        if args.mmap:
+            args.command_parser.error("--mmap takes a single --host")
+        results = process_batch_hosts(
+            args.file,
+            hosts,
+            start_time,
+            end_time,
+            use_cache=not args.no_cache,
+            cache_dir=args.cache_dir,
+            max_cache_bytes=args.cache_size,
+            read_ahead=args.read_ahead,
+        )
+        print_host_results(results)
+        return
+
+    host = hosts[0]
+    connected_hosts = process_batch(
+        args.file,
+        host,
+        start_time,
+        end_time,
+        use_cache=not args.no_cache,
+        cache_dir=args.cache_dir,
+        max_cache_bytes=args.cache_size,
+        incremental=args.incremental,
+        prefilter=args.mmap,
+        read_ahead=args.read_ahead,
+    )
+    print_connected_hosts(host, connected_hosts)
+
+
+def run_batch_stdin(args, hosts, start_time, end_time):
+    """Answer a batch query from a log piped to stdin, in one pass."""
+    unsupported = [
+        option
+        for option, used in (
+            ("--server", args.server),
+            ("--sqlite", args.sqlite),
+            ("--incremental", args.incremental),
+            ("--mmap", args.mmap),
+            ("--sample", args.sample is not None),
+            ("--time-budget", args.time_budget is not None),
+            ("--explain", args.explain),
+        )
+        if used
+    ]
+    if unsupported:
+        args.command_parser.error(
+            f"{', '.join(unsupported)} cannot be used when reading stdin"
+        )
+
+    from src.processing.batch_processor import process_batch_stream
+
+    results = process_batch_stream(
+        sys.stdin.buffer, hosts, start_time, end_time, args.read_ahead
+    )
+    if len(hosts) > 1:
+        print_host_results(results)
+    else:
+        print_connected_hosts(hosts[0], results[hosts[0]]["inbound"])
+
+
+def explain_batch(args, host, start_time, end_time):
+    """Print the plans for a single-host batch query, file by file."""
+    from src.processing.manifest import select_log_files
+    from src.processing.planner import plan_query, print_plans
+
+    if os.path.isdir(args.file):
+        log_files = select_log_files(args.file, start_time, end_time)
+    else:
+        log_files = [args.file]
+
+    total = 0.0
+    for log_file in log_files:
+        plans = plan_query(
+            log_file,
+            host,
+            start_time,
+            end_time,
+            use_cache=not args.no_cache,
+            cache_dir=args.cache_dir,
+            incremental=args.incremental,
+            prefilter=args.mmap,
+            read_ahead=args.read_ahead,
+        )
+        print_plans(log_file, plans)
+        total += plans[0].seconds
+    print(f"Estimated cost: {total:.3f}s")
+
+
+def run_stream(args):
+    """Monitor a directory of log files."""
+    modes = [args.host, args.subscriptions, args.chains is not None]
+    if sum(1 for mode in modes if mode) != 1:
+        args.command_parser.error(
+            "exactly one of --host, --subscriptions or --chains is required"
+        )
+    if (args.subscriptions or args.chains) and (args.workers > 1 or args.from_host):
+        args.command_parser.error(
+            "--workers and --from-host cannot be used with --subscriptions or --chains"
+        )
+    if args.chains is not None and args.chains <= 0:
+        args.command_parser.error("--chains must be a positive number of seconds")
+    if args.max_per_host <= 0:
+        args.command_parser.error("--max-per-host must be positive")
+    if args.pivot and args.chains is None:
+        args.command_parser.error("--pivot requires --chains")
+
+    if args.workers > 1:
+        if args.metrics_port or args.metrics_file:
+            args.command_parser.error("metrics are not available with --workers")
+        from src.processing.sharded_stream import process_stream_sharded
+
+        process_stream_sharded(
+            args.directory,
+            args.host,
+            args.from_host,
+            workers=args.workers,
+            max_memory=args.max_memory,
+            chunk_bytes=args.chunk_size,
+            chunk_lines=args.chunk_lines,
+        )
         return
 
+    metrics = server = None
+    if args.metrics_port or args.metrics_file:
+        from src.processing.metrics import StreamMetrics, serve_metrics
+
+        metrics = StreamMetrics(args.metrics_file)
+        if args.metrics_port:
+            server = serve_metrics(metrics.registry, args.metrics_port)
+
     try:
-        if args.command == "batch":
-            start_time = parse_datetime(args.start) if args.start else None
-            end_time = parse_datetime(args.end) if args.end else None
+        if args.subscriptions:
+            from src.processing.subscriptions import (
+                load_subscriptions,
+                process_subscriptions,
+            )
 
-            connected_hosts = process_batch(
-                args.file, args.host, start_time, end_time
+            process_subscriptions(
+                args.directory,
+                load_subscriptions(args.subscriptions),
+                max_memory=args.max_memory,
+                chunk_bytes=args.chunk_size,
+                chunk_lines=args.chunk_lines,
+                metrics=metrics,
             )
+            return
+
+        if args.chains:
+            from src.processing.chains import process_chains
+
+            process_chains(
+                args.directory,
+                args.chains,
+                max_per_host=args.max_per_host,
+                pivots=args.pivot,
+                chunk_bytes=args.chunk_size,
+                chunk_lines=args.chunk_lines,
+                metrics=metrics,
+            )
+            return
+
+        from src.processing.stream_processor import process_stream
+
+        process_stream(
+            args.directory,
+            args.host,
+            args.from_host,
+            max_memory=args.max_memory,
+            chunk_bytes=args.chunk_size,
+            chunk_lines=args.chunk_lines,
+            metrics=metrics,
+        )
+    finally:
+        if server:
+            server.shutdown()
 
-            if connected_hosts:
-                print(f"Hosts connected to {args.host}:")
-                for host in sorted(connected_hosts):
-                    print(host)
+
+def run_replay(args):
+    """Replay a log into a directory while streaming it."""
+    if args.fan_out < 1 or args.speed < 0:
+        args.command_parser.error("--fan-out must be positive and --speed not negative")
+    from src.processing.replay import print_replay_result, run_replay as replay_log
+
+    result = replay_log(
+        args.target_dir,
+        log_file=args.file,
+        synthetic_lines=args.synthetic,
+        speed=args.speed,
+        fan_out=args.fan_out,
+        rotate_every=args.rotate_every,
+        truncate_every=args.truncate_every,
+        probe_interval=args.probe_interval,
+        duration=args.duration,
+    )
+    print_replay_result(result)
+
+
+def run_rollup(args):
+    """Build or query a time-series rollup."""
+    from src.processing.rollup import (
+        INTERVALS,
+        build_rollup,
+        default_rollup_path,
+        load_rollup,
+        rollup_histogram,
+        rollup_host_counts,
+        save_rollup,
+    )
+
+    if args.rollup_command == "build":
+        output_path = args.output or default_rollup_path(args.file)
+        save_rollup(build_rollup(args.file), args.file, output_path)
+        print(f"Rollup written to {output_path}")
+    elif args.rollup_command == "query":
+        start_time = parse_datetime(args.start) if args.start else None
+        end_time = parse_datetime(args.end) if args.end else None
+        buckets = load_rollup(args.rollup)
+
+        if args.interval:
+            for slot_start, count in rollup_histogram(
+                buckets, INTERVALS[args.interval], args.host, start_time, end_time
+            ):
+                slot = datetime.fromtimestamp(slot_start)
+                print(f"{slot.strftime('%Y-%m-%d %H:%M:%S')} {count}")
+        else:
+            counts = rollup_host_counts(buckets, start_time, end_time)
+            if args.host:
+                print(f"{args.host}: {counts.get(args.host, 0)}")
             else:
-                print(
-                    f"No hosts connected to {args.host} in the specified time range."
-                )
+                for host, count in sorted(counts.items(), key=lambda x: (-x[1], x[0])):
+                    print(f"{host}: {count}")
+    else:
+        args.command_parser.print_help()
+
+
+def run_merge(args):
+    """Merge log files into one time-sorted log."""
+    from src.processing.merge import expand_log_paths, merge_logs, write_merged_log
+
+    start_time = parse_datetime(args.start) if args.start else None
+    end_time = parse_datetime(args.end) if args.end else None
+    log_files = expand_log_paths(args.paths)
+    records = merge_logs(log_files, start_time, end_time, args.tolerance)
+    count = write_merged_log(records, args.output, index=args.index)
+    print(f"Merged {count} records from {len(log_files)} files into {args.output}")
 
-        elif args.command == "stream":
-            process_stream(args.directory, args.host, args.from_host)
 
+def run_ingest(args):
+    """Load log files into a SQLite store."""
+    from src.processing.merge import expand_log_paths
+    from src.processing.sqlite_store import ingest_logs
+
+    log_files = expand_log_paths(args.paths)
+    count = ingest_logs(args.sqlite, log_files)
+    print(
+        f"Ingested {count} new records from {len(log_files)} files into {args.sqlite}"
+    )
+
+
+def run_bloom(args):
+    """Build the host Bloom filters of log files."""
+    from src.parser.bloom_index import bloom_path, build_bloom_index
+    from src.processing.merge import expand_log_paths
+
+    for log_file in expand_log_paths(args.paths):
+        blocks = build_bloom_index(log_file, args.block_size)
+        print(f"Indexed {len(blocks)} blocks of {log_file} in {bloom_path(log_file)}")
+
+
+def run_serve(args):
+    """Run the query daemon."""
+    from src.processing.query_server import serve
+
+    serve(args.paths, args.socket)
+
+
+def run_cache(args):
+    """Inspect or clear the result cache."""
+    from src.processing.result_cache import cache_clear, cache_stats
+
+    if args.action == "clear":
+        removed = cache_clear(args.cache_dir)
+        print(f"Removed {removed} cached results")
+    else:
+        stats = cache_stats(args.cache_dir)
+        print(f"Cache directory: {stats['cache_dir']}")
+        print(f"Entries: {stats['entries']}")
+        print(f"Size: {stats['total_bytes']} bytes")
+        print(f"Hits: {stats['hits']}")
+        print(f"Misses: {stats['misses']}")
+
+
+def main():
+    """Main CLI command implementation."""
+    parser = build_parser()
+    args = parser.parse_args()
+
+    if not args.command:
+        parser.print_help()
+        return
+
+    try:
+        args.handler(args)
     except KeyboardInterrupt:
         print("\nExiting...")
     except Exception as e:
         logger.error(f"Error: {e}")
         return 1
 
-    return 0
\ No newline at end of file
+    return 0
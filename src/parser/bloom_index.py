@@ -0,0 +1,237 @@
+"""
+Per-block host Bloom filters for log files.
+
+`log-parser bloom` splits a log into blocks of about 4 MiB, aligned to line
+boundaries, and stores for each block a Bloom filter of its source hosts, one
+of its destination hosts and its time range in a sidecar file next to the
+log. Host queries then only read the blocks whose filter may contain the
+host and whose time range overlaps the query, so looking up a rare host
+touches a small fraction of the file. Like the time index, the sidecar
+records the identity of the log it was built for and is ignored once the
+log changes.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import math
+from typing import Iterable, List, NamedTuple, Optional
+
+from src.parser.formats import detect_file_format
+from src.utils.utils import atomic_write, file_identity
+
+logger = logging.getLogger(__name__)
+
+BLOOM_SUFFIX = ".bloom"
+BLOCK_SIZE_BYTES = 4 * 1024 * 1024
+BLOOM_VERSION = 1
+FALSE_POSITIVE_RATE = 0.01
+
+
+class BloomFilter:
+    """Bloom filter over host names using double hashing of one digest."""
+
+    def __init__(self, bits: bytearray, num_hashes: int) -> None:
+        self.bits = bits
+        self.num_bits = len(bits) * 8
+        self.num_hashes = num_hashes
+
+    @classmethod
+    def from_hosts(
+        cls, hosts: Iterable[str], false_positive_rate: float = FALSE_POSITIVE_RATE
+    ) -> "BloomFilter":
+        hosts = set(hosts)
+        count = max(len(hosts), 1)
+        num_bits = math.ceil(-count * math.log(false_positive_rate) / math.log(2) ** 2)
+        num_bytes = max((num_bits + 7) // 8, 1)
+        num_hashes = max(round(num_bytes * 8 / count * math.log(2)), 1)
+        bloom = cls(bytearray(num_bytes), num_hashes)
+        for host in hosts:
+            bloom.add(host)
+        return bloom
+
+    def _positions(self, host: str) -> Iterable[int]:
+        digest = hashlib.blake2b(host.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (first + i * second) % self.num_bits
+
+    def add(self, host: str) -> None:
+        for position in self._positions(host):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, host: str) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(host)
+        )
+
+    def to_json(self) -> list:
+        return [self.num_hashes, base64.b64encode(bytes(self.bits)).decode()]
+
+    @classmethod
+    def from_json(cls, data: list) -> "BloomFilter":
+        num_hashes, bits = data
+        return cls(bytearray(base64.b64decode(bits)), num_hashes)
+
+
+class HostBlock(NamedTuple):
+    """A line-aligned block of a log: [start, end) with its hosts and times."""
+
+    start: int
+    end: int
+    min_ts: Optional[int]
+    max_ts: Optional[int]
+    sources: BloomFilter
+    destinations: BloomFilter
+
+
+def bloom_path(log_file: str) -> str:
+    return log_file + BLOOM_SUFFIX
+
+
+def build_bloom_index(
+    log_file: str,
+    block_size: int = BLOCK_SIZE_BYTES,
+    false_positive_rate: float = FALSE_POSITIVE_RATE,
+) -> List[HostBlock]:
+    """
+    Scan log_file once and write its per-block host filters to the sidecar.
+    The last block ends at the end of the file, covering a last line without
+    a newline. Returns the blocks.
+    """
+    parse_lines = detect_file_format(log_file).parse_lines
+    identity = list(file_identity(log_file))
+    blocks = []
+    offset = 0
+    carry = b""
+    with open(log_file, "rb") as f:
+        while True:
+            chunk = f.read(block_size)
+            data = carry + chunk
+            if not chunk:
+                if not data:
+                    break
+                # The last line does not end in a newline
+                block_end = last_newline = len(data)
+            else:
+                last_newline = data.rfind(b"\n")
+                if last_newline == -1:
+                    carry = data
+                    continue
+                block_end = last_newline + 1
+            carry = data[block_end:]
+
+            sources = set()
+            destinations = set()
+            min_ts = max_ts = None
+            lines = data[:last_newline].decode(errors="replace").split("\n")
+            for timestamp, source, destination in parse_lines(lines):
+                sources.add(source)
+                destinations.add(destination)
+                if min_ts is None or timestamp < min_ts:
+                    min_ts = timestamp
+                if max_ts is None or timestamp > max_ts:
+                    max_ts = timestamp
+
+            end = offset + block_end
+            blocks.append(
+                HostBlock(
+                    offset,
+                    end,
+                    min_ts,
+                    max_ts,
+                    BloomFilter.from_hosts(sources, false_positive_rate),
+                    BloomFilter.from_hosts(destinations, false_positive_rate),
+                )
+            )
+            offset = end
+
+    save_bloom_index(log_file, blocks, identity)
+    return blocks
+
+
+def save_bloom_index(
+    log_file: str, blocks: List[HostBlock], identity: Optional[list] = None
+) -> str:
+    """Write the blocks for log_file atomically and return the sidecar path."""
+    path = bloom_path(log_file)
+    with atomic_write(path) as f:
+        json.dump(
+            {
+                "version": BLOOM_VERSION,
+                "source": identity or list(file_identity(log_file)),
+                "blocks": [
+                    [
+                        block.start,
+                        block.end,
+                        block.min_ts,
+                        block.max_ts,
+                        block.sources.to_json(),
+                        block.destinations.to_json(),
+                    ]
+                    for block in blocks
+                ],
+            },
+            f,
+        )
+    return path
+
+
+def load_bloom_index(log_file: str) -> Optional[List[HostBlock]]:
+    """Return the blocks for log_file, or None if missing or stale."""
+    path = bloom_path(log_file)
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable Bloom index {path}: {e}")
+        return None
+
+    if data.get("version") != BLOOM_VERSION or data.get("source") != list(
+        file_identity(log_file)
+    ):
+        logger.debug(f"Ignoring stale Bloom index {path}")
+        return None
+    return [
+        HostBlock(
+            start,
+            end,
+            min_ts,
+            max_ts,
+            BloomFilter.from_json(sources),
+            BloomFilter.from_json(destinations),
+        )
+        for start, end, min_ts, max_ts, sources, destinations in data["blocks"]
+    ]
+
+
+def candidate_blocks(
+    blocks: List[HostBlock],
+    hostname: str,
+    as_source: bool = False,
+    as_destination: bool = False,
+    start_timestamp: Optional[int] = None,
+    end_timestamp: Optional[int] = None,
+) -> List[HostBlock]:
+    """
+    The blocks that may hold a record with hostname as source or destination,
+    as requested, within the time range.
+    """
+    selected = []
+    for block in blocks:
+        if block.min_ts is None:
+            continue
+        if start_timestamp is not None and block.max_ts < start_timestamp:
+            continue
+        if end_timestamp is not None and block.min_ts > end_timestamp:
+            continue
+        if (as_source and hostname in block.sources) or (
+            as_destination and hostname in block.destinations
+        ):
+            selected.append(block)
+    return selected
@@ -0,0 +1,268 @@
+"""
+Registry of supported log formats.
+
+Every format turns lines into the same (timestamp, source, destination)
+record stream, so batch, stream and index features work with any of them.
+Each format provides a detector, a single-line parser and an optimized bulk
+parser for scans. The format of a file is auto-detected from its first lines.
+"""
+
+import itertools
+import json
+import re
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+Record = Tuple[int, str, str]
+
+DETECT_SAMPLE_BYTES = 4096
+DETECT_SAMPLE_LINES = 5
+
+# Field names accepted in CSV headers and JSON objects
+TIMESTAMP_KEYS = ("timestamp", "ts", "time")
+SOURCE_KEYS = ("src", "source")
+DESTINATION_KEYS = ("dst", "destination", "dest")
+
+
+class LogFormat(NamedTuple):
+    name: str
+    detect: Callable[[str], bool]
+    parse_line: Callable[[str], Optional[Record]]
+    parse_lines: Callable[[Iterable[str]], Iterator[Record]]
+
+
+FORMATS: Dict[str, LogFormat] = {}
+
+
+def register_format(log_format: LogFormat) -> LogFormat:
+    """Add a format to the registry. Formats registered first are detected first."""
+    FORMATS[log_format.name] = log_format
+    return log_format
+
+
+def get_format(name: str) -> LogFormat:
+    try:
+        return FORMATS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown log format: {name}. Available formats: {', '.join(FORMATS)}"
+        )
+
+
+def detect_format(sample_lines: List[str]) -> LogFormat:
+    """
+    Return the first registered format that accepts every non-empty sample line.
+    Falls back to the plain format if nothing matches.
+    """
+    lines = [line for line in sample_lines if line.strip()]
+    if lines:
+        for log_format in FORMATS.values():
+            if all(log_format.detect(line) for line in lines):
+                return log_format
+    return FORMATS["plain"]
+
+
+def detect_head_format(head: str) -> LogFormat:
+    """Detect the format from up to DETECT_SAMPLE_BYTES at the start of a file."""
+    lines = head.split("\n")
+    if len(lines) > 1:
+        # The last piece may be a line cut off by the sample size
+        lines = lines[:-1]
+    return detect_format(lines[:DETECT_SAMPLE_LINES])
+
+
+def detect_file_format(log_file: str) -> LogFormat:
+    """Detect the format of a file from its first few lines."""
+    with open(log_file, "rb") as f:
+        head = f.read(DETECT_SAMPLE_BYTES).decode(errors="replace")
+    return detect_head_format(head)
+
+
+def detect_lines_format(lines: Iterator[str]) -> Tuple[LogFormat, Iterator[str]]:
+    """
+    Detect the format from the first lines of a line iterator that cannot be
+    reopened, such as stdin. Returns the format and an iterator over all the
+    lines, including the ones used for detection.
+    """
+    head = list(itertools.islice(lines, DETECT_SAMPLE_LINES))
+    return detect_format(head), itertools.chain(head, lines)
+
+
+def resolve_format(log_file: str, log_format: Optional[str] = None) -> LogFormat:
+    """Return the named format, or the detected one if no name is given."""
+    return get_format(log_format) if log_format else detect_file_format(log_file)
+
+
+# Plain "<timestamp> <source> <destination>" lines
+
+LOG_PATTERN = re.compile(r"^(\d+)\s+(\S+)\s+(\S+)$")
+
+
+def parse_log_line(line: str) -> Optional[Record]:
+    """
+    Parse a single log line into (timestamp, source_host, dest_host).
+    Returns None if the line doesn't match expected format.
+    """
+    match = LOG_PATTERN.match(line.strip())
+    if not match:
+        return None
+
+    timestamp, source, destination = match.groups()
+    return int(timestamp), source, destination
+
+
+def _parse_plain_lines(lines: Iterable[str]) -> Iterator[Record]:
+    """Bulk plain parser: a whitespace split instead of a regex per line."""
+    for line in lines:
+        fields = line.split()
+        if len(fields) == 3 and fields[0].isdecimal():
+            yield int(fields[0]), fields[1], fields[2]
+
+
+register_format(
+    LogFormat(
+        name="plain",
+        detect=lambda line: parse_log_line(line) is not None,
+        parse_line=parse_log_line,
+        parse_lines=_parse_plain_lines,
+    )
+)
+
+
+# CSV exports: timestamp,source,destination[,port,bytes] with an optional header
+
+
+def _parse_csv_line(line: str) -> Optional[Record]:
+    fields = line.split(",", 3)
+    if len(fields) < 3:
+        return None
+    timestamp = fields[0].strip()
+    if not timestamp.isdecimal():
+        # Header row or malformed line
+        return None
+    source = fields[1].strip()
+    destination = fields[2].strip()
+    if not source or not destination:
+        return None
+    return int(timestamp), source, destination
+
+
+def _parse_csv_lines(lines: Iterable[str]) -> Iterator[Record]:
+    for line in lines:
+        fields = line.split(",", 3)
+        if len(fields) >= 3 and fields[0].isdecimal():
+            source = fields[1].strip()
+            destination = fields[2].strip()
+            if source and destination:
+                yield int(fields[0]), source, destination
+        else:
+            parsed = _parse_csv_line(line)
+            if parsed:
+                yield parsed
+
+
+def _detect_csv(line: str) -> bool:
+    fields = [field.strip().lower() for field in line.split(",")]
+    if len(fields) < 3:
+        return False
+    return fields[0].isdecimal() or fields[0] in TIMESTAMP_KEYS
+
+
+register_format(
+    LogFormat(
+        name="csv",
+        detect=_detect_csv,
+        parse_line=_parse_csv_line,
+        parse_lines=_parse_csv_lines,
+    )
+)
+
+
+# JSON lines: {"timestamp": ..., "src": ..., "dst": ..., "port": ..., "bytes": ...}
+
+
+def _scan_json_value(line: str, keys: Tuple[str, ...]) -> Optional[str]:
+    """
+    Find the value of the first matching key without decoding the whole
+    object. Keys are not told apart by nesting level, so this is only used
+    on flat objects. Returns None if the value is not a plain string or
+    integer, in which case the caller falls back to json.loads.
+    """
+    for key in keys:
+        quoted_key = f'"{key}"'
+        colon = -1
+        key_position = line.find(quoted_key)
+        while key_position != -1:
+            # Skip occurrences of the key text in value position
+            after_key = key_position + len(quoted_key)
+            while after_key < len(line) and line[after_key] in " \t":
+                after_key += 1
+            if line.startswith(":", after_key):
+                colon = after_key
+                break
+            key_position = line.find(quoted_key, after_key)
+        if colon == -1:
+            continue
+        start = colon + 1
+        while start < len(line) and line[start] in " \t":
+            start += 1
+        if line.startswith('"', start):
+            end = line.find('"', start + 1)
+            if end == -1 or "\\" in line[start:end]:
+                return None
+            return line[start + 1 : end]
+        end = start
+        while end < len(line) and line[end].isdigit():
+            end += 1
+        return line[start:end] or None
+    return None
+
+
+def _parse_json_line_fully(line: str) -> Optional[Record]:
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(record, dict):
+        return None
+
+    values = []
+    for keys in (TIMESTAMP_KEYS, SOURCE_KEYS, DESTINATION_KEYS):
+        value = next((record[key] for key in keys if key in record), None)
+        if value is None or value == "":
+            return None
+        values.append(value)
+
+    try:
+        return int(values[0]), str(values[1]), str(values[2])
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_json_line(line: str) -> Optional[Record]:
+    # A second brace may open a nested object with keys of the same names
+    if line.count("{") == 1:
+        timestamp = _scan_json_value(line, TIMESTAMP_KEYS)
+        source = _scan_json_value(line, SOURCE_KEYS)
+        destination = _scan_json_value(line, DESTINATION_KEYS)
+        if timestamp and timestamp.isdecimal() and source and destination:
+            return int(timestamp), source, destination
+    if not line.strip():
+        return None
+    return _parse_json_line_fully(line)
+
+
+def _parse_json_lines(lines: Iterable[str]) -> Iterator[Record]:
+    for line in lines:
+        parsed = _parse_json_line(line)
+        if parsed:
+            yield parsed
+
+
+register_format(
+    LogFormat(
+        name="jsonl",
+        detect=lambda line: line.lstrip().startswith("{"),
+        parse_line=_parse_json_line,
+        parse_lines=_parse_json_lines,
+    )
+)
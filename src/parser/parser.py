@@ -1,31 +1,44 @@
-import re
+import mmap
 from datetime import datetime
-from typing import Dict, Set, Tuple, Iterator, Optional
+from typing import BinaryIO, Dict, Iterable, List, Set, Tuple, Iterator, Optional
 
-LOG_PATTERN = re.compile(r"^(\d+)\s+(\S+)\s+(\S+)$")
+from src.parser.bloom_index import HostBlock, candidate_blocks, load_bloom_index
+from src.parser.formats import (
+    DETECT_SAMPLE_BYTES,
+    detect_head_format,
+    detect_lines_format,
+    get_format,
+    parse_log_line,
+    resolve_format,
+)
+from src.parser.reader import (
+    DEFAULT_BUFFER_SIZE,
+    iter_lines_readahead,
+    iter_stream_lines,
+)
+from src.parser.time_index import load_index, seek_offset
 
-
-def parse_log_line(line: str) -> Optional[Tuple[int, str, str]]:
-    """
-    Parse a single log line into (timestamp, source_host, dest_host).
-    Returns None if the line doesn't match expected format.
-    """
-    match = LOG_PATTERN.match(line.strip())
-    if not match:
-        return None
-
-    timestamp, source, destination = match.groups()
-    return int(timestamp), source, destination
+# Bytes that may delimit a host token in any supported format
+DELIMITER_BYTES = frozenset(b" \t\r\n\v\f,\"")
+# Log lines may be out of time order by up to this many seconds
+DISORDER_TOLERANCE_SECONDS = 300
 
 
 def filter_by_timerange(
     log_file: str,
     start_time: Optional[datetime] = None,
     end_time: Optional[datetime] = None,
+    read_ahead: Optional[int] = None,
+    log_format: Optional[str] = None,
 ) -> Iterator[Tuple[int, str, str]]:
     """
     Generator that yields log entries filtered by time range.
     Handles files that may be partially time-sorted (within 5 minutes).
+    If read_ahead is a buffer size in bytes, the file is read by a background
+    thread into buffers of that size so I/O overlaps with parsing.
+    The format (plain, csv, jsonl) is detected from the file unless log_format is given.
+    Sorted files with a current time index (see `log-parser merge --index`)
+    are read only from the indexed position before start_time up to end_time.
     """
     if start_time and end_time and end_time < start_time:
         raise ValueError("End time must be after start time")
@@ -33,15 +46,257 @@ def filter_by_timerange(
     start_timestamp = int(start_time.timestamp()) if start_time else 0
     end_timestamp = int(end_time.timestamp()) if end_time else float("inf")
 
+    parse_lines = get_format(log_format).parse_lines if log_format else None
+    index = load_index(log_file) if start_time or end_time else None
+    if index is not None:
+        with open(log_file, "r") as f:
+            if parse_lines is None:
+                head = f.read(DETECT_SAMPLE_BYTES)
+                parse_lines = detect_head_format(head).parse_lines
+            f.seek(seek_offset(index, start_timestamp))
+            for timestamp, source, destination in parse_lines(f):
+                if timestamp > end_timestamp:
+                    break
+                if timestamp >= start_timestamp:
+                    yield timestamp, source, destination
+        return
+
+    if read_ahead:
+        lines = iter_lines_readahead(log_file, buffer_size=read_ahead)
+    else:
+        lines = _iter_lines(log_file)
+    if parse_lines is None:
+        # Detected from the lines being read rather than by opening the file again
+        detected, lines = detect_lines_format(lines)
+        parse_lines = detected.parse_lines
+
+    for timestamp, source, destination in parse_lines(lines):
+        if start_timestamp <= timestamp <= end_timestamp:
+            yield timestamp, source, destination
+
+
+def filter_stream_by_timerange(
+    stream: BinaryIO,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    read_ahead: Optional[int] = None,
+    log_format: Optional[str] = None,
+    chunk_size: int = DEFAULT_BUFFER_SIZE,
+) -> Iterator[Tuple[int, str, str]]:
+    """
+    Like filter_by_timerange, but for an open binary stream such as stdin,
+    read once from start to end in chunks of chunk_size bytes. If read_ahead
+    is a buffer size, a background thread keeps reading the stream while
+    the previous buffer is parsed, so the writer of a pipe is not held up.
+    The format is detected from the first lines unless log_format is given.
+    """
+    if start_time and end_time and end_time < start_time:
+        raise ValueError("End time must be after start time")
+
+    start_timestamp = int(start_time.timestamp()) if start_time else 0
+    end_timestamp = int(end_time.timestamp()) if end_time else float("inf")
+
+    if read_ahead:
+        lines = iter_lines_readahead(stream, buffer_size=read_ahead)
+    else:
+        lines = iter_stream_lines(stream, chunk_size)
+    if log_format:
+        parse_lines = get_format(log_format).parse_lines
+    else:
+        detected, lines = detect_lines_format(lines)
+        parse_lines = detected.parse_lines
+
+    for timestamp, source, destination in parse_lines(lines):
+        if start_timestamp <= timestamp <= end_timestamp:
+            yield timestamp, source, destination
+
+
+def _iter_lines(log_file: str) -> Iterator[str]:
     with open(log_file, "r") as f:
-        for line in f:
-            parsed = parse_log_line(line)
-            if not parsed:
-                continue
+        yield from f
+
+
+def find_offset_after(
+    log_file: str,
+    timestamp: int,
+    tolerance: int = DISORDER_TOLERANCE_SECONDS,
+    log_format: Optional[str] = None,
+) -> int:
+    """
+    Bisect byte offsets for a line boundary to start reading from so that
+    no line with a timestamp >= timestamp is skipped, reading as little as
+    possible before it.
+
+    Lines are assumed to be out of order by at most tolerance seconds, so
+    every line at or after timestamp follows any line older than
+    timestamp - tolerance. The search keeps a line older than that threshold
+    below it and a newer one (or the end of the file) above it, and returns
+    the start of the line following the lower one.
+    """
+    parse_line = resolve_format(log_file, log_format).parse_line
+    threshold = timestamp - tolerance
+
+    with open(log_file, "rb") as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            return 0
+
+        with buffer:
+            size = len(buffer)
+
+            def line_start(position: int) -> int:
+                if position == 0:
+                    return 0
+                newline = buffer.find(b"\n", position - 1)
+                return size if newline == -1 else newline + 1
+
+            def is_new_from(position: int) -> bool:
+                """Whether the first parsable line at or after position is new enough."""
+                start = line_start(position)
+                while start < size:
+                    end = buffer.find(b"\n", start)
+                    end = size if end == -1 else end
+                    parsed = parse_line(buffer[start:end].decode(errors="replace"))
+                    if parsed:
+                        return parsed[0] >= threshold
+                    start = end + 1
+                return True
+
+            if is_new_from(0):
+                return 0
+            low, high = 0, size
+            while high - low > 1:
+                middle = (low + high) // 2
+                if is_new_from(middle):
+                    high = middle
+                else:
+                    low = middle
+            return line_start(high)
+
+
+def iter_host_lines(
+    log_file: str, hostname: str, blocks: Optional[List[HostBlock]] = None
+) -> Iterator[bytes]:
+    """
+    Memory-map the log and yield only the raw lines that contain hostname
+    as a whole delimited token, e.g. b"host27" but not b"host271".
+    Lines without the token are skipped without being decoded or parsed.
+    If blocks is given, only those line-aligned blocks are searched.
+    """
+    token = hostname.encode()
+    if not token:
+        return
+
+    with open(log_file, "rb") as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            return
+
+        with buffer:
+            size = len(buffer)
+            ranges = [(0, size)] if blocks is None else [b[:2] for b in blocks]
+            for range_start, range_end in ranges:
+                position = buffer.find(token, range_start, range_end)
+                while position != -1:
+                    token_end = position + len(token)
+                    if (position == 0 or buffer[position - 1] in DELIMITER_BYTES) and (
+                        token_end == size or buffer[token_end] in DELIMITER_BYTES
+                    ):
+                        line_start = buffer.rfind(b"\n", 0, position) + 1
+                        line_end = buffer.find(b"\n", token_end)
+                        if line_end == -1:
+                            line_end = size
+                        yield buffer[line_start:line_end]
+                        position = buffer.find(token, line_end, range_end)
+                    else:
+                        position = buffer.find(token, position + 1, range_end)
+
+
+def filter_host_lines_by_timerange(
+    log_file: str,
+    hostname: str,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    log_format: Optional[str] = None,
+    blocks: Optional[List[HostBlock]] = None,
+) -> Iterator[Tuple[int, str, str]]:
+    """
+    Like filter_by_timerange, but only yields entries where hostname is the
+    source or destination, using the mmap prefilter to skip other lines.
+    If blocks is given, only those blocks are searched.
+    """
+    if start_time and end_time and end_time < start_time:
+        raise ValueError("End time must be after start time")
+
+    start_timestamp = int(start_time.timestamp()) if start_time else 0
+    end_timestamp = int(end_time.timestamp()) if end_time else float("inf")
 
-            timestamp, source, destination = parsed
-            if start_timestamp <= timestamp <= end_timestamp:
-                yield timestamp, source, destination
+    parse_line = resolve_format(log_file, log_format).parse_line
+    for raw_line in iter_host_lines(log_file, hostname, blocks):
+        parsed = parse_line(raw_line.decode(errors="replace"))
+        if not parsed:
+            continue
+
+        timestamp, source, destination = parsed
+        if hostname not in (source, destination):
+            continue
+        if start_timestamp <= timestamp <= end_timestamp:
+            yield timestamp, source, destination
+
+
+def host_blocks(
+    log_file: str,
+    hostname: str,
+    as_source: bool = False,
+    as_destination: bool = False,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> Optional[List[HostBlock]]:
+    """
+    The blocks of log_file whose Bloom filters (see `log-parser bloom`) say
+    they may hold hostname as source or destination, as requested, within
+    the time range. Returns None if the file has no current Bloom index.
+    """
+    blocks = load_bloom_index(log_file)
+    if blocks is None:
+        return None
+    return candidate_blocks(
+        blocks,
+        hostname,
+        as_source,
+        as_destination,
+        int(start_time.timestamp()) if start_time else None,
+        int(end_time.timestamp()) if end_time else None,
+    )
+
+
+def filter_blocks_by_timerange(
+    log_file: str,
+    blocks: List[HostBlock],
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    log_format: Optional[str] = None,
+) -> Iterator[Tuple[int, str, str]]:
+    """Like filter_by_timerange, but only reads the given line-aligned blocks."""
+    if start_time and end_time and end_time < start_time:
+        raise ValueError("End time must be after start time")
+
+    start_timestamp = int(start_time.timestamp()) if start_time else 0
+    end_timestamp = int(end_time.timestamp()) if end_time else float("inf")
+
+    parse_lines = resolve_format(log_file, log_format).parse_lines
+    with open(log_file, "rb") as f:
+        for block in blocks:
+            f.seek(block.start)
+            data = f.read(block.end - block.start)
+            lines = data.decode(errors="replace").split("\n")
+            for timestamp, source, destination in parse_lines(lines):
+                if start_timestamp <= timestamp <= end_timestamp:
+                    yield timestamp, source, destination
 
 
 def find_connected_hosts(
@@ -49,15 +304,37 @@ def find_connected_hosts(
     hostname: str,
     start_time: Optional[datetime] = None,
     end_time: Optional[datetime] = None,
+    prefilter: bool = False,
+    read_ahead: Optional[int] = None,
+    use_bloom: bool = True,
 ) -> Set[str]:
     """
     Find all hosts that connected to the specified hostname within the time range.
+    With prefilter=True the file is memory-mapped and only lines containing
+    the hostname are parsed, which is much faster for selective queries.
+    If the file has a current Bloom index and use_bloom is set, only the
+    blocks that may hold connections to hostname are read.
     """
     connected_hosts = set()
+    blocks = None
+    if use_bloom:
+        blocks = host_blocks(
+            log_file,
+            hostname,
+            as_destination=True,
+            start_time=start_time,
+            end_time=end_time,
+        )
+    if prefilter:
+        entries = filter_host_lines_by_timerange(
+            log_file, hostname, start_time, end_time, blocks=blocks
+        )
+    elif blocks is not None:
+        entries = filter_blocks_by_timerange(log_file, blocks, start_time, end_time)
+    else:
+        entries = filter_by_timerange(log_file, start_time, end_time, read_ahead)
 
-    for timestamp, source, destination in filter_by_timerange(
-        log_file, start_time, end_time
-    ):
+    for timestamp, source, destination in entries:
         if destination == hostname:
             connected_hosts.add(source)
 
@@ -69,50 +346,168 @@ def find_hosts_connected_to(
     hostname: str,
     start_time: Optional[datetime] = None,
     end_time: Optional[datetime] = None,
+    prefilter: bool = False,
+    read_ahead: Optional[int] = None,
 ) -> Set[str]:
     """
     Find all hosts that the specified hostname connected to within the time range.
+    With prefilter=True only lines containing the hostname are parsed.
+    With a current Bloom index only the blocks that may hold connections
+    from hostname are read.
     """
     hosts_connected_to = set()
+    blocks = host_blocks(
+        log_file, hostname, as_source=True, start_time=start_time, end_time=end_time
+    )
+    if prefilter:
+        entries = filter_host_lines_by_timerange(
+            log_file, hostname, start_time, end_time, blocks=blocks
+        )
+    elif blocks is not None:
+        entries = filter_blocks_by_timerange(log_file, blocks, start_time, end_time)
+    else:
+        entries = filter_by_timerange(log_file, start_time, end_time, read_ahead)
 
-    for timestamp, source, destination in filter_by_timerange(
-        log_file, start_time, end_time
-    ):
+    for timestamp, source, destination in entries:
         if source == hostname:
             hosts_connected_to.add(destination)
 
     return hosts_connected_to
 
 
+def find_connections_for_hosts(
+    log_file: str,
+    hostnames: Iterable[str],
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    read_ahead: Optional[int] = None,
+) -> Dict[str, Dict[str, Set[str]]]:
+    """
+    Find inbound and outbound connections for many hosts in a single scan.
+    Returns a dictionary mapping each hostname to
+    {"inbound": sources that connected to it, "outbound": hosts it connected to}.
+    """
+    return connections_for_hosts(
+        filter_by_timerange(log_file, start_time, end_time, read_ahead), hostnames
+    )
+
+
+def connections_for_hosts(
+    entries: Iterable[Tuple[int, str, str]], hostnames: Iterable[str]
+) -> Dict[str, Dict[str, Set[str]]]:
+    """
+    Collect the inbound and outbound connections of every host in hostnames
+    from one pass over entries, as find_connections_for_hosts.
+    """
+    results = {host: {"inbound": set(), "outbound": set()} for host in hostnames}
+
+    for timestamp, source, destination in entries:
+        if destination in results:
+            results[destination]["inbound"].add(source)
+        if source in results:
+            results[source]["outbound"].add(destination)
+
+    return results
+
+
 def count_connections_by_host(
     log_file: str,
     start_time: Optional[datetime] = None,
     end_time: Optional[datetime] = None,
+    read_ahead: Optional[int] = None,
+    max_memory: Optional[int] = None,
 ) -> Dict[str, int]:
     """
     Count outgoing connections made by each host within the time range.
     Returns a dictionary mapping hostnames to connection counts.
+    With max_memory, partial counts are spilled to disk during the scan, but
+    the returned dictionary still holds every host; use
+    iter_connections_by_host to keep the whole query within the budget.
     """
+    if max_memory:
+        return dict(
+            iter_connections_by_host(
+                log_file, start_time, end_time, read_ahead, max_memory
+            )
+        )
+
     connection_counts = {}
 
     for timestamp, source, destination in filter_by_timerange(
-        log_file, start_time, end_time
+        log_file, start_time, end_time, read_ahead
     ):
         connection_counts[source] = connection_counts.get(source, 0) + 1
 
     return connection_counts
 
 
+def iter_connections_by_host(
+    log_file: str,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    read_ahead: Optional[int] = None,
+    max_memory: Optional[int] = None,
+) -> Iterator[Tuple[str, int]]:
+    """
+    Yield (hostname, connection count) for each host within the time range.
+    With max_memory, counts are spilled to disk and merged as a stream in
+    hostname order, so the full table of counts is never held in memory.
+    """
+    if not max_memory:
+        yield from count_connections_by_host(
+            log_file, start_time, end_time, read_ahead
+        ).items()
+        return
+
+    with _count_sources_spilling(
+        log_file, start_time, end_time, read_ahead, max_memory
+    ) as counter:
+        yield from counter.items()
+
+
+def _count_sources_spilling(
+    log_file: str,
+    start_time: Optional[datetime],
+    end_time: Optional[datetime],
+    read_ahead: Optional[int],
+    max_memory: int,
+):
+    from src.processing.spill import SpillingCounter
+
+    counter = SpillingCounter(max_memory)
+    try:
+        for timestamp, source, destination in filter_by_timerange(
+            log_file, start_time, end_time, read_ahead
+        ):
+            counter.add(source)
+    except BaseException:
+        counter.close()
+        raise
+    return counter
+
+
 def find_most_active_host(
     log_file: str,
     start_time: Optional[datetime] = None,
     end_time: Optional[datetime] = None,
+    read_ahead: Optional[int] = None,
+    max_memory: Optional[int] = None,
 ) -> Tuple[str, int]:
     """
     Find the host that generated the most connections within the time range.
     Returns tuple of (hostname, connection_count).
+    With max_memory, counts are spilled to disk and merged as a stream, so
+    the full table of counts is never held in memory.
     """
-    connection_counts = count_connections_by_host(log_file, start_time, end_time)
+    if max_memory:
+        with _count_sources_spilling(
+            log_file, start_time, end_time, read_ahead, max_memory
+        ) as counter:
+            return counter.most_common() or ("", 0)
+
+    connection_counts = count_connections_by_host(
+        log_file, start_time, end_time, read_ahead
+    )
 
     if not connection_counts:
         return "", 0
@@ -0,0 +1,155 @@
+"""
+Double-buffered read-ahead reader for sequential log scans.
+
+A background thread fills a small pool of reusable buffers from the file
+while the caller parses the previous one, so disk reads overlap with parsing.
+Open binary streams such as stdin can be read the same way, or in large
+chunks without a thread.
+"""
+
+import contextlib
+import os
+import queue
+import threading
+from typing import BinaryIO, Iterator, Tuple, Union
+
+DEFAULT_BUFFER_SIZE = 4 * 1024 * 1024
+DEFAULT_QUEUE_DEPTH = 2
+
+_POLL_INTERVAL = 0.1
+
+
+def _advise_sequential(fd: int) -> None:
+    """Hint the kernel to read ahead aggressively, where supported."""
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass
+
+
+def _put_unless_stopped(
+    filled_buffers: queue.Queue, item: Tuple, stop: threading.Event
+) -> None:
+    while not stop.is_set():
+        try:
+            filled_buffers.put(item, timeout=_POLL_INTERVAL)
+            return
+        except queue.Full:
+            continue
+
+
+def _open_source(source: Union[str, BinaryIO]):
+    """Open a path for unbuffered reading; an open stream is used as is."""
+    if isinstance(source, str):
+        return open(source, "rb", buffering=0)
+    return contextlib.nullcontext(source)
+
+
+def _fill_buffers(
+    log_file: Union[str, BinaryIO],
+    free_buffers: queue.Queue,
+    filled_buffers: queue.Queue,
+    stop: threading.Event,
+) -> None:
+    """Reader thread: read into free buffers until EOF, an error or stop."""
+    try:
+        with _open_source(log_file) as f:
+            _advise_sequential(f.fileno())
+            while not stop.is_set():
+                try:
+                    buffer = free_buffers.get(timeout=_POLL_INTERVAL)
+                except queue.Empty:
+                    continue
+                length = f.readinto(buffer)
+                _put_unless_stopped(filled_buffers, (buffer, length, None), stop)
+                if not length:
+                    return
+    except Exception as e:
+        _put_unless_stopped(filled_buffers, (None, 0, e), stop)
+
+
+def _split_chunks(chunks: Iterator[Union[bytes, bytearray]]) -> Iterator[str]:
+    """Yield the decoded lines of consecutive chunks of a file."""
+    carry = b""
+    for data in chunks:
+        # Decode only up to the last newline, so multi-byte characters
+        # and partial lines are carried into the next chunk intact
+        data = carry + data
+        last_newline = data.rfind(b"\n")
+        if last_newline == -1:
+            carry = data
+            continue
+        carry = data[last_newline + 1 :]
+        text = data[:last_newline].decode(errors="replace")
+        yield from text.split("\n")
+
+    if carry:
+        yield carry.decode(errors="replace")
+
+
+def iter_stream_lines(
+    stream: BinaryIO, chunk_size: int = DEFAULT_BUFFER_SIZE
+) -> Iterator[str]:
+    """
+    Yield the lines of an open binary stream, such as sys.stdin.buffer,
+    read in chunks of chunk_size bytes in a single forward pass.
+    """
+
+    def chunks() -> Iterator[bytes]:
+        while True:
+            data = stream.read(chunk_size)
+            if not data:
+                return
+            yield data
+
+    return _split_chunks(chunks())
+
+
+def iter_lines_readahead(
+    log_file: Union[str, BinaryIO],
+    buffer_size: int = DEFAULT_BUFFER_SIZE,
+    depth: int = DEFAULT_QUEUE_DEPTH,
+) -> Iterator[str]:
+    """
+    Yield the lines of log_file, reading ahead in a background thread.
+
+    Args:
+        log_file: Path to the log file, or an open binary stream
+        buffer_size: Size of each read buffer in bytes
+        depth: Number of filled buffers that may wait for the parser
+
+    Returns:
+        Iterator of decoded lines without the trailing newline
+    """
+    free_buffers: queue.Queue = queue.Queue()
+    filled_buffers: queue.Queue = queue.Queue(maxsize=depth)
+    for _ in range(depth + 1):
+        free_buffers.put(bytearray(buffer_size))
+
+    stop = threading.Event()
+    reader = threading.Thread(
+        target=_fill_buffers,
+        args=(log_file, free_buffers, filled_buffers, stop),
+        daemon=True,
+    )
+    reader.start()
+
+    def chunks() -> Iterator[bytes]:
+        while True:
+            buffer, length, error = filled_buffers.get()
+            if error is not None:
+                raise error
+            if not length:
+                return
+            data = buffer[:length]
+            free_buffers.put(buffer)
+            yield data
+
+    try:
+        yield from _split_chunks(chunks())
+    finally:
+        stop.set()
+        # A thread blocked reading a pipe only notices stop after its next
+        # read, so do not wait for it; it is a daemon thread
+        reader.join(None if isinstance(log_file, str) else _POLL_INTERVAL)
@@ -0,0 +1,88 @@
+"""
+Sparse time index for time-sorted log files.
+
+A sorted log written by `log-parser merge --index` gets a sidecar file with
+the timestamp and byte offset of the line starting each 64 KiB stride.
+Time-range scans of the log then seek straight to the first stride that can
+hold matching lines and stop at the first line past the range. The index
+records the identity of the log it was built for and is ignored once the
+log changes.
+"""
+
+import json
+import logging
+from bisect import bisect_left
+from typing import List, Optional, Tuple
+
+from src.utils.utils import atomic_write, file_identity
+
+logger = logging.getLogger(__name__)
+
+INDEX_SUFFIX = ".tidx"
+INDEX_STRIDE_BYTES = 64 * 1024
+INDEX_VERSION = 1
+
+IndexEntry = Tuple[int, int]
+
+
+def index_path(log_file: str) -> str:
+    return log_file + INDEX_SUFFIX
+
+
+class TimeIndexBuilder:
+    """Collects (timestamp, offset) entries while a sorted log is written."""
+
+    def __init__(self, stride: int = INDEX_STRIDE_BYTES) -> None:
+        self.stride = stride
+        self.entries: List[IndexEntry] = []
+        self._next_offset = 0
+
+    def add(self, timestamp: int, offset: int) -> None:
+        """Note a line starting at offset; only one line per stride is kept."""
+        if offset >= self._next_offset:
+            self.entries.append((timestamp, offset))
+            self._next_offset = offset + self.stride
+
+
+def save_index(log_file: str, entries: List[IndexEntry]) -> str:
+    """Write the index for log_file atomically and return its path."""
+    path = index_path(log_file)
+    with atomic_write(path) as f:
+        json.dump(
+            {
+                "version": INDEX_VERSION,
+                "source": list(file_identity(log_file)),
+                "entries": entries,
+            },
+            f,
+        )
+    return path
+
+
+def load_index(log_file: str) -> Optional[List[IndexEntry]]:
+    """Return the index entries for log_file, or None if missing or stale."""
+    path = index_path(log_file)
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable time index {path}: {e}")
+        return None
+
+    if data.get("version") != INDEX_VERSION or data.get("source") != list(
+        file_identity(log_file)
+    ):
+        logger.debug(f"Ignoring stale time index {path}")
+        return None
+    return [tuple(entry) for entry in data["entries"]]
+
+
+def seek_offset(entries: List[IndexEntry], start_timestamp: int) -> int:
+    """
+    Offset of the last indexed line older than start_timestamp. Every line
+    before it is older still, so a sorted scan can start there.
+    """
+    position = bisect_left(entries, (start_timestamp, -1)) - 1
+    return entries[position][1] if position >= 0 else 0
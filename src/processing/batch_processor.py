@@ -1,7 +1,26 @@
+import os
 from datetime import datetime
-from typing import Set, Optional
+from typing import BinaryIO, Dict, List, Set, Optional
 
-from src.parser.parser import find_connected_hosts
+from src.parser.parser import (
+    connections_for_hosts,
+    filter_stream_by_timerange,
+    find_connected_hosts,
+    find_connections_for_hosts,
+)
+from src.processing.incremental import unsaved_connected_hosts, update_aggregates
+from src.processing.planner import plan_query
+from src.processing.rollup import (
+    default_rollup_path,
+    load_rollup,
+    rollup_connected_hosts,
+)
+from src.processing.result_cache import (
+    DEFAULT_MAX_CACHE_BYTES,
+    cache_get,
+    cache_put,
+    make_cache_key,
+)
 
 
 def process_batch(
@@ -9,18 +28,231 @@ def process_batch(
     hostname: str,
     start_time: Optional[datetime] = None,
     end_time: Optional[datetime] = None,
+    use_cache: bool = False,
+    cache_dir: Optional[str] = None,
+    max_cache_bytes: int = DEFAULT_MAX_CACHE_BYTES,
+    incremental: bool = False,
+    prefilter: bool = False,
+    read_ahead: Optional[int] = None,
 ) -> Set[str]:
     """
     Process a log file to find hosts connected to the given hostname
     within the specified time range.
 
+    If log_file is a directory, every .log file in it whose time range
+    overlaps the query is processed, as recorded in the directory manifest.
+    Each file is answered with the cheapest plan for it (see planner).
+
     Args:
-        log_file: Path to the log file
+        log_file: Path to the log file or a directory of log files
         hostname: Host to analyze connections to
         start_time: Optional start of time range
         end_time: Optional end of time range
+        use_cache: Serve repeated queries from the on-disk result cache
+        cache_dir: Optional cache directory (defaults to the user cache dir)
+        max_cache_bytes: Size limit enforced by LRU eviction
+        incremental: Reuse persisted aggregates and only scan appended data,
+            whatever the planner would choose
+        prefilter: Memory-map the file and only parse lines containing hostname,
+            whatever the planner would choose
+        read_ahead: Optional buffer size for background read-ahead of the file
 
     Returns:
         Set of hostnames that connected to the specified host
     """
-    return find_connected_hosts(log_file, hostname, start_time, end_time)
+    if os.path.isdir(log_file):
+        # Only directory queries need the manifest
+        from src.processing.manifest import select_log_files
+
+        connected_hosts = set()
+        for file_path in select_log_files(log_file, start_time, end_time):
+            connected_hosts |= process_batch(
+                file_path,
+                hostname,
+                start_time,
+                end_time,
+                use_cache,
+                cache_dir,
+                max_cache_bytes,
+                incremental,
+                prefilter,
+                read_ahead,
+            )
+        return connected_hosts
+
+    if not use_cache:
+        return _scan(
+            log_file,
+            hostname,
+            start_time,
+            end_time,
+            cache_dir,
+            incremental,
+            prefilter,
+            read_ahead,
+        )
+
+    key = make_cache_key(log_file, "connected", hostname, start_time, end_time)
+    cached = cache_get(key, cache_dir)
+    if cached is not None:
+        return set(cached)
+
+    connected_hosts = _scan(
+        log_file,
+        hostname,
+        start_time,
+        end_time,
+        cache_dir,
+        incremental,
+        prefilter,
+        read_ahead,
+    )
+    cache_put(key, sorted(connected_hosts), cache_dir, max_cache_bytes)
+    return connected_hosts
+
+
+def process_batch_hosts(
+    log_file: str,
+    hostnames: List[str],
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    use_cache: bool = False,
+    cache_dir: Optional[str] = None,
+    max_cache_bytes: int = DEFAULT_MAX_CACHE_BYTES,
+    read_ahead: Optional[int] = None,
+) -> Dict[str, Dict[str, Set[str]]]:
+    """
+    Process a log file once to find inbound and outbound connections
+    for every host in hostnames. A directory is handled as in process_batch.
+
+    Args:
+        log_file: Path to the log file or a directory of log files
+        hostnames: Hosts to analyze
+        start_time: Optional start of time range
+        end_time: Optional end of time range
+        use_cache: Serve repeated queries from the on-disk result cache
+        cache_dir: Optional cache directory (defaults to the user cache dir)
+        max_cache_bytes: Size limit enforced by LRU eviction
+        read_ahead: Optional buffer size for background read-ahead of the file
+
+    Returns:
+        Mapping of hostname to {"inbound": set, "outbound": set}
+    """
+    hostnames = sorted(set(hostnames))
+    if os.path.isdir(log_file):
+        from src.processing.manifest import select_log_files
+
+        results = {host: {"inbound": set(), "outbound": set()} for host in hostnames}
+        for file_path in select_log_files(log_file, start_time, end_time):
+            file_results = process_batch_hosts(
+                file_path,
+                hostnames,
+                start_time,
+                end_time,
+                use_cache,
+                cache_dir,
+                max_cache_bytes,
+                read_ahead,
+            )
+            for host, result in file_results.items():
+                for direction, hosts in result.items():
+                    results[host][direction] |= hosts
+        return results
+
+    if not use_cache:
+        return find_connections_for_hosts(
+            log_file, hostnames, start_time, end_time, read_ahead
+        )
+
+    key = make_cache_key(
+        log_file, "hosts", "\n".join(hostnames), start_time, end_time
+    )
+    cached = cache_get(key, cache_dir)
+    if cached is not None:
+        return {
+            host: {direction: set(hosts) for direction, hosts in result.items()}
+            for host, result in cached.items()
+        }
+
+    results = find_connections_for_hosts(
+        log_file, hostnames, start_time, end_time, read_ahead
+    )
+    cache_put(
+        key,
+        {
+            host: {direction: sorted(hosts) for direction, hosts in result.items()}
+            for host, result in results.items()
+        },
+        cache_dir,
+        max_cache_bytes,
+    )
+    return results
+
+
+def process_batch_stream(
+    stream: BinaryIO,
+    hostnames: List[str],
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    read_ahead: Optional[int] = None,
+) -> Dict[str, Dict[str, Set[str]]]:
+    """
+    Like process_batch_hosts, for a log read from an open binary stream such
+    as stdin. The stream is read once, in large chunks, and can be any size;
+    nothing is cached since a stream has no identity to key results on.
+
+    Args:
+        stream: Binary stream of log lines, e.g. sys.stdin.buffer
+        hostnames: Hosts to analyze
+        start_time: Optional start of time range
+        end_time: Optional end of time range
+        read_ahead: Optional buffer size for reading the stream in a
+            background thread while parsing
+
+    Returns:
+        Mapping of hostname to {"inbound": set, "outbound": set}
+    """
+    return connections_for_hosts(
+        filter_stream_by_timerange(stream, start_time, end_time, read_ahead),
+        sorted(set(hostnames)),
+    )
+
+
+def _scan(
+    log_file: str,
+    hostname: str,
+    start_time: Optional[datetime],
+    end_time: Optional[datetime],
+    cache_dir: Optional[str],
+    incremental: bool,
+    prefilter: bool,
+    read_ahead: Optional[int],
+) -> Set[str]:
+    """Answer the query with the cheapest plan that does not use the cache."""
+    plan = plan_query(
+        log_file,
+        hostname,
+        start_time,
+        end_time,
+        cache_dir=cache_dir,
+        incremental=incremental,
+        prefilter=prefilter,
+        read_ahead=read_ahead,
+    )[0]
+    if plan.strategy == "incremental":
+        state = update_aggregates(log_file, hostname, start_time, end_time, cache_dir)
+        return set(state["connected"]) | unsaved_connected_hosts(
+            log_file, hostname, state, start_time, end_time
+        )
+    if plan.strategy == "rollup":
+        buckets = load_rollup(default_rollup_path(log_file))
+        return rollup_connected_hosts(buckets, hostname, start_time, end_time)
+    return find_connected_hosts(
+        log_file,
+        hostname,
+        start_time,
+        end_time,
+        prefilter=plan.strategy == "mmap",
+        read_ahead=plan.read_ahead,
+        use_bloom=plan.strategy in ("bloom", "mmap"),
+    )
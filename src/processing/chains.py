@@ -0,0 +1,247 @@
+"""
+Streaming temporal join for connection chains.
+
+A chain is a connection A -> X followed by a connection X -> B within a
+window of N seconds, the pattern of an attacker pivoting through X. The
+join keeps, for every host, the recent connections into it and out of it.
+A record is matched against the other side as soon as it arrives, so a
+chain is reported when its second record is read, whichever of its two
+records comes first in the stream.
+
+State expires in time order: a heap holds one entry per buffered host, at
+its oldest timestamp, and is popped as the newest timestamp seen moves on,
+so memory is proportional to the records in the window (plus
+DISORDER_TOLERANCE_SECONDS of out-of-order slack) rather than to the length
+of the stream. Each host's buffers are also capped at max_per_host
+entries, dropping the oldest, so one busy host cannot use up memory.
+"""
+
+import heapq
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import (
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from src.parser.parser import DISORDER_TOLERANCE_SECONDS
+from src.processing.metrics import StreamMetrics
+from src.processing.stream_processor import DEFAULT_CHUNK_BYTES, monitor_directory
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_PER_HOST = 1000
+
+
+class Chain(NamedTuple):
+    """source -> pivot at first_time, then pivot -> destination at second_time."""
+
+    source: str
+    pivot: str
+    destination: str
+    first_time: int
+    second_time: int
+
+
+# (timestamp, other host) pairs, in arrival order
+Buffer = Deque[Tuple[int, str]]
+
+
+def _earliest(buffer: Buffer, low: int, high: int, exclude: str) -> Dict[str, int]:
+    """The earliest time in [low, high] of each other host in buffer but exclude."""
+    earliest: Dict[str, int] = {}
+    for timestamp, other in buffer:
+        if low <= timestamp <= high and other != exclude:
+            if earliest.get(other, high + 1) > timestamp:
+                earliest[other] = timestamp
+    return earliest
+
+
+class ChainJoin:
+    """
+    Symmetric temporal join of connections into a host with connections out
+    of it, within window seconds.
+
+    Args:
+        window: Most seconds between the two connections of a chain
+        max_per_host: Most buffered connections per host and direction
+        pivots: Optional hosts to watch as pivots; all hosts if not given
+        lateness: Seconds a record may arrive out of time order and still
+            be joined
+    """
+
+    def __init__(
+        self,
+        window: int,
+        max_per_host: int = DEFAULT_MAX_PER_HOST,
+        pivots: Optional[Iterable[str]] = None,
+        lateness: int = DISORDER_TOLERANCE_SECONDS,
+    ) -> None:
+        self.window = window
+        self.max_per_host = max_per_host
+        self.pivots: Optional[Set[str]] = set(pivots) if pivots else None
+        self.lateness = lateness
+        self.inbound: Dict[str, Buffer] = {}
+        self.outbound: Dict[str, Buffer] = {}
+        self.expiry: List[Tuple[int, str]] = []
+        self.scheduled: Set[str] = set()
+        self.watermark = 0
+        self.dropped = 0
+
+    def buffered(self) -> int:
+        """Connections currently held in the buffers."""
+        return sum(len(b) for b in self.inbound.values()) + sum(
+            len(b) for b in self.outbound.values()
+        )
+
+    def _buffer(
+        self, buffers: Dict[str, Buffer], host: str, timestamp: int, other: str
+    ) -> None:
+        buffer = buffers.get(host)
+        if buffer is None:
+            buffer = buffers[host] = deque()
+        if host not in self.scheduled:
+            self.scheduled.add(host)
+            heapq.heappush(self.expiry, (timestamp, host))
+        buffer.append((timestamp, other))
+        if len(buffer) > self.max_per_host:
+            buffer.popleft()
+            self.dropped += 1
+
+    def _expire(self) -> None:
+        """Drop the buffered connections too old to join any new record."""
+        cutoff = self.watermark - self.window - self.lateness
+        while self.expiry and self.expiry[0][0] < cutoff:
+            _, host = heapq.heappop(self.expiry)
+            oldest = None
+            for buffers in (self.inbound, self.outbound):
+                buffer = buffers.get(host)
+                if buffer is None:
+                    continue
+                while buffer and buffer[0][0] < cutoff:
+                    buffer.popleft()
+                if not buffer:
+                    del buffers[host]
+                elif oldest is None or buffer[0][0] < oldest:
+                    oldest = buffer[0][0]
+            if oldest is None:
+                self.scheduled.discard(host)
+            else:
+                # Each host with buffered connections has exactly one entry
+                heapq.heappush(self.expiry, (oldest, host))
+
+    def add(self, timestamp: int, source: str, destination: str) -> List[Chain]:
+        """Join one connection and return the chains it completes."""
+        if timestamp > self.watermark:
+            self.watermark = timestamp
+            self._expire()
+        elif timestamp < self.watermark - self.window - self.lateness:
+            # Its partners may already have expired
+            return []
+
+        chains = []
+        # As the second connection, with source as the pivot
+        inbound = self.inbound.get(source)
+        if inbound:
+            earliest = _earliest(
+                inbound, timestamp - self.window, timestamp, destination
+            )
+            chains.extend(
+                Chain(first_source, source, destination, first_time, timestamp)
+                for first_source, first_time in earliest.items()
+            )
+        # As the first connection of chains whose second one arrived earlier
+        outbound = self.outbound.get(destination)
+        if outbound:
+            earliest = _earliest(outbound, timestamp, timestamp + self.window, source)
+            chains.extend(
+                Chain(source, destination, last_destination, timestamp, second_time)
+                for last_destination, second_time in earliest.items()
+            )
+
+        pivots = self.pivots
+        if pivots is None or destination in pivots:
+            self._buffer(self.inbound, destination, timestamp, source)
+        if pivots is None or source in pivots:
+            self._buffer(self.outbound, source, timestamp, destination)
+        return chains
+
+
+def print_chain(chain: Chain) -> None:
+    """Default emit function: print one chain as soon as it is found."""
+    first = datetime.fromtimestamp(chain.first_time).strftime("%Y-%m-%d %H:%M:%S")
+    second = datetime.fromtimestamp(chain.second_time).strftime("%H:%M:%S")
+    print(
+        f"CHAIN {chain.source} -> {chain.pivot} -> {chain.destination} "
+        f"at {first} and {second} "
+        f"({chain.second_time - chain.first_time}s apart)",
+        flush=True,
+    )
+
+
+def process_chains(
+    log_dir: str,
+    window: int,
+    max_per_host: int = DEFAULT_MAX_PER_HOST,
+    pivots: Optional[List[str]] = None,
+    max_iterations: Optional[int] = None,
+    chunk_bytes: Optional[int] = DEFAULT_CHUNK_BYTES,
+    chunk_lines: Optional[int] = None,
+    emit: Callable[[Chain], None] = print_chain,
+    metrics: Optional[StreamMetrics] = None,
+    stop: Optional[threading.Event] = None,
+) -> None:
+    """
+    Monitor a directory like process_stream and emit every connection chain
+    completed within window seconds as soon as its records are read.
+
+    Args:
+        log_dir: Directory containing log files to monitor
+        window: Most seconds between the two connections of a chain
+        max_per_host: Most buffered connections per host and direction
+        pivots: Optional hosts to watch as pivots; all hosts if not given
+        max_iterations: Optional maximum number of monitoring iterations (for testing)
+        chunk_bytes: Optional per-file read quota per iteration, in bytes
+        chunk_lines: Optional per-file read quota per iteration, in lines
+        emit: Called with each chain found
+        metrics: Optional metrics to update while streaming
+        stop: Optional event that ends monitoring when set
+    """
+    join = ChainJoin(window, max_per_host, pivots)
+    chains_found = 0
+
+    logger.info(f"Reporting connection chains within {window} seconds")
+
+    def handle_records(records):
+        nonlocal chains_found
+        for timestamp, source, destination in records:
+            for chain in join.add(timestamp, source, destination):
+                chains_found += 1
+                emit(chain)
+
+    def final_report(backlog):
+        logger.info(
+            f"Found {chains_found} chains; {join.buffered()} connections buffered, "
+            f"{join.dropped} dropped from full per-host buffers"
+        )
+
+    monitor_directory(
+        log_dir,
+        handle_records,
+        final_report=final_report,
+        window=window,
+        max_iterations=max_iterations,
+        chunk_bytes=chunk_bytes,
+        chunk_lines=chunk_lines,
+        metrics=metrics,
+        stop=stop,
+    )
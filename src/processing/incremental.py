@@ -0,0 +1,232 @@
+"""
+Incremental batch aggregation for append-only log files.
+
+Partial aggregates for a (file, query) pair are persisted together with the
+byte offset they cover, so the next run only parses the appended tail.
+A shrinking file, a new inode or a changed file head triggers a full rebuild.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Set, TypedDict
+
+from src.parser.formats import detect_file_format
+from src.processing.result_cache import get_cache_dir
+from src.utils.utils import atomic_write
+
+INCREMENTAL_SUBDIR = "incremental"
+HEAD_FINGERPRINT_BYTES = 256
+
+AggregateState = TypedDict(
+    "AggregateState",
+    {
+        "inode": int,
+        "offset": int,
+        "head": str,
+        "head_length": int,
+        "connected": List[str],
+        "connected_to": List[str],
+        "counts": Dict[str, int],
+    },
+)
+
+
+def _state_path(
+    log_file: str,
+    hostname: str,
+    start_time: Optional[datetime],
+    end_time: Optional[datetime],
+    cache_dir: Optional[str],
+) -> str:
+    key_data = [
+        os.path.abspath(log_file),
+        hostname,
+        int(start_time.timestamp()) if start_time else None,
+        int(end_time.timestamp()) if end_time else None,
+    ]
+    key = hashlib.sha256(json.dumps(key_data).encode()).hexdigest()
+    return os.path.join(get_cache_dir(cache_dir), INCREMENTAL_SUBDIR, f"{key}.json")
+
+
+def _head_fingerprint(log_file: str, length: int = HEAD_FINGERPRINT_BYTES) -> str:
+    with open(log_file, "rb") as f:
+        return hashlib.sha256(f.read(length)).hexdigest()
+
+
+def _empty_state(inode: int) -> AggregateState:
+    return {
+        "inode": inode,
+        "offset": 0,
+        "head": "",
+        "head_length": 0,
+        "connected": [],
+        "connected_to": [],
+        "counts": {},
+    }
+
+
+def load_state(path: str) -> Optional[AggregateState]:
+    """Load persisted aggregates, returning None if missing or unreadable."""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def save_state(path: str, state: AggregateState) -> None:
+    """Atomically persist aggregates."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with atomic_write(path) as f:
+        json.dump(state, f)
+
+
+def needs_rebuild(log_file: str, state: Optional[AggregateState]) -> bool:
+    """
+    Detect truncation or rotation since the aggregates were saved:
+    a different inode, a file smaller than the saved offset, or a changed head.
+    """
+    if state is None:
+        return True
+
+    st = os.stat(log_file)
+    if st.st_ino != state["inode"] or st.st_size < state["offset"]:
+        return True
+
+    if state["head_length"]:
+        if _head_fingerprint(log_file, state["head_length"]) != state["head"]:
+            return True
+
+    return False
+
+
+def scan_tail(
+    log_file: str,
+    hostname: str,
+    state: AggregateState,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> AggregateState:
+    """
+    Parse the log from the saved offset and merge new entries into state.
+    An incomplete trailing line is left for the next run.
+    """
+    start_timestamp = int(start_time.timestamp()) if start_time else 0
+    end_timestamp = int(end_time.timestamp()) if end_time else float("inf")
+
+    connected = set(state["connected"])
+    connected_to = set(state["connected_to"])
+    counts = state["counts"]
+    offset = state["offset"]
+
+    parse_line = detect_file_format(log_file).parse_line
+    with open(log_file, "rb") as f:
+        f.seek(offset)
+        for raw_line in f:
+            if not raw_line.endswith(b"\n"):
+                break
+            offset += len(raw_line)
+
+            parsed = parse_line(raw_line.decode(errors="replace"))
+            if not parsed:
+                continue
+
+            timestamp, source, destination = parsed
+            if not start_timestamp <= timestamp <= end_timestamp:
+                continue
+
+            if destination == hostname:
+                connected.add(source)
+            if source == hostname:
+                connected_to.add(destination)
+            counts[source] = counts.get(source, 0) + 1
+
+    state["connected"] = sorted(connected)
+    state["connected_to"] = sorted(connected_to)
+    state["counts"] = counts
+    state["offset"] = offset
+    state["head_length"] = min(offset, HEAD_FINGERPRINT_BYTES)
+    state["head"] = _head_fingerprint(log_file, state["head_length"])
+    return state
+
+
+def unsaved_connected_hosts(
+    log_file: str,
+    hostname: str,
+    state: AggregateState,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> Set[str]:
+    """
+    Hosts connected to hostname in the data past the saved offset: right
+    after an update, a last line without a newline, which is not saved in
+    the aggregates but which a scan of the file would count.
+    """
+    with open(log_file, "rb") as f:
+        f.seek(state["offset"])
+        data = f.read()
+    if not data:
+        return set()
+
+    start_timestamp = int(start_time.timestamp()) if start_time else 0
+    end_timestamp = int(end_time.timestamp()) if end_time else float("inf")
+    parse_lines = detect_file_format(log_file).parse_lines
+    return {
+        source
+        for timestamp, source, destination in parse_lines(
+            data.decode(errors="replace").split("\n")
+        )
+        if destination == hostname and start_timestamp <= timestamp <= end_timestamp
+    }
+
+
+def pending_bytes(
+    log_file: str,
+    hostname: str,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    cache_dir: Optional[str] = None,
+) -> Optional[int]:
+    """
+    Bytes an incremental update would parse, or None if there are no
+    usable aggregates for this file and query.
+    """
+    state = load_state(_state_path(log_file, hostname, start_time, end_time, cache_dir))
+    if needs_rebuild(log_file, state):
+        return None
+    return os.path.getsize(log_file) - state["offset"]
+
+
+def update_aggregates(
+    log_file: str,
+    hostname: str,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    cache_dir: Optional[str] = None,
+) -> AggregateState:
+    """
+    Bring the persisted aggregates for this file and query up to date.
+
+    Args:
+        log_file: Path to the log file
+        hostname: Host to analyze connections to and from
+        start_time: Optional start of time range
+        end_time: Optional end of time range
+        cache_dir: Optional cache directory holding the aggregate state
+
+    Returns:
+        Aggregates covering every complete line currently in the file
+    """
+    if start_time and end_time and end_time < start_time:
+        raise ValueError("End time must be after start time")
+
+    path = _state_path(log_file, hostname, start_time, end_time, cache_dir)
+    state = load_state(path)
+    if needs_rebuild(log_file, state):
+        state = _empty_state(os.stat(log_file).st_ino)
+
+    state = scan_tail(log_file, hostname, state, start_time, end_time)
+    save_state(path, state)
+    return state
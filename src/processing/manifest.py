@@ -0,0 +1,242 @@
+"""
+Per-directory manifest of log file time ranges.
+
+The manifest records, for every .log file in a directory, the file identity
+(inode, size, mtime), the earliest and latest timestamps and the number of
+records, together with the byte offset they cover. Appended data only
+extends an entry; a replaced or truncated file is rescanned. The timestamp
+of an unterminated last line is kept apart from the covered range, since the
+line may still grow, but it counts when deciding whether a file overlaps a
+query. Multi-file
+time-range queries use it to skip files that cannot contain matching lines.
+"""
+
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, TypedDict
+
+from src.parser.formats import detect_file_format
+from src.utils.utils import atomic_write
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = ".log-parser-manifest.json"
+MANIFEST_VERSION = 2
+
+ManifestEntry = TypedDict(
+    "ManifestEntry",
+    {
+        "inode": int,
+        "size": int,
+        "mtime_ns": int,
+        "offset": int,
+        "min_ts": Optional[int],
+        "max_ts": Optional[int],
+        "line_count": int,
+        "tail_ts": Optional[int],
+    },
+)
+
+Manifest = Dict[str, ManifestEntry]
+
+
+def manifest_path(log_dir: str) -> str:
+    return os.path.join(log_dir, MANIFEST_FILE)
+
+
+def load_manifest(log_dir: str) -> Manifest:
+    """Load the manifest of a directory, or an empty one if missing or unreadable."""
+    try:
+        with open(manifest_path(log_dir), "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+        return {}
+    return data.get("files", {})
+
+
+def save_manifest(log_dir: str, manifest: Manifest) -> None:
+    """Write the manifest atomically. A read-only directory is not an error."""
+    path = manifest_path(log_dir)
+    try:
+        with atomic_write(path) as f:
+            json.dump({"version": MANIFEST_VERSION, "files": manifest}, f)
+    except OSError as e:
+        logger.warning(f"Could not write manifest {path}: {e}")
+
+
+def _empty_entry(stat: os.stat_result) -> ManifestEntry:
+    return {
+        "inode": stat.st_ino,
+        "size": 0,
+        "mtime_ns": 0,
+        "offset": 0,
+        "min_ts": None,
+        "max_ts": None,
+        "line_count": 0,
+        "tail_ts": None,
+    }
+
+
+def _add_records(
+    entry: ManifestEntry, min_ts: int, max_ts: int, line_count: int = 1
+) -> None:
+    if entry["min_ts"] is None or min_ts < entry["min_ts"]:
+        entry["min_ts"] = min_ts
+    if entry["max_ts"] is None or max_ts > entry["max_ts"]:
+        entry["max_ts"] = max_ts
+    entry["line_count"] += line_count
+
+
+def is_current(entry: Optional[ManifestEntry], stat: os.stat_result) -> bool:
+    """Whether an entry still describes the file with this stat result."""
+    return (
+        entry is not None
+        and entry["inode"] == stat.st_ino
+        and entry["size"] == stat.st_size
+        and entry["mtime_ns"] == stat.st_mtime_ns
+    )
+
+
+def scan_entry(log_file: str, entry: Optional[ManifestEntry] = None) -> ManifestEntry:
+    """
+    Bring a manifest entry up to date with the file.
+    Only bytes past the entry's offset are read if the file was appended to;
+    a new inode or a shrunken file is scanned from the start.
+    An incomplete trailing line is not covered by the offset, so the next
+    scan reads it again, but its timestamp is recorded as tail_ts.
+    """
+    stat = os.stat(log_file)
+    if is_current(entry, stat):
+        return entry
+    if (
+        entry is None
+        or entry["inode"] != stat.st_ino
+        or stat.st_size < entry["offset"]
+    ):
+        entry = _empty_entry(stat)
+    else:
+        entry = dict(entry)
+
+    parse_line = detect_file_format(log_file).parse_line
+    offset = entry["offset"]
+    entry["tail_ts"] = None
+    with open(log_file, "rb") as f:
+        f.seek(offset)
+        for raw_line in f:
+            parsed = parse_line(raw_line.decode(errors="replace"))
+            if not raw_line.endswith(b"\n"):
+                entry["tail_ts"] = parsed[0] if parsed else None
+                break
+            offset += len(raw_line)
+            if parsed:
+                _add_records(entry, parsed[0], parsed[0])
+
+    entry["offset"] = offset
+    entry["size"] = stat.st_size
+    entry["mtime_ns"] = stat.st_mtime_ns
+    return entry
+
+
+def extend_entry(
+    manifest: Manifest,
+    log_file: str,
+    start_offset: int,
+    end_offset: int,
+    min_ts: Optional[int],
+    max_ts: Optional[int],
+    line_count: int,
+) -> bool:
+    """
+    Merge statistics for records read from [start_offset, end_offset) by
+    another reader, such as the stream processor, into the manifest.
+    The range must continue the entry's coverage (or start a new file at 0);
+    otherwise the entry is left for scan_entry to catch up. Returns True if
+    the manifest changed.
+    """
+    name = os.path.basename(log_file)
+    try:
+        stat = os.stat(log_file)
+    except FileNotFoundError:
+        return manifest.pop(name, None) is not None
+
+    entry = manifest.get(name)
+    if start_offset == 0 and (entry is None or entry["inode"] != stat.st_ino):
+        entry = _empty_entry(stat)
+    elif (
+        entry is None
+        or entry["inode"] != stat.st_ino
+        or entry["offset"] != start_offset
+    ):
+        return False
+
+    if line_count:
+        _add_records(entry, min_ts, max_ts, line_count)
+    entry["offset"] = end_offset
+    # Bytes held back past end_offset leave the entry stale, so that
+    # scan_entry records their timestamp as the tail
+    entry["size"] = stat.st_size if end_offset == stat.st_size else end_offset
+    entry["tail_ts"] = None
+    entry["mtime_ns"] = stat.st_mtime_ns
+    manifest[name] = entry
+    return True
+
+
+def refresh_manifest(log_dir: str) -> Manifest:
+    """Update the manifest of a directory for every .log file in it and save it."""
+    manifest = load_manifest(log_dir)
+    refreshed: Manifest = {}
+    for file_path in sorted(Path(log_dir).glob("*.log")):
+        try:
+            refreshed[file_path.name] = scan_entry(
+                str(file_path), manifest.get(file_path.name)
+            )
+        except FileNotFoundError:
+            continue
+
+    if refreshed != manifest:
+        save_manifest(log_dir, refreshed)
+    return refreshed
+
+
+def overlaps(
+    entry: ManifestEntry, start_time: Optional[datetime], end_time: Optional[datetime]
+) -> bool:
+    """Whether a file may contain records within the time range."""
+    timestamps = [
+        ts
+        for ts in (entry["min_ts"], entry["max_ts"], entry["tail_ts"])
+        if ts is not None
+    ]
+    if not timestamps:
+        return False
+    if start_time and max(timestamps) < int(start_time.timestamp()):
+        return False
+    if end_time and min(timestamps) > int(end_time.timestamp()):
+        return False
+    return True
+
+
+def select_log_files(
+    log_dir: str,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> List[str]:
+    """
+    Return the .log files in log_dir whose time range overlaps the query,
+    refreshing the manifest first.
+    """
+    manifest = refresh_manifest(log_dir)
+    selected = [
+        os.path.join(log_dir, name)
+        for name, entry in sorted(manifest.items())
+        if overlaps(entry, start_time, end_time)
+    ]
+    logger.debug(
+        f"Manifest selected {len(selected)} of {len(manifest)} files in {log_dir}"
+    )
+    return selected
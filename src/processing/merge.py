@@ -0,0 +1,136 @@
+"""
+Time-ordered merge of several log files.
+
+Each file is only sorted to within a few minutes, so its records first pass
+through a bounded reorder buffer: a heap holding the records of the last
+tolerance seconds, released once no earlier record can still arrive. The
+sorted per-file streams are then combined with a heap-based k-way merge.
+"""
+
+import heapq
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from src.parser.parser import DISORDER_TOLERANCE_SECONDS, filter_by_timerange
+from src.parser.time_index import TimeIndexBuilder, index_path, save_index
+from src.utils.utils import atomic_write
+
+logger = logging.getLogger(__name__)
+
+Record = Tuple[int, str, str]
+
+
+def reorder(
+    records: Iterable[Record],
+    tolerance: int = DISORDER_TOLERANCE_SECONDS,
+    source: str = "",
+) -> Iterator[Record]:
+    """
+    Sort records that are out of order by at most tolerance seconds, holding
+    only the last tolerance seconds of records in memory. Records arriving
+    later than that cannot be placed and are yielded immediately.
+    """
+    buffer: List[Tuple[int, int, Record]] = []
+    newest = None
+    late = 0
+    for sequence, record in enumerate(records):
+        timestamp = record[0]
+        if newest is not None and timestamp < newest - tolerance:
+            late += 1
+            yield record
+            continue
+        if newest is None or timestamp > newest:
+            newest = timestamp
+        heapq.heappush(buffer, (timestamp, sequence, record))
+        while buffer[0][0] < newest - tolerance:
+            yield heapq.heappop(buffer)[2]
+
+    while buffer:
+        yield heapq.heappop(buffer)[2]
+
+    if late:
+        logger.warning(
+            f"{late} records in {source or 'input'} were more than {tolerance}s "
+            "out of order and could not be sorted"
+        )
+
+
+def expand_log_paths(paths: Iterable[str]) -> List[str]:
+    """Expand directories to the .log files they contain."""
+    log_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            log_files.extend(str(p) for p in sorted(Path(path).glob("*.log")))
+        else:
+            log_files.append(path)
+    return log_files
+
+
+def merge_logs(
+    log_files: List[str],
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    tolerance: int = DISORDER_TOLERANCE_SECONDS,
+    read_ahead: Optional[int] = None,
+) -> Iterator[Record]:
+    """
+    Yield the records of all log files in one globally time-ordered stream.
+
+    Args:
+        log_files: Paths to the log files, in any supported format
+        start_time: Optional start of time range, as in filter_by_timerange
+        end_time: Optional end of time range, as in filter_by_timerange
+        tolerance: Maximum disorder within each file, in seconds
+        read_ahead: Optional buffer size for background read-ahead of each file
+
+    Returns:
+        Iterator of (timestamp, source, destination); records with equal
+        timestamps keep their file order and then the order of log_files
+    """
+    streams = [
+        reorder(
+            filter_by_timerange(log_file, start_time, end_time, read_ahead),
+            tolerance,
+            log_file,
+        )
+        for log_file in log_files
+    ]
+    return heapq.merge(*streams, key=lambda record: record[0])
+
+
+def write_merged_log(
+    records: Iterable[Record], output_file: str, index: bool = False
+) -> int:
+    """
+    Write records as a plain log, optionally with a time index for the
+    sorted output. Returns the number of records written.
+    """
+    builder = TimeIndexBuilder() if index else None
+    count = 0
+    offset = 0
+    previous = None
+    with atomic_write(output_file) as f:
+        for timestamp, source, destination in records:
+            line = f"{timestamp} {source} {destination}\n"
+            if builder:
+                if previous is not None and timestamp < previous:
+                    logger.warning(
+                        f"Output {output_file} is not fully sorted, "
+                        "not writing a time index"
+                    )
+                    builder = None
+                else:
+                    builder.add(timestamp, offset)
+                    offset += len(line.encode())
+                    previous = timestamp
+            f.write(line)
+            count += 1
+
+    if builder:
+        save_index(output_file, builder.entries)
+    elif os.path.exists(index_path(output_file)):
+        os.remove(index_path(output_file))
+    return count
@@ -0,0 +1,230 @@
+"""
+Stream engine metrics in the Prometheus text exposition format.
+
+The stream records its metrics once per file chunk and per report, never
+per line, so they cost nothing measurable on the hot path. They are exposed
+on a local HTTP port for Prometheus to scrape, or written to a textfile for
+the node_exporter textfile collector.
+"""
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Sequence, Union
+
+from src.utils.utils import atomic_write
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Seconds between a record's timestamp and its ingestion
+LAG_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600)
+REPORT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class Counter:
+    """Monotonically increasing total."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        self.value += amount
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {_format_value(self.value)}"]
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Histogram:
+    """Observations counted into fixed cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float]) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        # bisect_left, since a bucket counts observations <= its bound
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + [float("inf")], self.counts):
+            cumulative += count
+            le = _format_value(bound)
+            lines.append(f'{self.name}_bucket{{le="{le}"}} {cumulative}')
+        lines.append(f"{self.name}_sum {_format_value(self.sum)}")
+        lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+
+Metric = Union[Counter, Gauge, Histogram]
+
+
+class MetricsRegistry:
+    """A set of metrics rendered together."""
+
+    def __init__(self) -> None:
+        self.metrics: List[Metric] = []
+        self.lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            for metric in self.metrics:
+                lines.append(f"# HELP {metric.name} {metric.help_text}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+class StreamMetrics:
+    """
+    The metrics of one stream, updated by the stream loop. If textfile is
+    set, flush() writes them there.
+    """
+
+    def __init__(self, textfile: Optional[str] = None) -> None:
+        self.textfile = textfile
+        self.registry = MetricsRegistry()
+        register = self.registry.register
+        self.lines = register(
+            Counter("log_parser_lines_total", "Complete lines read from tracked files")
+        )
+        self.bytes = register(
+            Counter("log_parser_bytes_total", "Bytes of complete lines read")
+        )
+        self.parse_errors = register(
+            Counter(
+                "log_parser_parse_errors_total",
+                "Lines that could not be parsed as a record",
+            )
+        )
+        self.tracked_files = register(
+            Gauge("log_parser_tracked_files", "Log files currently tracked")
+        )
+        self.backlog = register(
+            Gauge(
+                "log_parser_backlog_bytes",
+                "Bytes appended to tracked files but not read yet",
+            )
+        )
+        self.report_seconds = register(
+            Histogram(
+                "log_parser_report_seconds",
+                "Time taken to generate a report",
+                REPORT_BUCKETS,
+            )
+        )
+        self.ingest_lag = register(
+            Histogram(
+                "log_parser_ingest_lag_seconds",
+                "Age of the newest record of each chunk when it was ingested",
+                LAG_BUCKETS,
+            )
+        )
+
+    def record_chunk(
+        self,
+        bytes_read: int,
+        lines: int,
+        records: int,
+        newest_timestamp: Optional[int],
+        now: Optional[float] = None,
+    ) -> None:
+        """Account for one chunk read from a tracked file."""
+        with self.registry.lock:
+            self.lines.inc(lines)
+            self.bytes.inc(bytes_read)
+            self.parse_errors.inc(max(lines - records, 0))
+            if newest_timestamp is not None:
+                now = time.time() if now is None else now
+                self.ingest_lag.observe(max(now - newest_timestamp, 0))
+
+    def record_state(self, tracked_files: int, backlog_bytes: int) -> None:
+        self.tracked_files.set(tracked_files)
+        self.backlog.set(backlog_bytes)
+
+    def record_report(self, seconds: float) -> None:
+        with self.registry.lock:
+            self.report_seconds.observe(seconds)
+
+    def flush(self) -> None:
+        """Write the textfile, if any; called after each report."""
+        if self.textfile:
+            write_textfile(self.registry, self.textfile)
+
+
+def serve_metrics(
+    registry: MetricsRegistry, port: int, address: str = "127.0.0.1"
+) -> ThreadingHTTPServer:
+    """
+    Serve the metrics at http://address:port/metrics from a daemon thread.
+    Returns the server; call shutdown() on it to stop serving.
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            logger.debug(f"Metrics request: {format % args}")
+
+    server = ThreadingHTTPServer((address, port), MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(
+        target=server.serve_forever, name="log-parser-metrics", daemon=True
+    )
+    thread.start()
+    logger.info(f"Serving metrics on http://{address}:{server.server_port}/metrics")
+    return server
+
+
+def write_textfile(registry: MetricsRegistry, path: str) -> None:
+    """Write the metrics to path atomically, for the textfile collector."""
+    with atomic_write(path) as f:
+        f.write(registry.render())
@@ -0,0 +1,264 @@
+"""
+Cost-based planning of batch queries.
+
+A batch query for the hosts connected to a host can be answered in several
+ways, depending on what exists next to the log and in the cache directory:
+a cached result, incremental aggregates, a time-series rollup, the host
+Bloom filters, the time index, an mmap search for the host, or a plain
+scan. For each file the planner estimates the cost of every applicable
+strategy from the file size, the sidecars, the selectivity of the host
+(sampled from the file) and the number of cores, and picks the cheapest.
+All strategies return the same result as a full scan, including a last
+line without a newline.
+
+The cost model is in estimated seconds, from rates measured on the sample
+data; only the relative order of the estimates matters.
+"""
+
+import mmap
+import os
+from datetime import datetime
+from typing import List, NamedTuple, Optional
+
+from src.parser.bloom_index import candidate_blocks, load_bloom_index
+from src.parser.time_index import load_index, seek_offset
+from src.processing.incremental import pending_bytes
+from src.processing.result_cache import cache_contains, make_cache_key
+from src.processing.rollup import default_rollup_path, rollup_source
+from src.utils.utils import file_identity
+
+# Parsing every line with the bulk parser
+SCAN_BYTES_PER_SECOND = 26e6
+# Parsing line by line, as incremental updates do
+TAIL_BYTES_PER_SECOND = 14e6
+# Searching for the host token in a memory-mapped file
+SEARCH_BYTES_PER_SECOND = 1.4e9
+# Checking and parsing the line around each occurrence of the token
+SECONDS_PER_OCCURRENCE = 0.6e-6
+# Decompressing and loading a rollup
+ROLLUP_BYTES_PER_SECOND = 3e6
+# Reading a result from the cache, or any sidecar
+LOOKUP_SECONDS = 0.001
+
+# Full scans of larger files read ahead in a thread when a core is free
+READ_AHEAD_MIN_BYTES = 64 * 1024 * 1024
+READ_AHEAD_BUFFER_BYTES = 4 * 1024 * 1024
+
+SAMPLE_WINDOWS = 16
+SAMPLE_WINDOW_BYTES = 64 * 1024
+
+
+class Plan(NamedTuple):
+    """One way to answer a query on one file, with its estimated cost."""
+
+    strategy: str
+    seconds: float
+    detail: str
+    read_ahead: Optional[int] = None
+
+
+def _megabytes(size: int) -> str:
+    return f"{size / 1e6:.1f} MB"
+
+
+def count_occurrences(
+    log_file: str, hostname: str, ranges: Optional[List[tuple]] = None
+) -> int:
+    """
+    Estimate how often hostname occurs as a substring in the given byte
+    ranges of log_file (the whole file by default), from evenly spaced
+    sample windows. Small ranges are counted exactly.
+    """
+    token = hostname.encode()
+    size = os.path.getsize(log_file)
+    if not token or not size:
+        return 0
+    ranges = [(0, size)] if ranges is None else ranges
+    total = sum(end - start for start, end in ranges)
+    if not total:
+        return 0
+
+    with open(log_file, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as buffer:
+        if total <= SAMPLE_WINDOWS * SAMPLE_WINDOW_BYTES:
+            return sum(buffer[start:end].count(token) for start, end in ranges)
+
+        occurrences = 0
+        sampled = 0
+        step = total / SAMPLE_WINDOWS
+        for window in range(SAMPLE_WINDOWS):
+            # Map the window's position among all ranges to a file offset
+            position = int(window * step)
+            for start, end in ranges:
+                if position < end - start:
+                    offset = start + position
+                    window_end = min(offset + SAMPLE_WINDOW_BYTES, end)
+                    occurrences += buffer[offset:window_end].count(token)
+                    sampled += window_end - offset
+                    break
+                position -= end - start
+    return round(occurrences * total / max(sampled, 1))
+
+
+def _rollup_aligned(
+    start_time: Optional[datetime], end_time: Optional[datetime]
+) -> bool:
+    """Whether a rollup answers the range exactly: whole minutes only."""
+    if start_time and int(start_time.timestamp()) % 60:
+        return False
+    if end_time and (int(end_time.timestamp()) + 1) % 60:
+        return False
+    return True
+
+
+def _time_index_bytes(
+    log_file: str, start_time: Optional[datetime], end_time: Optional[datetime]
+) -> Optional[int]:
+    """Bytes a time-indexed scan of the range reads, or None if not indexed."""
+    if not start_time and not end_time:
+        return None
+    entries = load_index(log_file)
+    if entries is None:
+        return None
+    start = seek_offset(entries, int(start_time.timestamp())) if start_time else 0
+    end = os.path.getsize(log_file)
+    if end_time:
+        end_timestamp = int(end_time.timestamp())
+        later = [offset for timestamp, offset in entries if timestamp > end_timestamp]
+        if later:
+            end = later[0]
+    return max(end - start, 0)
+
+
+def plan_query(
+    log_file: str,
+    hostname: str,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    use_cache: bool = False,
+    cache_dir: Optional[str] = None,
+    incremental: bool = False,
+    prefilter: bool = False,
+    read_ahead: Optional[int] = None,
+    cores: Optional[int] = None,
+) -> List[Plan]:
+    """
+    The applicable plans for finding the hosts connected to hostname in
+    log_file, cheapest first. A cached result is always used if there is
+    one; otherwise incremental and prefilter force the corresponding
+    strategy, and read_ahead forces read-ahead for full scans.
+    """
+    size = os.path.getsize(log_file)
+    cores = cores or os.cpu_count() or 1
+    plans = []
+
+    if use_cache and cache_contains(
+        make_cache_key(log_file, "connected", hostname, start_time, end_time),
+        cache_dir,
+    ):
+        plans.append(Plan("cache", LOOKUP_SECONDS, "cached result"))
+
+    pending = pending_bytes(log_file, hostname, start_time, end_time, cache_dir)
+    if incremental and pending is None:
+        plans.append(
+            Plan(
+                "incremental",
+                size / TAIL_BYTES_PER_SECOND,
+                f"requested, parse {_megabytes(size)} and save aggregates",
+            )
+        )
+        return plans
+    if pending is not None:
+        plans.append(
+            Plan(
+                "incremental",
+                LOOKUP_SECONDS + pending / TAIL_BYTES_PER_SECOND,
+                f"saved aggregates, parse {_megabytes(pending)} appended since",
+            )
+        )
+        if incremental:
+            return plans
+
+    rollup_path = default_rollup_path(log_file)
+    if (
+        _rollup_aligned(start_time, end_time)
+        and os.path.exists(rollup_path)
+        and rollup_source(rollup_path) == list(file_identity(log_file))
+    ):
+        rollup_size = os.path.getsize(rollup_path)
+        plans.append(
+            Plan(
+                "rollup",
+                rollup_size / ROLLUP_BYTES_PER_SECOND,
+                f"load {_megabytes(rollup_size)} rollup",
+            )
+        )
+
+    blocks = load_bloom_index(log_file)
+    searched = [(0, size)]
+    if blocks is not None:
+        selected = candidate_blocks(
+            blocks,
+            hostname,
+            as_destination=True,
+            start_timestamp=int(start_time.timestamp()) if start_time else None,
+            end_timestamp=int(end_time.timestamp()) if end_time else None,
+        )
+        searched = [(block.start, block.end) for block in selected]
+        block_bytes = sum(end - start for start, end in searched)
+        plans.append(
+            Plan(
+                "bloom",
+                LOOKUP_SECONDS + block_bytes / SCAN_BYTES_PER_SECOND,
+                f"read {len(selected)} of {len(blocks)} blocks, "
+                f"{_megabytes(block_bytes)}",
+            )
+        )
+
+    searched_bytes = sum(end - start for start, end in searched)
+    occurrences = count_occurrences(log_file, hostname, searched)
+    mmap_plan = Plan(
+        "mmap",
+        searched_bytes / SEARCH_BYTES_PER_SECOND
+        + occurrences * SECONDS_PER_OCCURRENCE,
+        f"search {_megabytes(searched_bytes)}"
+        f"{' of Bloom blocks' if blocks is not None else ''}, "
+        f"~{occurrences} occurrences of {hostname}",
+    )
+    if prefilter:
+        plans = [plan for plan in plans if plan.strategy == "cache"]
+        return plans + [mmap_plan._replace(detail=f"requested, {mmap_plan.detail}")]
+    plans.append(mmap_plan)
+
+    # A scan always uses the time index if there is one
+    indexed_bytes = _time_index_bytes(log_file, start_time, end_time)
+    if indexed_bytes is not None:
+        plans.append(
+            Plan(
+                "time-index",
+                indexed_bytes / SCAN_BYTES_PER_SECOND,
+                f"seek and read {_megabytes(indexed_bytes)} of the time range",
+            )
+        )
+    else:
+        if read_ahead is None and cores > 1 and size >= READ_AHEAD_MIN_BYTES:
+            read_ahead = READ_AHEAD_BUFFER_BYTES
+        plans.append(
+            Plan(
+                "scan",
+                size / SCAN_BYTES_PER_SECOND,
+                f"parse {_megabytes(size)}"
+                + (f", read-ahead on {cores} cores" if read_ahead else ""),
+                read_ahead,
+            )
+        )
+    return sorted(plans, key=lambda plan: plan.seconds)
+
+
+def print_plans(log_file: str, plans: List[Plan]) -> None:
+    """Print the plans for one file, marking the chosen one."""
+    print(f"{log_file} ({_megabytes(os.path.getsize(log_file))}):")
+    for position, plan in enumerate(plans):
+        marker = "*" if position == 0 else " "
+        print(f"  {marker} {plan.strategy:<12} {plan.seconds:8.3f}s  {plan.detail}")
@@ -0,0 +1,310 @@
+"""
+Long-running query daemon with an in-memory connection index.
+
+The daemon loads the configured log files into per-file indexes, keeps them
+current with the stream tailer and answers batch-style queries as JSON lines
+over a Unix domain socket.
+"""
+
+import json
+import logging
+import os
+import socket
+import socketserver
+import stat
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from src.processing.result_cache import get_cache_dir
+from src.processing.stream_processor import (
+    FileTracker,
+    create_file_tracker,
+    discover_log_files,
+    read_new_records,
+)
+
+logger = logging.getLogger(__name__)
+
+SOCKET_NAME = "log-parser.sock"
+REFRESH_INTERVAL = 0.5
+QUERY_KINDS = ("connected", "connected_to", "hosts", "counts", "most_active")
+
+
+class ConnectionIndex:
+    """
+    Per-host, time-sorted connection lists for one log file.
+    Lists are appended to as data arrives and re-sorted lazily on query,
+    since files are only sorted to within a few minutes.
+    """
+
+    def __init__(self) -> None:
+        self.by_destination: Dict[str, List[Tuple[int, str]]] = {}
+        self.by_source: Dict[str, List[Tuple[int, str]]] = {}
+        self._unsorted: Set[Tuple[str, str]] = set()
+        self.lock = threading.Lock()
+
+    def clear(self) -> None:
+        with self.lock:
+            self.by_destination = {}
+            self.by_source = {}
+            self._unsorted = set()
+
+    def add(self, timestamp: int, source: str, destination: str) -> None:
+        """Record a connection. Caller must hold the lock."""
+        self._append(self.by_destination, "dst", destination, (timestamp, source))
+        self._append(self.by_source, "src", source, (timestamp, destination))
+
+    def _append(
+        self,
+        index: Dict[str, List[Tuple[int, str]]],
+        role: str,
+        host: str,
+        entry: Tuple[int, str],
+    ) -> None:
+        entries = index.get(host)
+        if entries is None:
+            index[host] = [entry]
+            return
+        if entry[0] < entries[-1][0]:
+            self._unsorted.add((role, host))
+        entries.append(entry)
+
+    def _entries_in_range(
+        self, role: str, host: str, start_ts: int, end_ts: float
+    ) -> List[Tuple[int, str]]:
+        index = self.by_destination if role == "dst" else self.by_source
+        entries = index.get(host)
+        if not entries:
+            return []
+        if (role, host) in self._unsorted:
+            entries.sort()
+            self._unsorted.discard((role, host))
+        low = bisect_left(entries, (start_ts, ""))
+        high = bisect_right(entries, (end_ts, "\U0010ffff"))
+        return entries[low:high]
+
+    def connected_hosts(self, host: str, start_ts: int, end_ts: float) -> Set[str]:
+        with self.lock:
+            entries = self._entries_in_range("dst", host, start_ts, end_ts)
+        return {source for _, source in entries}
+
+    def hosts_connected_to(self, host: str, start_ts: int, end_ts: float) -> Set[str]:
+        with self.lock:
+            entries = self._entries_in_range("src", host, start_ts, end_ts)
+        return {destination for _, destination in entries}
+
+    def connection_counts(self, start_ts: int, end_ts: float) -> Dict[str, int]:
+        counts = {}
+        with self.lock:
+            for source in list(self.by_source):
+                count = len(self._entries_in_range("src", source, start_ts, end_ts))
+                if count:
+                    counts[source] = count
+        return counts
+
+
+class IndexedLogs:
+    """The set of served log files, each with a tracker and an index."""
+
+    def __init__(self, paths: List[str]) -> None:
+        self.paths = paths
+        self.trackers: Dict[str, FileTracker] = {}
+        self.indexes: Dict[str, ConnectionIndex] = {}
+
+    def refresh(self) -> int:
+        """Pick up new files and appended lines. Returns the lines indexed."""
+        for path in self.paths:
+            if os.path.isdir(path):
+                discover_log_files(Path(path), self.trackers)
+            elif path not in self.trackers:
+                self.trackers[path] = create_file_tracker(path)
+
+        indexed = 0
+        for file_path, tracker in list(self.trackers.items()):
+            key = os.path.abspath(file_path)
+            index = self.indexes.setdefault(key, ConnectionIndex())
+            if tracker["last_position"] and (
+                os.path.exists(file_path)
+                and os.path.getsize(file_path) < tracker["last_position"]
+            ):
+                index.clear()
+            try:
+                with index.lock:
+                    for parsed in read_new_records(tracker):
+                        index.add(*parsed)
+                        indexed += 1
+            except FileNotFoundError:
+                logger.info(f"Log file {file_path} was removed, dropping its index")
+                del self.trackers[file_path]
+                self.indexes.pop(key, None)
+            except Exception as e:
+                logger.error(f"Error indexing {file_path}: {e}")
+        return indexed
+
+    def select(self, log_file: Optional[str]) -> List[ConnectionIndex]:
+        if log_file is None:
+            return list(self.indexes.values())
+        key = os.path.abspath(log_file)
+        if key not in self.indexes:
+            raise ValueError(f"{log_file} is not served by this daemon")
+        return [self.indexes[key]]
+
+
+def answer_query(logs: IndexedLogs, request: Dict[str, Any]) -> Any:
+    """Answer a single JSON query against the in-memory indexes."""
+    kind = request.get("query")
+    if kind not in QUERY_KINDS:
+        raise ValueError(f"Unknown query: {kind}")
+
+    start_ts = request.get("start") or 0
+    end_ts = request.get("end")
+    end_ts = float("inf") if end_ts is None else end_ts
+    if end_ts < start_ts:
+        raise ValueError("End time must be after start time")
+    indexes = logs.select(request.get("file"))
+
+    if kind in ("connected", "connected_to"):
+        hosts = set()
+        for index in indexes:
+            if kind == "connected":
+                hosts |= index.connected_hosts(request["host"], start_ts, end_ts)
+            else:
+                hosts |= index.hosts_connected_to(request["host"], start_ts, end_ts)
+        return sorted(hosts)
+
+    if kind == "hosts":
+        results = {}
+        for host in request["hosts"]:
+            inbound, outbound = set(), set()
+            for index in indexes:
+                inbound |= index.connected_hosts(host, start_ts, end_ts)
+                outbound |= index.hosts_connected_to(host, start_ts, end_ts)
+            results[host] = {"inbound": sorted(inbound), "outbound": sorted(outbound)}
+        return results
+
+    counts: Dict[str, int] = {}
+    for index in indexes:
+        for host, count in index.connection_counts(start_ts, end_ts).items():
+            counts[host] = counts.get(host, 0) + count
+    if kind == "counts":
+        return counts
+    if not counts:
+        return ["", 0]
+    return list(max(counts.items(), key=lambda x: x[1]))
+
+
+class QueryHandler(socketserver.StreamRequestHandler):
+    """Reads one JSON request per line and writes one JSON response per line."""
+
+    def handle(self) -> None:
+        for raw_request in self.rfile:
+            try:
+                request = json.loads(raw_request)
+                response = {"result": answer_query(self.server.logs, request)}
+            except (ValueError, KeyError, TypeError) as e:
+                response = {"error": str(e)}
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+            self.wfile.flush()
+
+
+def default_socket_path() -> str:
+    """
+    The socket in the user's runtime directory, or in the cache directory
+    if there is none, so each user has their own daemon.
+    """
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    return os.path.join(runtime_dir or get_cache_dir(), SOCKET_NAME)
+
+
+class QueryServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, logs: IndexedLogs) -> None:
+        self.logs = logs
+        super().__init__(socket_path, QueryHandler)
+
+    def server_bind(self) -> None:
+        super().server_bind()
+        # Only the owner may query the daemon
+        os.chmod(self.server_address, 0o600)
+
+
+def remove_stale_socket(socket_path: str) -> None:
+    """
+    Remove a socket left behind by a daemon that is no longer running.
+    Raises ValueError if the path is not a socket or a daemon is listening.
+    """
+    try:
+        mode = os.stat(socket_path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise ValueError(f"{socket_path} exists and is not a socket")
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except ConnectionRefusedError:
+            os.unlink(socket_path)
+            return
+    raise ValueError(f"Another server is already listening on {socket_path}")
+
+
+def serve(
+    paths: List[str],
+    socket_path: Optional[str] = None,
+    max_iterations: Optional[int] = None,
+) -> None:
+    """
+    Index the given log files and directories and serve queries until interrupted.
+
+    Args:
+        paths: Log files or directories of .log files to serve
+        socket_path: Unix domain socket to listen on, by default
+            default_socket_path()
+        max_iterations: Optional maximum number of refresh iterations (for testing)
+    """
+    if socket_path is None:
+        socket_path = default_socket_path()
+        os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+    remove_stale_socket(socket_path)
+    logs = IndexedLogs(paths)
+    started = time.monotonic()
+    indexed = logs.refresh()
+    logger.info(
+        f"Indexed {indexed} connections from {len(logs.indexes)} files "
+        f"in {time.monotonic() - started:.2f}s"
+    )
+
+    server = QueryServer(socket_path, logs)
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+    logger.info(f"Serving queries on {socket_path}")
+
+    iteration_count = 0
+    try:
+        while not max_iterations or iteration_count < max_iterations:
+            iteration_count += 1
+            time.sleep(REFRESH_INTERVAL)
+            logs.refresh()
+    finally:
+        server.shutdown()
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def query_server(socket_path: str, request: Dict[str, Any]) -> Any:
+    """Send a query to a running daemon and return its result."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        with sock.makefile("rb") as response_file:
+            response = json.loads(response_file.readline())
+
+    if "error" in response:
+        raise ValueError(response["error"])
+    return response["result"]
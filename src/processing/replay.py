@@ -0,0 +1,383 @@
+"""
+Log replay load generator for end-to-end stream soak tests.
+
+A writer process replays an existing log, or synthetic records, into a
+target directory at a configurable speed-up, spread over several files and
+with optional rotation and truncation events. Timestamps are rewritten to
+the time of writing, so the records fall inside the stream window.
+
+The stream under test runs in this process, on the same code path as
+`log-parser stream --subscriptions`. The writer regularly adds probe
+records whose source host carries the time they were written, and the
+stream subscribes to them: the time from writing a probe to seeing it in a
+report is the end-to-end latency. The stream's metrics give the sustained
+and peak ingest rates.
+"""
+
+import logging
+import multiprocessing
+import os
+import queue
+import random
+import threading
+import time
+from typing import Iterable, Iterator, List, Optional, Tuple, TypedDict
+
+from src.parser.parser import filter_by_timerange
+from src.processing.metrics import StreamMetrics
+from src.processing.subscriptions import process_subscriptions
+
+logger = logging.getLogger(__name__)
+
+PROBE_HOST = "replay-probe"
+PROBE_PREFIX = "probe-"
+# Records are written and flushed in batches of this many lines
+BATCH_LINES = 1000
+# Write as fast as possible, to find the maximum ingest rate
+DEFAULT_SPEED = 0.0
+
+Record = Tuple[int, str, str]
+
+ReplayStats = TypedDict(
+    "ReplayStats",
+    {
+        "lines": int,
+        "probes": int,
+        "rotations": int,
+        "truncations": int,
+        "seconds": float,
+    },
+)
+
+ReplayResult = TypedDict(
+    "ReplayResult",
+    {
+        "writer": ReplayStats,
+        "files": int,
+        "ingested_lines": int,
+        "parse_errors": int,
+        "seconds": float,
+        "peak_lines_per_second": float,
+        "latencies": List[float],
+        "lost_probes": int,
+    },
+)
+
+
+class ReplayMetrics(StreamMetrics):
+    """Stream metrics that also note when the last chunk was ingested."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.last_chunk_time: Optional[float] = None
+
+    def record_chunk(self, *args, **kwargs) -> None:
+        super().record_chunk(*args, **kwargs)
+        self.last_chunk_time = time.monotonic()
+
+
+def synthetic_records(
+    lines: int, hosts: int = 1000, seed: Optional[int] = None
+) -> Iterator[Record]:
+    """Records with the same shape as the sample data, about 1.5s apart."""
+    rng = random.Random(seed)
+    timestamp = 1704067200
+    for _ in range(lines):
+        timestamp += rng.randint(0, 3)
+        yield (
+            timestamp,
+            f"host{rng.randint(1, hosts)}",
+            f"host{rng.randint(1, hosts)}",
+        )
+
+
+def replay_records(
+    records: Iterable[Record],
+    target_dir: str,
+    speed: float = DEFAULT_SPEED,
+    fan_out: int = 1,
+    rotate_every: Optional[float] = None,
+    truncate_every: Optional[float] = None,
+    probe_interval: Optional[float] = 1.0,
+    duration: Optional[float] = None,
+) -> ReplayStats:
+    """
+    Write records to fan_out files named replay-N.log in target_dir.
+
+    Args:
+        records: Records to replay, in time order
+        target_dir: Directory to write to, created if needed
+        speed: Speed-up over the original timing; 0 writes as fast as possible
+        fan_out: Number of files the records are spread over
+        rotate_every: Optional seconds between rotations; each rotation
+            renames the next file to replay-N.log.1 and starts it afresh
+        truncate_every: Optional seconds between truncations of the next file
+        probe_interval: Optional seconds between probe records
+        duration: Optional maximum replay time in seconds
+
+    Returns:
+        Counts of the lines, probes and events written and the elapsed time
+    """
+    os.makedirs(target_dir, exist_ok=True)
+    paths = [os.path.join(target_dir, f"replay-{i}.log") for i in range(fan_out)]
+    files = [open(path, "a") for path in paths]
+    pending: List[List[str]] = [[] for _ in paths]
+    stats: ReplayStats = {
+        "lines": 0,
+        "probes": 0,
+        "rotations": 0,
+        "truncations": 0,
+        "seconds": 0.0,
+    }
+    started = time.monotonic()
+    events = {
+        "probe": probe_interval,
+        "rotate": rotate_every,
+        "truncate": truncate_every,
+    }
+    next_event = {
+        name: started + interval for name, interval in events.items() if interval
+    }
+
+    def flush() -> None:
+        for index, lines in enumerate(pending):
+            if lines:
+                files[index].write("".join(lines))
+                files[index].flush()
+                lines.clear()
+
+    def run_events(now: float) -> None:
+        for name, due in list(next_event.items()):
+            if due > now:
+                continue
+            next_event[name] = due + events[name]
+            if name == "probe":
+                f = files[stats["probes"] % fan_out]
+                f.write(
+                    f"{int(time.time())} {PROBE_PREFIX}{time.time_ns() // 1000} "
+                    f"{PROBE_HOST}\n"
+                )
+                f.flush()
+                stats["probes"] += 1
+            elif name == "rotate":
+                index = stats["rotations"] % fan_out
+                files[index].close()
+                os.replace(paths[index], paths[index] + ".1")
+                files[index] = open(paths[index], "a")
+                stats["rotations"] += 1
+            else:
+                index = stats["truncations"] % fan_out
+                files[index].truncate(0)
+                stats["truncations"] += 1
+
+    first_timestamp = None
+    try:
+        for count, (timestamp, source, destination) in enumerate(records):
+            if first_timestamp is None:
+                first_timestamp = timestamp
+            now = time.monotonic()
+            if speed:
+                due = started + (timestamp - first_timestamp) / speed
+                while due > now:
+                    flush()
+                    wake = min([due] + list(next_event.values()))
+                    if duration:
+                        wake = min(wake, started + duration)
+                    time.sleep(max(wake - now, 0))
+                    now = time.monotonic()
+                    run_events(now)
+                    if duration and now - started >= duration:
+                        break
+            if duration and now - started >= duration:
+                break
+
+            pending[count % fan_out].append(
+                f"{int(time.time())} {source} {destination}\n"
+            )
+            stats["lines"] += 1
+            if stats["lines"] % BATCH_LINES == 0:
+                flush()
+                run_events(now)
+        flush()
+    finally:
+        for f in files:
+            f.close()
+    stats["seconds"] = time.monotonic() - started
+    return stats
+
+
+def _replay_worker(
+    results: "multiprocessing.Queue[ReplayStats]",
+    log_file: Optional[str],
+    synthetic_lines: Optional[int],
+    target_dir: str,
+    speed: float,
+    fan_out: int,
+    rotate_every: Optional[float],
+    truncate_every: Optional[float],
+    probe_interval: Optional[float],
+    duration: Optional[float],
+) -> None:
+    if log_file:
+        records = filter_by_timerange(log_file)
+    else:
+        records = synthetic_records(synthetic_lines or 0)
+    results.put(
+        replay_records(
+            records,
+            target_dir,
+            speed,
+            fan_out,
+            rotate_every,
+            truncate_every,
+            probe_interval,
+            duration,
+        )
+    )
+
+
+def run_replay(
+    target_dir: str,
+    log_file: Optional[str] = None,
+    synthetic_lines: Optional[int] = None,
+    speed: float = DEFAULT_SPEED,
+    fan_out: int = 1,
+    rotate_every: Optional[float] = None,
+    truncate_every: Optional[float] = None,
+    probe_interval: Optional[float] = 1.0,
+    duration: Optional[float] = None,
+    report_interval: int = 1,
+) -> ReplayResult:
+    """
+    Replay log_file, or synthetic_lines synthetic records, into target_dir
+    from a writer process while streaming the directory in this process,
+    as in replay_records. The stream stops once the writer is done and the
+    stream has caught up.
+
+    Returns:
+        The writer's stats, the lines the stream ingested, the time until
+        the last of them was ingested, the peak ingest rate over a report
+        interval, and the latency of every probe reported
+    """
+    metrics = ReplayMetrics()
+    stop = threading.Event()
+    latencies: List[float] = []
+    last_report = {"time": time.monotonic(), "lines": 0, "peak": 0.0}
+
+    def collect(subscription, connections_to, connections_from, counts, backlog):
+        reported_us = time.time_ns() // 1000
+        for host in connections_to:
+            if host.startswith(PROBE_PREFIX):
+                written_us = int(host[len(PROBE_PREFIX) :])
+                latencies.append((reported_us - written_us) / 1e6)
+        now = time.monotonic()
+        lines = metrics.lines.value
+        rate = (lines - last_report["lines"]) / max(now - last_report["time"], 1e-9)
+        last_report.update(time=now, lines=lines, peak=max(last_report["peak"], rate))
+
+    results = multiprocessing.Queue()
+    writer = multiprocessing.Process(
+        target=_replay_worker,
+        args=(
+            results,
+            log_file,
+            synthetic_lines,
+            target_dir,
+            speed,
+            fan_out,
+            rotate_every,
+            truncate_every,
+            probe_interval,
+            duration,
+        ),
+        name="log-parser-replay-writer",
+        daemon=True,
+    )
+
+    def stop_when_caught_up() -> None:
+        writer.join()
+        # Give the stream time to see the last writes, then one more report
+        time.sleep(1.5)
+        while metrics.backlog.value:
+            time.sleep(0.1)
+        time.sleep(report_interval + 0.5)
+        stop.set()
+
+    os.makedirs(target_dir, exist_ok=True)
+    if any(name.endswith(".log") for name in os.listdir(target_dir)):
+        logger.warning(
+            f"{target_dir} already contains log files; recent records in them "
+            "are ingested too"
+        )
+    started = time.monotonic()
+    writer.start()
+    threading.Thread(target=stop_when_caught_up, daemon=True).start()
+    process_subscriptions(
+        target_dir,
+        [
+            {
+                "name": "replay",
+                "hosts": [PROBE_HOST],
+                "from_hosts": [],
+                "window": 3600,
+                "interval": report_interval,
+            }
+        ],
+        report_fn=collect,
+        metrics=metrics,
+        stop=stop,
+    )
+    try:
+        writer_stats = results.get(timeout=5)
+    except queue.Empty:
+        raise RuntimeError(
+            f"Replay writer exited with code {writer.exitcode}"
+        ) from None
+    ingest_end = metrics.last_chunk_time or time.monotonic()
+    return {
+        "writer": writer_stats,
+        "files": fan_out,
+        "ingested_lines": metrics.lines.value,
+        "parse_errors": metrics.parse_errors.value,
+        "seconds": ingest_end - started,
+        "peak_lines_per_second": last_report["peak"],
+        "latencies": sorted(latencies),
+        "lost_probes": max(writer_stats["probes"] - len(latencies), 0),
+    }
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+
+def print_replay_result(result: ReplayResult) -> None:
+    writer = result["writer"]
+    written = writer["lines"] + writer["probes"]
+    print(
+        f"Wrote {written} lines in {writer['seconds']:.1f}s "
+        f"({written / max(writer['seconds'], 1e-9):.0f} lines/s) "
+        f"to {result['files']} files, with {writer['rotations']} rotations "
+        f"and {writer['truncations']} truncations"
+    )
+    print(
+        f"Ingested {result['ingested_lines']} lines, "
+        f"{result['ingested_lines'] / max(result['seconds'], 1e-9):.0f} lines/s "
+        f"sustained, {result['peak_lines_per_second']:.0f} lines/s peak, "
+        f"{result['parse_errors']} parse errors"
+    )
+    missed = written - result["ingested_lines"]
+    if missed > 0:
+        print(f"  {missed} lines were not ingested (rotated or truncated first)")
+
+    latencies = result["latencies"]
+    if latencies:
+        print(
+            f"Write-to-report latency over {len(latencies)} probes: "
+            f"p50 {percentile(latencies, 0.5):.2f}s, "
+            f"p90 {percentile(latencies, 0.9):.2f}s, "
+            f"p99 {percentile(latencies, 0.99):.2f}s, "
+            f"max {latencies[-1]:.2f}s"
+        )
+    if result["lost_probes"]:
+        print(f"  {result['lost_probes']} probes were never reported")
@@ -0,0 +1,190 @@
+"""Disk-backed cache of batch query results with size-bounded LRU eviction."""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from src.utils.utils import atomic_write, file_identity
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "log-parser")
+DEFAULT_MAX_CACHE_BYTES = 64 * 1024 * 1024
+CACHE_DIR_ENV = "LOG_PARSER_CACHE_DIR"
+
+RESULTS_SUBDIR = "results"
+STATS_FILE = "stats.json"
+
+
+def get_cache_dir(cache_dir: Optional[str] = None) -> str:
+    """Resolve the cache directory from the argument, the environment or the default."""
+    return cache_dir or os.environ.get(CACHE_DIR_ENV) or DEFAULT_CACHE_DIR
+
+
+def _timestamp_or_none(dt: Optional[datetime]) -> Optional[int]:
+    return int(dt.timestamp()) if dt else None
+
+
+def make_cache_key(
+    log_file: str,
+    kind: str,
+    hostname: Optional[str] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> str:
+    """Build a cache key from the file identity and the query parameters."""
+    key_data = [
+        list(file_identity(log_file)),
+        kind,
+        hostname,
+        _timestamp_or_none(start_time),
+        _timestamp_or_none(end_time),
+    ]
+    encoded = json.dumps(key_data, sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _results_dir(cache_dir: Optional[str]) -> str:
+    return os.path.join(get_cache_dir(cache_dir), RESULTS_SUBDIR)
+
+
+def _entry_path(key: str, cache_dir: Optional[str]) -> str:
+    return os.path.join(_results_dir(cache_dir), f"{key}.json")
+
+
+def _update_stats(cache_dir: Optional[str], field: str) -> None:
+    """Best-effort hit/miss bookkeeping; a lost update only skews the stats."""
+    stats_path = os.path.join(get_cache_dir(cache_dir), STATS_FILE)
+    try:
+        with open(stats_path, "r") as f:
+            stats = json.load(f)
+    except (FileNotFoundError, ValueError):
+        stats = {}
+    stats[field] = stats.get(field, 0) + 1
+    try:
+        os.makedirs(get_cache_dir(cache_dir), exist_ok=True)
+        with open(stats_path, "w") as f:
+            json.dump(stats, f)
+    except OSError:
+        pass
+
+
+def cache_contains(key: str, cache_dir: Optional[str] = None) -> bool:
+    """Whether key has a cached result, without counting a hit or miss."""
+    return os.path.exists(_entry_path(key, cache_dir))
+
+
+def cache_get(key: str, cache_dir: Optional[str] = None) -> Optional[Any]:
+    """
+    Return the cached result for key, or None on a miss.
+    A hit refreshes the entry's mtime, which is what LRU eviction orders by.
+    """
+    path = _entry_path(key, cache_dir)
+    try:
+        with open(path, "r") as f:
+            payload = json.load(f)
+        os.utime(path)
+    except (FileNotFoundError, ValueError):
+        _update_stats(cache_dir, "misses")
+        return None
+
+    _update_stats(cache_dir, "hits")
+    return payload["result"]
+
+
+def cache_put(
+    key: str,
+    result: Any,
+    cache_dir: Optional[str] = None,
+    max_bytes: int = DEFAULT_MAX_CACHE_BYTES,
+) -> None:
+    """Store a JSON-serializable result and evict old entries beyond max_bytes."""
+    results_dir = _results_dir(cache_dir)
+    os.makedirs(results_dir, exist_ok=True)
+
+    with atomic_write(_entry_path(key, cache_dir)) as f:
+        json.dump({"result": result}, f)
+
+    evict_lru(cache_dir, max_bytes)
+
+
+def _list_entries(cache_dir: Optional[str]):
+    """Return (mtime, size, path) for every cache entry."""
+    results_dir = _results_dir(cache_dir)
+    entries = []
+    try:
+        names = os.listdir(results_dir)
+    except FileNotFoundError:
+        return entries
+
+    for name in names:
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(results_dir, name)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+    return entries
+
+
+def evict_lru(
+    cache_dir: Optional[str] = None, max_bytes: int = DEFAULT_MAX_CACHE_BYTES
+) -> int:
+    """
+    Remove least recently used entries until the cache fits in max_bytes.
+    Returns the number of entries removed.
+    """
+    entries = sorted(_list_entries(cache_dir))
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+
+    return removed
+
+
+def cache_stats(cache_dir: Optional[str] = None) -> Dict[str, Any]:
+    """Summarize the cache contents and hit/miss counts."""
+    entries = _list_entries(cache_dir)
+    stats_path = os.path.join(get_cache_dir(cache_dir), STATS_FILE)
+    try:
+        with open(stats_path, "r") as f:
+            counters = json.load(f)
+    except (FileNotFoundError, ValueError):
+        counters = {}
+
+    return {
+        "cache_dir": get_cache_dir(cache_dir),
+        "entries": len(entries),
+        "total_bytes": sum(size for _, size, _ in entries),
+        "hits": counters.get("hits", 0),
+        "misses": counters.get("misses", 0),
+    }
+
+
+def cache_clear(cache_dir: Optional[str] = None) -> int:
+    """Delete every cache entry and reset the counters. Returns entries removed."""
+    removed = 0
+    for _, _, path in _list_entries(cache_dir):
+        try:
+            os.unlink(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+
+    try:
+        os.unlink(os.path.join(get_cache_dir(cache_dir), STATS_FILE))
+    except FileNotFoundError:
+        pass
+
+    return removed
@@ -0,0 +1,237 @@
+"""
+Pre-aggregated time-series rollups of connection counts.
+
+One pass over a log produces per-host and per-edge connection counts in
+minute, hour and day buckets. Range and histogram queries are then answered
+from the rollup file, combining the coarsest buckets that fit the range.
+"""
+
+import gzip
+import json
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from src.parser.parser import filter_by_timerange
+from src.utils.utils import TIME_INTERVALS, atomic_write, file_identity
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_VERSION = 1
+ROLLUP_SUFFIX = ".rollup.json.gz"
+INTERVALS = TIME_INTERVALS
+BUCKET_SIZES = sorted(INTERVALS.values(), reverse=True)
+
+# bucket size -> bucket start -> {"hosts": {source: n}, "edges": {"src dst": n}}
+Buckets = Dict[int, Dict[int, Dict[str, Dict[str, int]]]]
+
+
+def default_rollup_path(log_file: str) -> str:
+    """Return the rollup path stored next to the log file."""
+    return log_file + ROLLUP_SUFFIX
+
+
+def build_rollup(
+    log_file: str,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> Buckets:
+    """
+    Count connections per source host and per edge in every bucket size
+    with a single scan of the log.
+    """
+    buckets: Buckets = {size: {} for size in BUCKET_SIZES}
+
+    for timestamp, source, destination in filter_by_timerange(
+        log_file, start_time, end_time
+    ):
+        edge = f"{source} {destination}"
+        for size, level in buckets.items():
+            bucket_start = timestamp - timestamp % size
+            bucket = level.get(bucket_start)
+            if bucket is None:
+                bucket = level[bucket_start] = {"hosts": {}, "edges": {}}
+            hosts = bucket["hosts"]
+            edges = bucket["edges"]
+            hosts[source] = hosts.get(source, 0) + 1
+            edges[edge] = edges.get(edge, 0) + 1
+
+    return buckets
+
+
+def save_rollup(buckets: Buckets, log_file: str, output_path: str) -> None:
+    """Write the rollup as gzip-compressed JSON, tagged with the source identity."""
+    payload = {
+        "version": ROLLUP_VERSION,
+        "source": list(file_identity(log_file)),
+        "buckets": {
+            str(size): {str(start): bucket for start, bucket in level.items()}
+            for size, level in buckets.items()
+        },
+    }
+    with atomic_write(output_path, "wt", gzip.open) as f:
+        json.dump(payload, f, separators=(",", ":"))
+
+
+def rollup_source(rollup_path: str) -> Optional[list]:
+    """
+    The source identity a rollup was built for, read from the head of the
+    file without loading the buckets. None if it cannot be read.
+    """
+    try:
+        with gzip.open(rollup_path, "rt") as f:
+            head = f.read(1024)
+        start = head.index('"source":') + len('"source":')
+        source, _ = json.JSONDecoder().raw_decode(head, start)
+    except (OSError, ValueError, EOFError):
+        return None
+    return source
+
+
+def load_rollup(rollup_path: str) -> Buckets:
+    """Load a rollup file, warning if its source log has changed since."""
+    with gzip.open(rollup_path, "rt") as f:
+        payload = json.load(f)
+
+    if payload.get("version") != ROLLUP_VERSION:
+        raise ValueError(f"Unsupported rollup version in {rollup_path}")
+
+    source_path = payload["source"][0]
+    try:
+        if list(file_identity(source_path)) != payload["source"]:
+            logger.warning(
+                f"{source_path} changed since the rollup was built, results may be stale"
+            )
+    except FileNotFoundError:
+        pass
+
+    return {
+        int(size): {int(start): bucket for start, bucket in level.items()}
+        for size, level in payload["buckets"].items()
+    }
+
+
+def _bounds(
+    buckets: Buckets,
+    start_time: Optional[datetime],
+    end_time: Optional[datetime],
+) -> Tuple[int, int]:
+    """
+    Convert an inclusive time range to a half-open range of whole minutes.
+    Open ends extend to the first or last bucket in the rollup.
+    """
+    finest = min(BUCKET_SIZES)
+    day_starts = buckets[max(BUCKET_SIZES)].keys()
+    if not day_starts:
+        return 0, 0
+
+    if start_time:
+        low = int(start_time.timestamp())
+        low -= low % finest
+    else:
+        low = min(day_starts)
+
+    if end_time:
+        high = int(end_time.timestamp())
+        high = high - high % finest + finest
+    else:
+        high = max(day_starts) + max(BUCKET_SIZES)
+
+    return low, high
+
+
+def _covering_buckets(low: int, high: int) -> List[Tuple[int, int]]:
+    """
+    Decompose [low, high) into (bucket size, bucket start) pairs,
+    using the coarsest aligned bucket that fits at every step.
+    """
+    covering = []
+    position = low
+    while position < high:
+        for size in BUCKET_SIZES:
+            if position % size == 0 and position + size <= high:
+                covering.append((size, position))
+                position += size
+                break
+    return covering
+
+
+def _sum_range(buckets: Buckets, low: int, high: int, field: str) -> Dict[str, int]:
+    totals: Dict[str, int] = {}
+    for size, bucket_start in _covering_buckets(low, high):
+        bucket = buckets[size].get(bucket_start)
+        if not bucket:
+            continue
+        for key, count in bucket[field].items():
+            totals[key] = totals.get(key, 0) + count
+    return totals
+
+
+def rollup_host_counts(
+    buckets: Buckets,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> Dict[str, int]:
+    """
+    Count outgoing connections per host within the time range, like
+    count_connections_by_host but at minute resolution.
+    """
+    low, high = _bounds(buckets, start_time, end_time)
+    return _sum_range(buckets, low, high, "hosts")
+
+
+def rollup_edge_counts(
+    buckets: Buckets,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> Dict[Tuple[str, str], int]:
+    """Count connections per (source, destination) edge within the time range."""
+    low, high = _bounds(buckets, start_time, end_time)
+    return {
+        tuple(edge.split(" ", 1)): count
+        for edge, count in _sum_range(buckets, low, high, "edges").items()
+    }
+
+
+def rollup_connected_hosts(
+    buckets: Buckets,
+    hostname: str,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> Set[str]:
+    """Hosts that connected to hostname within the time range, at minute resolution."""
+    return {
+        source
+        for source, destination in rollup_edge_counts(buckets, start_time, end_time)
+        if destination == hostname
+    }
+
+
+def rollup_histogram(
+    buckets: Buckets,
+    interval: int,
+    hostname: Optional[str] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> List[Tuple[int, int]]:
+    """
+    Return (slot start, connection count) pairs for consecutive slots of
+    interval seconds, counting all hosts or only connections from hostname.
+    """
+    finest = min(BUCKET_SIZES)
+    if interval <= 0 or interval % finest:
+        raise ValueError(f"Histogram interval must be a multiple of {finest} seconds")
+
+    low, high = _bounds(buckets, start_time, end_time)
+
+    histogram = []
+    for slot_start in range(low - low % interval, high, interval):
+        slot_low = max(slot_start, low)
+        slot_high = min(slot_start + interval, high)
+        counts = _sum_range(buckets, slot_low, slot_high, "hosts")
+        if hostname is None:
+            total = sum(counts.values())
+        else:
+            total = counts.get(hostname, 0)
+        histogram.append((slot_start, total))
+    return histogram
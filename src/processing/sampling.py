@@ -0,0 +1,278 @@
+"""
+Approximate batch queries from randomly sampled blocks of a log file.
+
+The file is split into fixed-size byte ranges and blocks are read through
+mmap in random order. Every line belongs to the block it starts in, so the
+sampled blocks are a simple random sample of the file and per-block counts
+scale up to unbiased estimates of the totals. Estimates are refined for as
+long as the sampling rate or time budget allows and become exact once every
+block has been read.
+"""
+
+import math
+import mmap
+import random
+import time
+from datetime import datetime
+from typing import Dict, Iterator, NamedTuple, Optional, Set, Tuple, TypedDict
+
+from src.parser.formats import resolve_format
+
+DEFAULT_BLOCK_SIZE = 256 * 1024
+REFINE_INTERVAL = 0.5
+# Two-sided 95% confidence intervals
+CONFIDENCE_Z = 1.96
+
+
+class Estimate(NamedTuple):
+    value: float
+    low: float
+    high: float
+
+
+SampleEstimate = TypedDict(
+    "SampleEstimate",
+    {
+        "blocks_sampled": int,
+        "blocks_total": int,
+        "elapsed": float,
+        "exact": bool,
+        "total": Estimate,
+        "counts": Dict[str, Estimate],
+        "most_active": Optional[Tuple[str, Estimate]],
+        "connected_hosts": Set[str],
+    },
+)
+
+
+def read_block(buffer: mmap.mmap, offset: int, block_size: int) -> str:
+    """
+    Return the lines that start inside [offset, offset + block_size),
+    including the tail of the last line if it runs past the block.
+    """
+    size = len(buffer)
+    if offset == 0:
+        start = 0
+    else:
+        newline = buffer.find(b"\n", offset - 1)
+        if newline == -1:
+            return ""
+        start = newline + 1
+    block_end = min(offset + block_size, size)
+    if start >= block_end:
+        return ""
+
+    end = buffer.find(b"\n", block_end - 1)
+    if end == -1:
+        end = size
+    return buffer[start:end].decode(errors="replace")
+
+
+def _estimate(
+    block_sum: int,
+    block_sum_squares: int,
+    sampled: int,
+    total_blocks: int,
+    known: int = 0,
+) -> Estimate:
+    """
+    Scale a per-block sample sum to all blocks, with a confidence interval.
+    known is an exact count from blocks outside the sample, added as is.
+    """
+    if sampled >= total_blocks:
+        exact = float(block_sum + known)
+        return Estimate(exact, exact, exact)
+    if not sampled:
+        return Estimate(float(known), float(known), math.inf)
+
+    mean = block_sum / sampled
+    value = mean * total_blocks
+    if sampled > 1:
+        variance = max(block_sum_squares - block_sum * mean, 0) / (sampled - 1)
+    else:
+        # A single block says nothing about the spread, so bound it by its own count
+        variance = block_sum * block_sum
+    # Finite population correction: blocks are drawn without replacement
+    correction = 1 - sampled / total_blocks
+    margin = CONFIDENCE_Z * total_blocks * math.sqrt(variance * correction / sampled)
+    # The true count can never be lower than what has already been seen
+    low = max(value - margin, float(block_sum))
+    return Estimate(value + known, low + known, value + margin + known)
+
+
+def _count_block(
+    text: str,
+    parse_lines,
+    hostname: str,
+    start_timestamp: int,
+    end_timestamp: float,
+    connected_hosts: Set[str],
+) -> Dict[str, int]:
+    """Count connections per source host in a block, collecting connected hosts."""
+    block_counts: Dict[str, int] = {}
+    for timestamp, source, destination in parse_lines(text.split("\n")):
+        if not start_timestamp <= timestamp <= end_timestamp:
+            continue
+        block_counts[source] = block_counts.get(source, 0) + 1
+        if destination == hostname:
+            connected_hosts.add(source)
+    return block_counts
+
+
+def iter_sample_estimates(
+    log_file: str,
+    hostname: str,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    rate: Optional[float] = None,
+    time_budget: Optional[float] = None,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    seed: Optional[int] = None,
+) -> Iterator[SampleEstimate]:
+    """
+    Sample random blocks of log_file and yield progressively refined estimates.
+
+    A shorter final block would bias the per-block mean, so it is always
+    read first and counted exactly; only the full-size blocks are sampled.
+
+    Args:
+        log_file: Path to the log file
+        hostname: Host whose connected hosts are listed
+        start_time: Optional start of the time range
+        end_time: Optional end of the time range
+        rate: Fraction of blocks to read, between 0 and 1 (default: all)
+        time_budget: Stop sampling after this many seconds
+        block_size: Size of each sampled byte range
+        seed: Seed for the block order, for reproducible samples
+
+    Returns:
+        Iterator of estimates, one per refinement; the last one is final
+    """
+    if rate is not None and not 0 < rate <= 1:
+        raise ValueError(f"Sample rate must be between 0 and 1, got {rate}")
+    if start_time and end_time and end_time < start_time:
+        raise ValueError("End time must be after start time")
+
+    start_timestamp = int(start_time.timestamp()) if start_time else 0
+    end_timestamp = int(end_time.timestamp()) if end_time else float("inf")
+    parse_lines = resolve_format(log_file).parse_lines
+
+    started = time.monotonic()
+    deadline = started + time_budget if time_budget is not None else None
+    block_sums: Dict[str, int] = {}
+    block_sum_squares: Dict[str, int] = {}
+    total_sum = 0
+    total_sum_squares = 0
+    tail_counts: Dict[str, int] = {}
+    connected_hosts: Set[str] = set()
+    sampled = 0
+
+    with open(log_file, "rb") as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            buffer = None
+
+        size = len(buffer) if buffer is not None else 0
+        full_blocks, tail_size = divmod(size, block_size)
+        total_blocks = full_blocks + (1 if tail_size else 0)
+        target = full_blocks
+        if rate is not None and full_blocks:
+            target = max(1, math.ceil(total_blocks * rate) - (1 if tail_size else 0))
+        order = list(range(full_blocks))
+        random.Random(seed).shuffle(order)
+
+        def snapshot() -> SampleEstimate:
+            counts = {}
+            for host in set(block_sums) | set(tail_counts):
+                counts[host] = _estimate(
+                    block_sums.get(host, 0),
+                    block_sum_squares.get(host, 0),
+                    sampled,
+                    full_blocks,
+                    tail_counts.get(host, 0),
+                )
+            most_active = None
+            if counts:
+                most_active = max(counts.items(), key=lambda x: (x[1].value, x[0]))
+            return {
+                "blocks_sampled": sampled + (1 if tail_size else 0),
+                "blocks_total": total_blocks,
+                "elapsed": time.monotonic() - started,
+                "exact": sampled == full_blocks,
+                "total": _estimate(
+                    total_sum,
+                    total_sum_squares,
+                    sampled,
+                    full_blocks,
+                    sum(tail_counts.values()),
+                ),
+                "counts": counts,
+                "most_active": most_active,
+                "connected_hosts": set(connected_hosts),
+            }
+
+        try:
+            if tail_size:
+                tail_counts = _count_block(
+                    read_block(buffer, full_blocks * block_size, block_size),
+                    parse_lines,
+                    hostname,
+                    start_timestamp,
+                    end_timestamp,
+                    connected_hosts,
+                )
+
+            next_refinement = started + REFINE_INTERVAL
+            for block_index in order[:target]:
+                if deadline is not None and time.monotonic() >= deadline and sampled:
+                    break
+
+                block_counts = _count_block(
+                    read_block(buffer, block_index * block_size, block_size),
+                    parse_lines,
+                    hostname,
+                    start_timestamp,
+                    end_timestamp,
+                    connected_hosts,
+                )
+                block_total = 0
+                for host, count in block_counts.items():
+                    block_sums[host] = block_sums.get(host, 0) + count
+                    block_sum_squares[host] = (
+                        block_sum_squares.get(host, 0) + count * count
+                    )
+                    block_total += count
+                total_sum += block_total
+                total_sum_squares += block_total * block_total
+                sampled += 1
+
+                now = time.monotonic()
+                if now >= next_refinement and sampled < target:
+                    yield snapshot()
+                    next_refinement = now + REFINE_INTERVAL
+        finally:
+            if buffer is not None:
+                buffer.close()
+
+        yield snapshot()
+
+
+def sample_batch(
+    log_file: str,
+    hostname: str,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    rate: Optional[float] = None,
+    time_budget: Optional[float] = None,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    seed: Optional[int] = None,
+) -> SampleEstimate:
+    """Return the final estimate of iter_sample_estimates."""
+    estimate = None
+    for estimate in iter_sample_estimates(
+        log_file, hostname, start_time, end_time, rate, time_budget, block_size, seed
+    ):
+        pass
+    return estimate
@@ -0,0 +1,307 @@
+"""
+Sharded stream ingestion for directories with many actively written logs.
+
+Each worker process owns the log files whose path hashes to its shard and
+tails them with the monitoring loop process_stream uses. Once per flush
+interval a worker sends what it read as a compact partial aggregate: the
+host sets, per-host counts, backlog and manifest updates. The coordinator merges the
+partials, maintains the directory manifest and prints the reports, so
+ingestion scales with the number of worker processes.
+"""
+
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple, TypedDict, Union
+
+from src.processing.manifest import extend_entry, load_manifest, save_manifest
+from src.processing.spill import SpillingCounter
+from src.processing.stream_processor import (
+    DEFAULT_CHUNK_BYTES,
+    REPORT_INTERVAL_SECONDS,
+    ManifestUpdate,
+    aggregate_records,
+    generate_report,
+    monitor_directory,
+    new_connection_counts,
+)
+
+logger = logging.getLogger(__name__)
+
+# How often a worker sends its partial aggregate to the coordinator
+FLUSH_INTERVAL_SECONDS = 1.0
+
+PartialAggregate = TypedDict(
+    "PartialAggregate",
+    {
+        "shard": int,
+        "connections_to": Set[str],
+        "connections_from": Set[str],
+        "connection_counts": Dict[str, int],
+        "backlog": Dict[str, int],
+        "manifest_updates": List[Tuple[str, ManifestUpdate]],
+        "removed": List[str],
+        "done": bool,
+    },
+)
+
+
+def shard_for(file_path: str, shards: int) -> int:
+    """Shard that owns file_path; stable across processes and runs."""
+    return zlib.crc32(file_path.encode()) % shards
+
+
+def new_partial(shard: int) -> PartialAggregate:
+    return {
+        "shard": shard,
+        "connections_to": set(),
+        "connections_from": set(),
+        "connection_counts": {},
+        "backlog": {},
+        "manifest_updates": [],
+        "removed": [],
+        "done": False,
+    }
+
+
+def run_shard(
+    shard: int,
+    shards: int,
+    log_dir: str,
+    target_host: str,
+    from_host: Optional[str],
+    partials: "multiprocessing.Queue[PartialAggregate]",
+    stop: "multiprocessing.synchronize.Event",
+    chunk_bytes: Optional[int] = DEFAULT_CHUNK_BYTES,
+    chunk_lines: Optional[int] = None,
+    max_iterations: Optional[int] = None,
+) -> None:
+    """
+    Worker loop: tail the files of one shard with the shared monitoring loop
+    and send a partial aggregate every flush interval, and a final one marked
+    done when stopped. Manifest updates go to the coordinator in the partials.
+    """
+    # Ctrl+C reaches every process; the coordinator stops the workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    partial = new_partial(shard)
+    last_flush = datetime.now()
+
+    def owned(file_path: str) -> bool:
+        return shard_for(file_path, shards) == shard
+
+    def handle_records(records):
+        aggregate_records(
+            records,
+            target_host,
+            from_host,
+            partial["connections_to"],
+            partial["connections_from"],
+            partial["connection_counts"],
+        )
+
+    def handle_update(file_path, update):
+        if update is None:
+            partial["removed"].append(file_path)
+        else:
+            partial["manifest_updates"].append((file_path, update))
+
+    def report(now, backlog):
+        nonlocal partial, last_flush
+        if now - last_flush < timedelta(seconds=FLUSH_INTERVAL_SECONDS):
+            return False
+        partial["backlog"] = backlog
+        partials.put(partial)
+        partial = new_partial(shard)
+        last_flush = now
+        return True
+
+    def final_report(backlog):
+        partial["backlog"] = backlog
+        partial["done"] = True
+        partials.put(partial)
+
+    monitor_directory(
+        log_dir,
+        handle_records,
+        report,
+        final_report,
+        max_iterations=max_iterations,
+        chunk_bytes=chunk_bytes,
+        chunk_lines=chunk_lines,
+        stop=stop,
+        include=owned,
+        handle_update=handle_update,
+    )
+
+
+def merge_partial(
+    partial: PartialAggregate,
+    connections_to: Set[str],
+    connections_from: Set[str],
+    connection_counts: Union[Dict[str, int], SpillingCounter],
+    manifest: dict,
+) -> bool:
+    """
+    Merge a worker's partial aggregate into the interval's aggregates and
+    the manifest. Returns whether the manifest changed.
+    """
+    connections_to |= partial["connections_to"]
+    connections_from |= partial["connections_from"]
+    for host, count in partial["connection_counts"].items():
+        if isinstance(connection_counts, SpillingCounter):
+            connection_counts.add(host, count)
+        else:
+            connection_counts[host] = connection_counts.get(host, 0) + count
+
+    manifest_changed = False
+    for file_path, update in partial["manifest_updates"]:
+        manifest_changed |= extend_entry(manifest, file_path, *update)
+    for file_path in partial["removed"]:
+        manifest_changed |= manifest.pop(os.path.basename(file_path), None) is not None
+    return manifest_changed
+
+
+def process_stream_sharded(
+    log_dir: str,
+    target_host: str,
+    from_host: Optional[str] = None,
+    workers: Optional[int] = None,
+    max_iterations: Optional[int] = None,
+    max_memory: Optional[int] = None,
+    chunk_bytes: Optional[int] = DEFAULT_CHUNK_BYTES,
+    chunk_lines: Optional[int] = None,
+) -> None:
+    """
+    Monitor a directory like process_stream, with the files split across
+    worker processes by a hash of their path.
+
+    Args:
+        log_dir: Directory containing log files to monitor
+        target_host: Host to track connections to
+        from_host: Optional host to track connections from
+        workers: Number of worker processes (defaults to the CPU count)
+        max_iterations: Optional maximum number of iterations of each
+            worker (for testing)
+        max_memory: Optional memory budget in bytes for the merged per-host
+            counts, beyond which they are spilled to temporary files
+        chunk_bytes: Optional per-file read quota per iteration, in bytes
+        chunk_lines: Optional per-file read quota per iteration, in lines
+    """
+    shards = workers or os.cpu_count() or 1
+    partials = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    processes = [
+        multiprocessing.Process(
+            target=run_shard,
+            args=(
+                shard,
+                shards,
+                log_dir,
+                target_host,
+                from_host,
+                partials,
+                stop,
+                chunk_bytes,
+                chunk_lines,
+                max_iterations,
+            ),
+            name=f"log-parser-shard-{shard}",
+            daemon=True,
+        )
+        for shard in range(shards)
+    ]
+
+    connections_to: Set[str] = set()
+    connections_from: Set[str] = set()
+    connection_counts = new_connection_counts(max_memory)
+    shard_backlog: Dict[int, Dict[str, int]] = {}
+    manifest = load_manifest(log_dir)
+    manifest_changed = False
+    last_report_time = datetime.now()
+    running = shards
+
+    logger.info(
+        f"Starting real-time monitoring of directory: {log_dir} "
+        f"with {shards} worker processes"
+    )
+    logger.info(f"Tracking connections to {target_host}")
+    if from_host:
+        logger.info(f"Tracking connections from {from_host}")
+    logger.info("Press Ctrl+C to stop monitoring")
+
+    for process in processes:
+        process.start()
+
+    def receive() -> None:
+        nonlocal manifest_changed, running
+        try:
+            partial = partials.get(timeout=0.1)
+        except queue.Empty:
+            if not any(process.is_alive() for process in processes):
+                logger.error("All stream workers have exited")
+                running = 0
+            return
+        manifest_changed |= merge_partial(
+            partial, connections_to, connections_from, connection_counts, manifest
+        )
+        shard_backlog[partial["shard"]] = partial["backlog"]
+        if partial["done"]:
+            running -= 1
+
+    def backlog() -> Dict[str, int]:
+        return {
+            path: size
+            for files in shard_backlog.values()
+            for path, size in files.items()
+        }
+
+    try:
+        while running:
+            receive()
+
+            now = datetime.now()
+            if now - last_report_time >= timedelta(seconds=REPORT_INTERVAL_SECONDS):
+                generate_report(
+                    target_host,
+                    connections_to,
+                    connections_from,
+                    connection_counts,
+                    backlog(),
+                )
+                last_report_time = now
+                if manifest_changed:
+                    save_manifest(log_dir, manifest)
+                    manifest_changed = False
+
+                connections_to = set()
+                connections_from = set()
+                if max_memory:
+                    connection_counts.close()
+                connection_counts = new_connection_counts(max_memory)
+
+    finally:
+        # Collect what the workers read before they stopped
+        stop.set()
+        while running:
+            receive()
+        for process in processes:
+            process.join()
+
+        if connections_to or connections_from or connection_counts:
+            logger.info("Generating final report")
+            generate_report(
+                target_host,
+                connections_to,
+                connections_from,
+                connection_counts,
+                backlog(),
+            )
+        if max_memory:
+            connection_counts.close()
+        if manifest_changed:
+            save_manifest(log_dir, manifest)
@@ -0,0 +1,146 @@
+"""
+Counters that spill to disk once they exceed a memory budget.
+
+When the in-memory counts grow past the budget they are written to a
+temporary file as a sorted run and cleared. Reading the counter merges all
+runs with the in-memory counts in key order, so exact totals are produced
+while only one entry per run is held in memory.
+"""
+
+import heapq
+import logging
+import os
+import shutil
+import tempfile
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Rough cost of one dict entry with a short string key and an int value
+ENTRY_OVERHEAD_BYTES = 120
+# Maximum number of runs merged at once; more runs are merged in several passes
+MAX_MERGE_FAN_IN = 64
+
+
+def _read_run(path: str) -> Iterator[Tuple[str, int]]:
+    with open(path, "r") as f:
+        for line in f:
+            key, count = line.rstrip("\n").rsplit("\t", 1)
+            yield key, int(count)
+
+
+def _write_run(path: str, items: Iterable[Tuple[str, int]]) -> None:
+    with open(path, "w") as f:
+        for key, count in items:
+            f.write(f"{key}\t{count}\n")
+
+
+def merge_sorted_counts(
+    runs: Iterable[Iterable[Tuple[str, int]]],
+) -> Iterator[Tuple[str, int]]:
+    """Merge runs of (key, count) sorted by key, summing counts of equal keys."""
+    current_key = None
+    current_count = 0
+    for key, count in heapq.merge(*runs, key=lambda item: item[0]):
+        if key == current_key:
+            current_count += count
+            continue
+        if current_key is not None:
+            yield current_key, current_count
+        current_key, current_count = key, count
+    if current_key is not None:
+        yield current_key, current_count
+
+
+class SpillingCounter:
+    """
+    A str -> int counter bounded by max_memory bytes of estimated usage.
+
+    Args:
+        max_memory: Estimated in-memory budget in bytes
+        spill_dir: Parent directory for the temporary run files
+    """
+
+    def __init__(self, max_memory: int, spill_dir: Optional[str] = None) -> None:
+        self.max_memory = max_memory
+        self.spill_dir = spill_dir
+        self._counts: Dict[str, int] = {}
+        self._memory = 0
+        self._runs: List[str] = []
+        self._runs_written = 0
+        self._run_dir: Optional[str] = None
+
+    def add(self, key: str, count: int = 1) -> None:
+        if key in self._counts:
+            self._counts[key] += count
+            return
+        self._counts[key] = count
+        self._memory += ENTRY_OVERHEAD_BYTES + len(key)
+        if self._memory > self.max_memory:
+            self.spill()
+
+    def _new_run_path(self) -> str:
+        if self._run_dir is None:
+            self._run_dir = tempfile.mkdtemp(
+                prefix="log-parser-spill-", dir=self.spill_dir
+            )
+        self._runs_written += 1
+        return os.path.join(self._run_dir, f"run-{self._runs_written:06d}.tsv")
+
+    def spill(self) -> None:
+        """Write the in-memory counts to a sorted run file and clear them."""
+        if not self._counts:
+            return
+        path = self._new_run_path()
+        _write_run(path, sorted(self._counts.items()))
+        self._runs.append(path)
+        logger.debug(f"Spilled {len(self._counts)} counts to {path}")
+        self._counts = {}
+        self._memory = 0
+
+    @property
+    def spilled_runs(self) -> int:
+        return len(self._runs)
+
+    def _compact_runs(self) -> None:
+        """Merge runs in groups until they can all be open at once."""
+        while len(self._runs) > MAX_MERGE_FAN_IN:
+            group = self._runs[:MAX_MERGE_FAN_IN]
+            self._runs = self._runs[MAX_MERGE_FAN_IN:]
+            path = self._new_run_path()
+            _write_run(path, merge_sorted_counts(_read_run(run) for run in group))
+            for run in group:
+                os.remove(run)
+            self._runs.append(path)
+
+    def items(self) -> Iterator[Tuple[str, int]]:
+        """Yield every (key, total count) in key order."""
+        self._compact_runs()
+        runs = [_read_run(run) for run in self._runs]
+        runs.append(iter(sorted(self._counts.items())))
+        return merge_sorted_counts(runs)
+
+    def most_common(self) -> Optional[Tuple[str, int]]:
+        """Return the (key, count) with the highest count, or None if empty."""
+        return max(self.items(), key=lambda x: x[1], default=None)
+
+    def __bool__(self) -> bool:
+        return bool(self._counts or self._runs)
+
+    def clear(self) -> None:
+        """Drop all counts and delete the run files."""
+        self._counts = {}
+        self._memory = 0
+        self._runs = []
+        if self._run_dir is not None:
+            shutil.rmtree(self._run_dir, ignore_errors=True)
+            self._run_dir = None
+
+    def close(self) -> None:
+        self.clear()
+
+    def __enter__(self) -> "SpillingCounter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,330 @@
+"""
+SQLite store of parsed connections for indexed and ad-hoc queries.
+
+`log-parser ingest --sqlite DB` bulk-loads logs into a single table,
+
+    connections(ts INTEGER, src TEXT, dst TEXT, file_id INTEGER)
+
+with the ingested files and the byte offset each is loaded up to in
+`files(id, path, inode, size, offset)`. Rows are inserted with batched
+executemany in one transaction per file, in WAL mode. On the first load the
+indexes on (dst, ts), (src, ts) and file_id are only created once all rows
+are in, which is much faster than maintaining them row by row. Later
+ingests only parse the data appended since; a rotated or truncated file is
+reloaded. A last line without a newline may still be being written, so it
+is not loaded until it is complete.
+
+The batch queries run against the store with `log-parser batch --sqlite DB`,
+which also reads any such unloaded last line so that it answers as a scan
+would, and analysts can query the database directly with any SQLite client.
+"""
+
+import logging
+import os
+import sqlite3
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from src.parser.formats import detect_file_format
+from src.parser.parser import connections_for_hosts
+
+logger = logging.getLogger(__name__)
+
+# Rows per executemany call
+BATCH_ROWS = 50000
+READ_CHUNK_BYTES = 4 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    inode INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    offset INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS connections (
+    ts INTEGER NOT NULL,
+    src TEXT NOT NULL,
+    dst TEXT NOT NULL,
+    file_id INTEGER NOT NULL
+);
+"""
+INDEXES = {
+    "connections_dst_ts": "CREATE INDEX IF NOT EXISTS connections_dst_ts "
+    "ON connections (dst, ts)",
+    "connections_src_ts": "CREATE INDEX IF NOT EXISTS connections_src_ts "
+    "ON connections (src, ts)",
+    # For deleting the rows of a rotated file
+    "connections_file_id": "CREATE INDEX IF NOT EXISTS connections_file_id "
+    "ON connections (file_id)",
+}
+
+
+def open_store(db_path: str) -> sqlite3.Connection:
+    """Open or create the store at db_path in WAL mode."""
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def create_indexes(conn: sqlite3.Connection) -> None:
+    for statement in INDEXES.values():
+        conn.execute(statement)
+    # Sampled statistics are enough for the planner to pick the indexes
+    conn.execute("PRAGMA analysis_limit=1000")
+    conn.execute("ANALYZE")
+    conn.commit()
+
+
+def drop_indexes(conn: sqlite3.Connection) -> None:
+    for name in INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    conn.commit()
+
+
+def _iter_rows(
+    log_file: str, offset: int, file_id: int, state: Dict[str, int]
+) -> Iterable[Tuple[int, str, str, int]]:
+    """
+    Yield rows for the complete lines from offset on; state["offset"] is
+    advanced past each chunk of complete lines as it is consumed.
+    """
+    parse_lines = detect_file_format(log_file).parse_lines
+    carry = b""
+    with open(log_file, "rb") as f:
+        f.seek(offset)
+        while True:
+            chunk = f.read(READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            data = carry + chunk
+            last_newline = data.rfind(b"\n")
+            if last_newline == -1:
+                carry = data
+                continue
+            carry = data[last_newline + 1 :]
+            lines = data[:last_newline].decode(errors="replace").split("\n")
+            for timestamp, source, destination in parse_lines(lines):
+                yield timestamp, source, destination, file_id
+            state["offset"] += last_newline + 1
+
+
+def ingest_log(
+    conn: sqlite3.Connection, log_file: str, batch_rows: int = BATCH_ROWS
+) -> int:
+    """
+    Load the complete lines of log_file not yet in the store, in one
+    transaction. Returns the number of rows inserted.
+    """
+    path = os.path.abspath(log_file)
+    stat = os.stat(path)
+    row = conn.execute(
+        "SELECT id, inode, offset FROM files WHERE path = ?", (path,)
+    ).fetchone()
+
+    with conn:
+        if row is None:
+            file_id = conn.execute(
+                "INSERT INTO files (path, inode, size, offset) VALUES (?, ?, ?, 0)",
+                (path, stat.st_ino, stat.st_size),
+            ).lastrowid
+            offset = 0
+        else:
+            file_id, inode, offset = row
+            if inode != stat.st_ino or stat.st_size < offset:
+                logger.info(f"{path} was rotated or truncated, reloading it")
+                conn.execute("DELETE FROM connections WHERE file_id = ?", (file_id,))
+                offset = 0
+
+        if stat.st_size == offset:
+            return 0
+
+        state = {"offset": offset}
+        rows = _iter_rows(path, offset, file_id, state)
+        inserted = 0
+        while True:
+            batch = [row for _, row in zip(range(batch_rows), rows)]
+            if not batch:
+                break
+            conn.executemany(
+                "INSERT INTO connections (ts, src, dst, file_id) VALUES (?, ?, ?, ?)",
+                batch,
+            )
+            inserted += len(batch)
+
+        conn.execute(
+            "UPDATE files SET inode = ?, size = ?, offset = ? WHERE id = ?",
+            (stat.st_ino, stat.st_size, state["offset"], file_id),
+        )
+    return inserted
+
+
+def ingest_logs(db_path: str, log_files: List[str]) -> int:
+    """
+    Bring the store up to date with log_files. On the first load the indexes
+    are created after the rows are inserted. Returns the rows inserted.
+    """
+    conn = open_store(db_path)
+    try:
+        existing = conn.execute("SELECT 1 FROM connections LIMIT 1").fetchone()
+        if existing is None:
+            drop_indexes(conn)
+
+        inserted = 0
+        for log_file in log_files:
+            count = ingest_log(conn, log_file)
+            logger.debug(f"Ingested {count} records from {log_file}")
+            inserted += count
+
+        # Also creates missing indexes after an interrupted first load
+        create_indexes(conn)
+        return inserted
+    finally:
+        conn.close()
+
+
+def _time_clause(
+    start_time: Optional[datetime],
+    end_time: Optional[datetime],
+    log_files: Optional[List[str]],
+) -> Tuple[str, list]:
+    """SQL conditions and parameters for the time range and file filter."""
+    clause = ""
+    params: list = []
+    if start_time:
+        clause += " AND ts >= ?"
+        params.append(int(start_time.timestamp()))
+    if end_time:
+        clause += " AND ts <= ?"
+        params.append(int(end_time.timestamp()))
+    if log_files is not None:
+        placeholders = ", ".join("?" * len(log_files))
+        clause += (
+            f" AND file_id IN (SELECT id FROM files WHERE path IN ({placeholders}))"
+        )
+        params.extend(os.path.abspath(log_file) for log_file in log_files)
+    return clause, params
+
+
+def query_connected_hosts(
+    conn: sqlite3.Connection,
+    hostname: str,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    log_files: Optional[List[str]] = None,
+) -> Set[str]:
+    """Hosts that connected to hostname, as find_connected_hosts."""
+    clause, params = _time_clause(start_time, end_time, log_files)
+    rows = conn.execute(
+        f"SELECT DISTINCT src FROM connections WHERE dst = ?{clause}",
+        [hostname] + params,
+    )
+    return {source for (source,) in rows}
+
+
+def query_hosts_connected_to(
+    conn: sqlite3.Connection,
+    hostname: str,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    log_files: Optional[List[str]] = None,
+) -> Set[str]:
+    """Hosts that hostname connected to, as find_hosts_connected_to."""
+    clause, params = _time_clause(start_time, end_time, log_files)
+    rows = conn.execute(
+        f"SELECT DISTINCT dst FROM connections WHERE src = ?{clause}",
+        [hostname] + params,
+    )
+    return {destination for (destination,) in rows}
+
+
+def query_connections_for_hosts(
+    conn: sqlite3.Connection,
+    hostnames: List[str],
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    log_files: Optional[List[str]] = None,
+) -> Dict[str, Dict[str, Set[str]]]:
+    """Inbound and outbound connections per host, as find_connections_for_hosts."""
+    return {
+        host: {
+            "inbound": query_connected_hosts(
+                conn, host, start_time, end_time, log_files
+            ),
+            "outbound": query_hosts_connected_to(
+                conn, host, start_time, end_time, log_files
+            ),
+        }
+        for host in hostnames
+    }
+
+
+def unloaded_records(
+    conn: sqlite3.Connection,
+    log_files: List[str],
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> List[Tuple[int, str, str]]:
+    """
+    Parse the data of log_files past the offset each is loaded up to, in the
+    time range. Right after an ingest this is at most the last line of each
+    file, when it does not end in a newline.
+    """
+    start_ts = int(start_time.timestamp()) if start_time else 0
+    end_ts = int(end_time.timestamp()) if end_time else float("inf")
+    records = []
+    for log_file in log_files:
+        path = os.path.abspath(log_file)
+        row = conn.execute(
+            "SELECT offset FROM files WHERE path = ?", (path,)
+        ).fetchone()
+        with open(path, "rb") as f:
+            f.seek(row[0] if row else 0)
+            data = f.read()
+        if not data:
+            continue
+        parse_lines = detect_file_format(path).parse_lines
+        lines = data.decode(errors="replace").split("\n")
+        records.extend(
+            record for record in parse_lines(lines) if start_ts <= record[0] <= end_ts
+        )
+    return records
+
+
+def query_batch(
+    conn: sqlite3.Connection,
+    hostnames: List[str],
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    log_files: Optional[List[str]] = None,
+) -> Dict[str, Dict[str, Set[str]]]:
+    """
+    Inbound and outbound connections per host, as a scan of log_files would
+    find them: the rows in the store and any unloaded last lines.
+    """
+    results = query_connections_for_hosts(
+        conn, hostnames, start_time, end_time, log_files
+    )
+    if log_files:
+        tail = unloaded_records(conn, log_files, start_time, end_time)
+        for host, result in connections_for_hosts(tail, hostnames).items():
+            results[host]["inbound"] |= result["inbound"]
+            results[host]["outbound"] |= result["outbound"]
+    return results
+
+
+def query_connection_counts(
+    conn: sqlite3.Connection,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    log_files: Optional[List[str]] = None,
+) -> Dict[str, int]:
+    """Connections per source host, as count_connections_by_host."""
+    clause, params = _time_clause(start_time, end_time, log_files)
+    rows = conn.execute(
+        f"SELECT src, COUNT(*) FROM connections WHERE 1{clause} GROUP BY src",
+        params,
+    )
+    return dict(rows.fetchall())
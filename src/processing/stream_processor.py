@@ -1,18 +1,54 @@
+import itertools
 import os
+import threading
 import time
 import logging
 from datetime import datetime, timedelta
-from typing import Set, Dict, TypedDict, Optional
+from typing import (
+    Callable,
+    Set,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Tuple,
+    TypedDict,
+    Optional,
+    Union,
+)
 from pathlib import Path
 
-from src.parser.parser import parse_log_line
+from src.parser.formats import detect_file_format, get_format
+from src.parser.parser import find_offset_after
+from src.processing.manifest import extend_entry, load_manifest, save_manifest
+from src.processing.metrics import StreamMetrics
+from src.processing.spill import SpillingCounter
 from src.utils.utils import is_within_last_hour
 
 logger = logging.getLogger(__name__)
 
+# Records older than this are not reported, see is_within_last_hour
+STREAM_WINDOW_SECONDS = 3600
+# Most data read from one file per loop iteration, so no file can hold up
+# the others or the reports
+DEFAULT_CHUNK_BYTES = 4 * 1024 * 1024
+# Size of the reusable buffer each read call fills
+READ_BUFFER_SIZE = 1024 * 1024
+REPORT_INTERVAL_SECONDS = 10
+
+_read_buffers = threading.local()
+
 FileTracker = TypedDict(
     "FileTracker",
-    {"file_path": str, "last_position": int, "last_modified": Optional[float]},
+    {
+        "file_path": str,
+        "last_position": int,
+        "last_modified": Optional[float],
+        "log_format": Optional[str],
+        "backlog": int,
+        "partial": bytes,
+        "lines_read": int,
+    },
 )
 
 
@@ -24,152 +60,518 @@ def create_file_tracker(file_path: str) -> FileTracker:
             "file_path": file_path,
             "last_position": 0,
             "last_modified": last_modified,
+            "log_format": None,
+            "backlog": os.path.getsize(file_path),
+            "partial": b"",
+            "lines_read": 0,
         }
     except FileNotFoundError:
         return {
             "file_path": file_path,
             "last_position": 0,
             "last_modified": None,
+            "log_format": None,
+            "backlog": 0,
+            "partial": b"",
+            "lines_read": 0,
         }
 
 
-def process_stream(
-    log_dir: str,
+def discover_log_files(
+    log_dir_path: Path,
+    tracked_files: Dict[str, FileTracker],
+    include: Optional[Callable[[str], bool]] = None,
+) -> None:
+    """
+    Start tracking any .log files in the directory that are not tracked yet,
+    limited to the paths accepted by include if given.
+    """
+    for file_path in log_dir_path.glob("*.log"):
+        str_path = str(file_path)
+        if str_path not in tracked_files and (include is None or include(str_path)):
+            logger.info(f"Found new log file: {file_path}")
+            tracked_files[str_path] = create_file_tracker(str_path)
+
+
+def skip_to_window(tracker: FileTracker, window: int = STREAM_WINDOW_SECONDS) -> None:
+    """
+    Move a new tracker past the lines that are too old for the stream window,
+    so startup backfill only reads the recent tail of existing files.
+    """
+    try:
+        offset = find_offset_after(
+            tracker["file_path"], int(time.time()) - window
+        )
+    except (FileNotFoundError, ValueError):
+        return
+    if offset:
+        logger.info(
+            f"Skipping {offset} bytes of older records in {tracker['file_path']}"
+        )
+    tracker["last_position"] = offset
+    tracker["partial"] = b""
+    tracker["backlog"] = max(tracker["backlog"] - offset, 0)
+
+
+def _read_buffer() -> bytearray:
+    """The calling thread's reusable read buffer."""
+    buffer = getattr(_read_buffers, "buffer", None)
+    if buffer is None:
+        buffer = _read_buffers.buffer = bytearray(READ_BUFFER_SIZE)
+    return buffer
+
+
+def line_start_position(tracker: FileTracker) -> int:
+    """Offset of the first byte not yet returned as part of a complete line."""
+    return tracker["last_position"] - len(tracker["partial"])
+
+
+def read_new_lines(
+    tracker: FileTracker,
+    max_bytes: Optional[int] = None,
+    max_lines: Optional[int] = None,
+) -> Iterator[str]:
+    """
+    Yield the complete lines appended to a tracked file since the last read,
+    without their line endings, stopping once max_bytes or max_lines have
+    been read. Whatever is left is recorded as the tracker's backlog and read
+    on the next call.
+
+    The file is read in binary into a reusable buffer and decoded one chunk
+    at a time. An incomplete trailing line is kept in the tracker until the
+    rest of it has been written. The tracker position is advanced once the
+    yielded lines have been consumed.
+    Raises FileNotFoundError if the file has been removed.
+    """
+    file_path = tracker["file_path"]
+    current_size = os.path.getsize(file_path)
+    current_modified = os.path.getmtime(file_path)
+
+    if (
+        current_modified == tracker["last_modified"]
+        and current_size <= tracker["last_position"]
+    ):
+        return
+
+    if current_size < tracker["last_position"]:
+        logger.info(
+            f"Log file {file_path} appears to have been truncated, resetting position"
+        )
+        tracker["last_position"] = 0
+        tracker["partial"] = b""
+        tracker["log_format"] = None
+
+    buffer = _read_buffer()
+    view = memoryview(buffer)
+    position = tracker["last_position"]
+    carry = tracker["partial"]
+    bytes_read = 0
+    lines_read = 0
+
+    with open(file_path, "rb", buffering=0) as f:
+        f.seek(position)
+        while (max_bytes is None or bytes_read < max_bytes) and (
+            max_lines is None or lines_read < max_lines
+        ):
+            read_size = len(buffer)
+            if max_bytes is not None:
+                read_size = min(read_size, max_bytes - bytes_read)
+            length = f.readinto(view[:read_size])
+            if not length:
+                break
+            bytes_read += length
+            position += length
+
+            data = carry + view[:length]
+            last_newline = data.rfind(b"\n")
+            if last_newline == -1:
+                carry = data
+                continue
+            complete = data[: last_newline + 1]
+            carry = data[last_newline + 1 :]
+
+            if max_lines is not None:
+                allowed = max_lines - lines_read
+                if complete.count(b"\n") > allowed:
+                    # Stop after the last allowed line and re-read the rest later
+                    cut = -1
+                    for _ in range(allowed):
+                        cut = complete.find(b"\n", cut + 1)
+                    position -= len(data) - (cut + 1)
+                    complete = complete[: cut + 1]
+                    carry = b""
+
+            lines = complete[:-1].decode(errors="replace").split("\n")
+            lines_read += len(lines)
+            yield from lines
+
+    tracker["last_position"] = position
+    tracker["partial"] = bytes(carry)
+    tracker["last_modified"] = current_modified
+    tracker["backlog"] = max(current_size - position, 0)
+    tracker["lines_read"] += lines_read
+
+
+def read_new_records(
+    tracker: FileTracker,
+    max_bytes: Optional[int] = None,
+    max_lines: Optional[int] = None,
+) -> Iterator[Tuple[int, str, str]]:
+    """
+    Yield the parsed records appended to a tracked file since the last read,
+    within the same quotas as read_new_lines, using the format's bulk parser.
+    The file's format is detected from its first lines once it has content.
+    """
+    lines = read_new_lines(tracker, max_bytes, max_lines)
+    first_line = next(lines, None)
+    if first_line is None:
+        return
+    if tracker["log_format"] is None:
+        tracker["log_format"] = detect_file_format(tracker["file_path"]).name
+    parse_lines = get_format(tracker["log_format"]).parse_lines
+    yield from parse_lines(itertools.chain((first_line,), lines))
+
+
+ManifestUpdate = Tuple[int, int, Optional[int], Optional[int], int]
+
+
+def read_chunk(
+    tracker: FileTracker,
+    chunk_bytes: Optional[int] = DEFAULT_CHUNK_BYTES,
+    chunk_lines: Optional[int] = None,
+) -> Tuple[List[Tuple[int, str, str]], Optional[ManifestUpdate]]:
+    """
+    Read the next chunk of a tracked file.
+
+    Returns the parsed records and the arguments for extend_entry after the
+    file path, (start offset, end offset, min_ts, max_ts, line count), or
+    None in their place if no complete line was read.
+    Raises FileNotFoundError if the file has been removed.
+    """
+    start_offset = line_start_position(tracker)
+    if os.path.getsize(tracker["file_path"]) < tracker["last_position"]:
+        # Truncated, read_new_lines starts over
+        start_offset = 0
+    records = list(read_new_records(tracker, chunk_bytes, chunk_lines))
+    end_offset = line_start_position(tracker)
+    if end_offset == start_offset:
+        return records, None
+
+    min_ts = max_ts = None
+    if records:
+        timestamps = [record[0] for record in records]
+        min_ts, max_ts = min(timestamps), max(timestamps)
+    return records, (start_offset, end_offset, min_ts, max_ts, len(records))
+
+
+def aggregate_records(
+    records: Iterable[Tuple[int, str, str]],
     target_host: str,
-    from_host: Optional[str] = None,
+    from_host: Optional[str],
+    connections_to: Set[str],
+    connections_from: Set[str],
+    connection_counts: Union[Dict[str, int], SpillingCounter],
+) -> None:
+    """Add the records within the last hour to the interval's aggregates."""
+    for timestamp, source, destination in records:
+        if not is_within_last_hour(timestamp):
+            continue
+
+        if destination == target_host:
+            connections_to.add(source)
+
+        if source == target_host or (from_host and source == from_host):
+            connections_from.add(destination)
+
+        if isinstance(connection_counts, SpillingCounter):
+            connection_counts.add(source)
+        else:
+            connection_counts[source] = connection_counts.get(source, 0) + 1
+
+
+def monitor_directory(
+    log_dir: str,
+    handle_records: Callable[[List[Tuple[int, str, str]]], None],
+    report: Optional[Callable[[datetime, Dict[str, int]], bool]] = None,
+    final_report: Optional[Callable[[Dict[str, int]], None]] = None,
+    window: int = STREAM_WINDOW_SECONDS,
     max_iterations: Optional[int] = None,
+    chunk_bytes: Optional[int] = DEFAULT_CHUNK_BYTES,
+    chunk_lines: Optional[int] = None,
+    metrics: Optional[StreamMetrics] = None,
+    stop: Optional[threading.Event] = None,
+    include: Optional[Callable[[str], bool]] = None,
+    handle_update: Optional[
+        Callable[[str, Optional[ManifestUpdate]], None]
+    ] = None,
 ) -> None:
     """
-    Monitor a directory for log files and report connection statistics every 10 seconds.
+    The monitoring loop shared by the stream commands.
+
+    Files in the directory are discovered once a second and backfilled from
+    the start of the window. Files are visited round-robin and each gets at
+    most chunk_bytes or chunk_lines per iteration, so a large append is
+    worked off over several iterations while the other files and the reports
+    stay on schedule. Every chunk of records read is passed to
+    handle_records.
 
     Args:
         log_dir: Directory containing log files to monitor
-        target_host: Host to track connections to
-        from_host: Optional host to track connections from
+        handle_records: Called with the records of each chunk read
+        report: Optional, called every iteration with the current time and
+            the backlog of each file; makes any reports that are due and
+            returns whether it did
+        final_report: Optional, called with the backlog when monitoring ends
+        window: Seconds of existing data to backfill
         max_iterations: Optional maximum number of monitoring iterations (for testing)
+        chunk_bytes: Optional per-file read quota per iteration, in bytes
+        chunk_lines: Optional per-file read quota per iteration, in lines
+        metrics: Optional metrics to update while streaming
+        stop: Optional event that ends monitoring when set
+        include: Optional filter on the paths of the files to monitor
+        handle_update: Optional, called with the path and manifest update of
+            each chunk read, or None when the file was removed. By default
+            the loop keeps the directory manifest itself
     """
     log_dir_path = Path(log_dir)
     tracked_files: Dict[str, FileTracker] = {}
-    connections_to = set()
-    connections_from = set()
-    connection_counts = {}
-    last_report_time = datetime.now()
+    manifest = {}
+    manifest_changed = False
+
+    def update_manifest(file_path: str, update: Optional[ManifestUpdate]) -> None:
+        nonlocal manifest_changed
+        if update is None:
+            removed = manifest.pop(os.path.basename(file_path), None)
+            manifest_changed |= removed is not None
+        else:
+            manifest_changed |= extend_entry(manifest, file_path, *update)
+
+    if handle_update is None:
+        # Keep the directory manifest current for batch queries
+        manifest = load_manifest(log_dir)
+        handle_update = update_manifest
     last_dir_check = datetime.now()
+    last_save = datetime.now()
     iteration_count = 0
 
-    logger.info(f"Starting real-time monitoring of directory: {log_dir}")
-    logger.info(f"Tracking connections to {target_host}")
-    if from_host:
-        logger.info(f"Tracking connections from {from_host}")
-    logger.info("Press Ctrl+C to stop monitoring")
+    if include is None:
+        # Filtered loops run under a coordinator, which announces itself
+        logger.info(f"Starting real-time monitoring of directory: {log_dir}")
+        logger.info("Press Ctrl+C to stop monitoring")
+
+    # Backfill existing files from the start of the window only
+    discover_log_files(log_dir_path, tracked_files, include)
+    for tracker in tracked_files.values():
+        skip_to_window(tracker, window)
 
     try:
         while True:
             iteration_count += 1
             if max_iterations and iteration_count > max_iterations:
                 break
+            if stop and stop.is_set():
+                break
 
             now = datetime.now()
 
             if now - last_dir_check >= timedelta(seconds=1):
-                for file_path in log_dir_path.glob("*.log"):
-                    str_path = str(file_path)
-                    if str_path not in tracked_files:
-                        logger.info(f"Found new log file: {file_path}")
-                        tracked_files[str_path] = create_file_tracker(str_path)
+                discover_log_files(log_dir_path, tracked_files, include)
                 last_dir_check = now
 
-            for file_path, tracker in list(tracked_files.items()):
+            for file_path, tracker in round_robin(tracked_files, iteration_count):
                 try:
-                    current_size = os.path.getsize(file_path)
-                    current_modified = os.path.getmtime(file_path)
-
-                    if (
-                        current_modified == tracker["last_modified"]
-                        and current_size <= tracker["last_position"]
-                    ):
-                        continue
-
-                    if current_size < tracker["last_position"]:
-                        logger.info(
-                            f"Log file {file_path} appears to have been truncated, resetting position"
-                        )
-                        tracker["last_position"] = 0
-
-                    with open(file_path, "r") as f:
-                        f.seek(tracker["last_position"])
-                        for line in f:
-                            parsed = parse_log_line(line)
-                            if not parsed:
-                                continue
-
-                            timestamp, source, destination = parsed
-
-                            if not is_within_last_hour(timestamp):
-                                continue
-
-                            if destination == target_host:
-                                connections_to.add(source)
-
-                            if source == target_host or (
-                                from_host and source == from_host
-                            ):
-                                connections_from.add(destination)
-
-                            connection_counts[source] = (
-                                connection_counts.get(source, 0) + 1
+                    lines_before = tracker["lines_read"]
+                    records, update = read_chunk(tracker, chunk_bytes, chunk_lines)
+                    handle_records(records)
+                    if update:
+                        handle_update(file_path, update)
+                        if metrics:
+                            record_chunk_metrics(
+                                metrics, update, tracker["lines_read"] - lines_before
                             )
 
-                        tracker["last_position"] = f.tell()
-                        tracker["last_modified"] = current_modified
-
                 except FileNotFoundError:
                     logger.info(f"Log file {file_path} was removed, stopping tracking")
                     del tracked_files[file_path]
+                    handle_update(file_path, None)
                 except Exception as e:
                     logger.error(f"Error processing {file_path}: {e}")
 
-            if now - last_report_time >= timedelta(seconds=10):
-                generate_report(
-                    target_host, connections_to, connections_from, connection_counts
-                )
-                last_report_time = now
+            backlog = stream_backlog(tracked_files)
+            if metrics:
+                metrics.record_state(len(tracked_files), sum(backlog.values()))
+
+            report_started = time.perf_counter()
+            reported = report(now, backlog) if report else False
+            if reported and metrics:
+                metrics.record_report(time.perf_counter() - report_started)
+            # Save state after each report, and at least every report interval
+            if reported or now - last_save >= timedelta(
+                seconds=REPORT_INTERVAL_SECONDS
+            ):
+                if metrics:
+                    metrics.flush()
+                if manifest_changed:
+                    save_manifest(log_dir, manifest)
+                    manifest_changed = False
+                last_save = now
+
+            # Keep working off a backlog without pausing
+            if not any(backlog.values()):
+                time.sleep(0.1)
 
-                connections_to = set()
-                connections_from = set()
-                connection_counts = {}
+    finally:
+        if final_report:
+            final_report(stream_backlog(tracked_files))
+        if manifest_changed:
+            save_manifest(log_dir, manifest)
+        if metrics:
+            metrics.flush()
 
-            time.sleep(0.1)
 
-    finally:
+def process_stream(
+    log_dir: str,
+    target_host: str,
+    from_host: Optional[str] = None,
+    max_iterations: Optional[int] = None,
+    max_memory: Optional[int] = None,
+    chunk_bytes: Optional[int] = DEFAULT_CHUNK_BYTES,
+    chunk_lines: Optional[int] = None,
+    metrics: Optional[StreamMetrics] = None,
+) -> None:
+    """
+    Monitor a directory for log files and report connection statistics every 10 seconds.
+
+    Args:
+        log_dir: Directory containing log files to monitor
+        target_host: Host to track connections to
+        from_host: Optional host to track connections from
+        max_iterations: Optional maximum number of monitoring iterations (for testing)
+        max_memory: Optional memory budget in bytes for the per-host counts,
+            beyond which they are spilled to temporary files
+        chunk_bytes: Optional per-file read quota per iteration, in bytes
+        chunk_lines: Optional per-file read quota per iteration, in lines
+        metrics: Optional metrics to update while streaming
+    """
+    connections_to = set()
+    connections_from = set()
+    connection_counts = new_connection_counts(max_memory)
+    last_report_time = datetime.now()
+
+    logger.info(f"Tracking connections to {target_host}")
+    if from_host:
+        logger.info(f"Tracking connections from {from_host}")
+
+    def handle_records(records):
+        aggregate_records(
+            records,
+            target_host,
+            from_host,
+            connections_to,
+            connections_from,
+            connection_counts,
+        )
+
+    def report(now, backlog):
+        nonlocal connection_counts, last_report_time
+        if now - last_report_time < timedelta(seconds=REPORT_INTERVAL_SECONDS):
+            return False
+        generate_report(
+            target_host, connections_to, connections_from, connection_counts, backlog
+        )
+        last_report_time = now
+        connections_to.clear()
+        connections_from.clear()
+        if max_memory:
+            connection_counts.close()
+        connection_counts = new_connection_counts(max_memory)
+        return True
+
+    def final_report(backlog):
         if connections_to or connections_from or connection_counts:
             logger.info("Generating final report")
             generate_report(
-                target_host, connections_to, connections_from, connection_counts
+                target_host,
+                connections_to,
+                connections_from,
+                connection_counts,
+                backlog,
             )
+        if max_memory:
+            connection_counts.close()
+
+    monitor_directory(
+        log_dir,
+        handle_records,
+        report,
+        final_report,
+        max_iterations=max_iterations,
+        chunk_bytes=chunk_bytes,
+        chunk_lines=chunk_lines,
+        metrics=metrics,
+    )
+
+
+def record_chunk_metrics(
+    metrics: StreamMetrics, update: ManifestUpdate, lines: int
+) -> None:
+    """Account for a chunk read by read_chunk, given its manifest update."""
+    start_offset, end_offset, _, max_ts, line_count = update
+    metrics.record_chunk(end_offset - start_offset, lines, line_count, max_ts)
+
+
+def round_robin(
+    tracked_files: Dict[str, FileTracker], iteration_count: int
+) -> List[Tuple[str, FileTracker]]:
+    """
+    The tracked files in visiting order for an iteration, rotated so every
+    file gets to go first in turn.
+    """
+    scheduled = list(tracked_files.items())
+    if scheduled:
+        first = iteration_count % len(scheduled)
+        scheduled = scheduled[first:] + scheduled[:first]
+    return scheduled
+
+
+def stream_backlog(tracked_files: Dict[str, FileTracker]) -> Dict[str, int]:
+    """Bytes not yet read from each tracked file, as of its last read."""
+    return {
+        file_path: tracker["backlog"] for file_path, tracker in tracked_files.items()
+    }
+
+
+def new_connection_counts(
+    max_memory: Optional[int] = None,
+) -> Union[Dict[str, int], SpillingCounter]:
+    """Return an empty per-host counter, spilling to disk if max_memory is set."""
+    return SpillingCounter(max_memory) if max_memory else {}
 
 
 def generate_report(
     target_host: str,
     connections_to: Set[str],
     connections_from: Set[str],
-    connection_counts: Dict[str, int],
+    connection_counts: Union[Dict[str, int], SpillingCounter],
+    backlog: Optional[Dict[str, int]] = None,
+    interval: int = REPORT_INTERVAL_SECONDS,
+    label: Optional[str] = None,
 ) -> None:
-    """Generate and print the report every 10 seconds."""
+    """Generate and print the report for the last interval seconds."""
+    period = f"the last {interval} seconds"
     print("\n" + "=" * 50)
-    print(f"REPORT: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    title = f"REPORT {label}" if label else "REPORT"
+    print(f"{title}: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("=" * 50)
 
-    print(f"\nHosts connected TO {target_host} in the last 10 seconds:")
+    print(f"\nHosts connected TO {target_host} in {period}:")
     if connections_to:
         for host in sorted(connections_to):
             print(f"  - {host}")
     else:
         print("  None")
 
-    print(
-        f"\nHosts that received connections FROM {target_host} in the last 10 seconds:"
-    )
+    print(f"\nHosts that received connections FROM {target_host} in {period}:")
     if connections_from:
         for host in sorted(connections_from):
             print(f"  - {host}")
@@ -179,9 +581,15 @@ def generate_report(
     if connection_counts:
         most_active_host, count = max(connection_counts.items(), key=lambda x: x[1])
         print(
-            f"\nMost active host in the last 10 seconds: {most_active_host} ({count} connections)"
+            f"\nMost active host in {period}: {most_active_host} ({count} connections)"
         )
     else:
-        print("\nNo connections recorded in the last 10 seconds")
+        print(f"\nNo connections recorded in {period}")
+
+    behind = {path: size for path, size in (backlog or {}).items() if size}
+    if behind:
+        print("\nFiles with unread backlog:")
+        for path, size in sorted(behind.items(), key=lambda x: -x[1]):
+            print(f"  - {path}: {size} bytes")
 
     print("=" * 50)
@@ -0,0 +1,312 @@
+"""
+Multi-target stream subscriptions.
+
+A subscription names the hosts to watch, the window of records it counts and
+how often it is reported. All subscriptions are served from one pass over
+the tracked files: every record is dispatched with two dictionary lookups,
+on its destination and its source, to the subscriptions watching those
+hosts, so the cost per record does not grow with the number of
+subscriptions.
+
+Subscriptions are loaded from a JSON config file:
+
+    {"subscriptions": [
+        {"name": "web", "hosts": ["host27", "host28"], "from_hosts": ["lb1"],
+         "window": 3600, "interval": 10}
+    ]}
+
+from_hosts, window (seconds, default 3600) and interval (seconds, default
+10) are optional.
+"""
+
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypedDict,
+    Union,
+)
+
+from src.processing.metrics import StreamMetrics
+from src.processing.spill import SpillingCounter
+from src.processing.stream_processor import (
+    DEFAULT_CHUNK_BYTES,
+    REPORT_INTERVAL_SECONDS,
+    STREAM_WINDOW_SECONDS,
+    generate_report,
+    monitor_directory,
+    new_connection_counts,
+)
+
+logger = logging.getLogger(__name__)
+
+Subscription = TypedDict(
+    "Subscription",
+    {
+        "name": str,
+        "hosts": List[str],
+        "from_hosts": List[str],
+        "window": int,
+        "interval": int,
+    },
+)
+
+ConnectionCounts = Union[Dict[str, int], SpillingCounter]
+ReportFn = Callable[
+    [Subscription, Set[str], Set[str], ConnectionCounts, Dict[str, int]], None
+]
+
+
+def _host_list(config_file: str, name: str, value, field: str) -> List[str]:
+    if not isinstance(value, list) or not all(isinstance(h, str) for h in value):
+        raise ValueError(
+            f"{config_file}: {field} of subscription {name} must be a list of hosts"
+        )
+    return value
+
+
+def _positive_int(config_file: str, name: str, value, field: str) -> int:
+    if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+        raise ValueError(
+            f"{config_file}: {field} of subscription {name} must be a positive "
+            "number of seconds"
+        )
+    return value
+
+
+def load_subscriptions(config_file: str) -> List[Subscription]:
+    """
+    Read and validate the subscriptions in a JSON config file.
+    Raises ValueError if the file is not a valid subscription config.
+    """
+    try:
+        with open(config_file, "r") as f:
+            config = json.load(f)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"{config_file}: invalid JSON: {e}") from e
+
+    entries = config.get("subscriptions") if isinstance(config, dict) else None
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"{config_file}: expected a non-empty 'subscriptions' list")
+
+    subscriptions = []
+    names = set()
+    for position, entry in enumerate(entries, 1):
+        if not isinstance(entry, dict):
+            raise ValueError(f"{config_file}: subscription {position} is not an object")
+        name = entry.get("name", f"#{position}")
+        if not isinstance(name, str) or name in names:
+            raise ValueError(f"{config_file}: duplicate or invalid name {name!r}")
+        names.add(name)
+
+        hosts = _host_list(config_file, name, entry.get("hosts"), "hosts")
+        if not hosts:
+            raise ValueError(f"{config_file}: subscription {name} has no hosts")
+        subscriptions.append(
+            {
+                "name": name,
+                "hosts": hosts,
+                "from_hosts": _host_list(
+                    config_file, name, entry.get("from_hosts", []), "from_hosts"
+                ),
+                "window": _positive_int(
+                    config_file,
+                    name,
+                    entry.get("window", STREAM_WINDOW_SECONDS),
+                    "window",
+                ),
+                "interval": _positive_int(
+                    config_file,
+                    name,
+                    entry.get("interval", REPORT_INTERVAL_SECONDS),
+                    "interval",
+                ),
+            }
+        )
+    return subscriptions
+
+
+class SubscriptionState:
+    """Aggregates of one subscription for its current report interval."""
+
+    def __init__(
+        self, subscription: Subscription, max_memory: Optional[int] = None
+    ) -> None:
+        self.subscription = subscription
+        self.window = subscription["window"]
+        self.max_memory = max_memory
+        self.last_report_time = datetime.now()
+        self.connections_to: Set[str] = set()
+        self.connections_from: Set[str] = set()
+        self.connection_counts = new_connection_counts(max_memory)
+
+    def has_data(self) -> bool:
+        return bool(
+            self.connections_to or self.connections_from or self.connection_counts
+        )
+
+    def report(self, report_fn: ReportFn, backlog: Dict[str, int]) -> None:
+        """Report the interval's aggregates and start a new interval."""
+        report_fn(
+            self.subscription,
+            self.connections_to,
+            self.connections_from,
+            self.connection_counts,
+            backlog,
+        )
+        self.close()
+        self.last_report_time = datetime.now()
+        self.connections_to = set()
+        self.connections_from = set()
+        self.connection_counts = new_connection_counts(self.max_memory)
+
+    def close(self) -> None:
+        if isinstance(self.connection_counts, SpillingCounter):
+            self.connection_counts.close()
+
+
+Dispatch = Dict[str, List[SubscriptionState]]
+
+
+def build_dispatch(states: Iterable[SubscriptionState]) -> Tuple[Dispatch, Dispatch]:
+    """
+    Index the subscriptions by host: by destination for connections to
+    their hosts, and by source for connections from their hosts or
+    from_hosts.
+    """
+    by_destination: Dispatch = {}
+    by_source: Dispatch = {}
+    for state in states:
+        subscription = state.subscription
+        for host in set(subscription["hosts"]):
+            by_destination.setdefault(host, []).append(state)
+        for host in set(subscription["hosts"]) | set(subscription["from_hosts"]):
+            by_source.setdefault(host, []).append(state)
+    return by_destination, by_source
+
+
+def dispatch_records(
+    records: Iterable[Tuple[int, str, str]],
+    by_destination: Dispatch,
+    by_source: Dispatch,
+    now: Optional[int] = None,
+) -> None:
+    """
+    Add each record to the subscriptions watching its destination or source,
+    if it falls inside their window. The per-host counts of a subscription
+    count the sources of connections to its hosts.
+    """
+    now = int(time.time()) if now is None else now
+    for timestamp, source, destination in records:
+        states = by_destination.get(destination)
+        if states:
+            for state in states:
+                if timestamp >= now - state.window:
+                    state.connections_to.add(source)
+                    counts = state.connection_counts
+                    if isinstance(counts, SpillingCounter):
+                        counts.add(source)
+                    else:
+                        counts[source] = counts.get(source, 0) + 1
+
+        states = by_source.get(source)
+        if states:
+            for state in states:
+                if timestamp >= now - state.window:
+                    state.connections_from.add(destination)
+
+
+def print_subscription_report(
+    subscription: Subscription,
+    connections_to: Set[str],
+    connections_from: Set[str],
+    connection_counts: ConnectionCounts,
+    backlog: Dict[str, int],
+) -> None:
+    """Default report_fn: print the report of one subscription."""
+    generate_report(
+        ", ".join(subscription["hosts"]),
+        connections_to,
+        connections_from,
+        connection_counts,
+        backlog,
+        interval=subscription["interval"],
+        label=subscription["name"],
+    )
+
+
+def process_subscriptions(
+    log_dir: str,
+    subscriptions: List[Subscription],
+    max_iterations: Optional[int] = None,
+    max_memory: Optional[int] = None,
+    chunk_bytes: Optional[int] = DEFAULT_CHUNK_BYTES,
+    chunk_lines: Optional[int] = None,
+    report_fn: ReportFn = print_subscription_report,
+    metrics: Optional[StreamMetrics] = None,
+    stop: Optional[threading.Event] = None,
+) -> None:
+    """
+    Monitor a directory like process_stream, serving every subscription from
+    a single pass and reporting each one at its own interval.
+
+    Args:
+        log_dir: Directory containing log files to monitor
+        subscriptions: Subscriptions, as returned by load_subscriptions
+        max_iterations: Optional maximum number of monitoring iterations (for testing)
+        max_memory: Optional memory budget in bytes for the per-host counts
+            of each subscription, beyond which they are spilled to disk
+        chunk_bytes: Optional per-file read quota per iteration, in bytes
+        chunk_lines: Optional per-file read quota per iteration, in lines
+        report_fn: Called with (subscription, connections_to,
+            connections_from, connection_counts, backlog) when a
+            subscription's report is due
+        metrics: Optional metrics to update while streaming
+        stop: Optional event that ends monitoring when set
+    """
+    states = [SubscriptionState(s, max_memory) for s in subscriptions]
+    by_destination, by_source = build_dispatch(states)
+
+    logger.info(f"Serving {len(subscriptions)} subscriptions")
+
+    def handle_records(records):
+        dispatch_records(records, by_destination, by_source)
+
+    def report(now, backlog):
+        reported = False
+        for state in states:
+            interval = timedelta(seconds=state.subscription["interval"])
+            if now - state.last_report_time >= interval:
+                state.report(report_fn, backlog)
+                reported = True
+        return reported
+
+    def final_report(backlog):
+        for state in states:
+            if state.has_data():
+                logger.info(f"Generating final report for {state.subscription['name']}")
+                state.report(report_fn, backlog)
+            state.close()
+
+    monitor_directory(
+        log_dir,
+        handle_records,
+        report,
+        final_report,
+        # Backfill as far back as the widest window
+        window=max(s["window"] for s in subscriptions),
+        max_iterations=max_iterations,
+        chunk_bytes=chunk_bytes,
+        chunk_lines=chunk_lines,
+        metrics=metrics,
+        stop=stop,
+    )
@@ -10,7 +10,8 @@ from pathlib import Path
 import os
 import time
 
-from src.processing.stream_processor import create_file_tracker, parse_log_line
+from src.parser.formats import detect_file_format, get_format
+from src.processing.stream_processor import create_file_tracker
 from src.utils.utils import is_within_last_hour
 
 class StreamScreen(Screen):
@@ -77,13 +78,18 @@ class StreamScreen(Screen):
                     if current_size < tracker["last_position"]:
                         self.write_log(f"Log file {file_path} was truncated, resetting position\n")
                         tracker["last_position"] = 0
+                        tracker["log_format"] = None
 
                     # Check for new content
                     if current_size > tracker["last_position"] or current_modified > tracker["last_modified"]:
+                        # Detected once the file has content, then kept in the tracker
+                        if tracker["log_format"] is None and current_size:
+                            tracker["log_format"] = detect_file_format(file_path).name
+                        parse_line = get_format(tracker["log_format"] or "plain").parse_line
                         with open(file_path, 'r') as f:
                             f.seek(tracker["last_position"])
                             for line in f:
-                                parsed = parse_log_line(line)
+                                parsed = parse_line(line)
                                 if not parsed:
                                     continue
 
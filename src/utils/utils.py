@@ -1,5 +1,7 @@
+import contextlib
 import os
 from datetime import datetime, timedelta
+from typing import IO, Callable, Iterator, Tuple
 
 
 def get_file_size(file_path: str) -> int:
@@ -9,6 +11,35 @@ def get_file_size(file_path: str) -> int:
         return 0
 
 
+def file_identity(file_path: str) -> Tuple[str, int, int, int]:
+    """
+    Identify a file by (absolute path, inode, size, mtime in ns).
+    Only stats the file, so it is cheap compared to opening it.
+    """
+    st = os.stat(file_path)
+    return os.path.abspath(file_path), st.st_ino, st.st_size, st.st_mtime_ns
+
+
+@contextlib.contextmanager
+def atomic_write(
+    path: str, mode: str = "w", opener: Callable[..., IO] = open
+) -> Iterator[IO]:
+    """
+    Write path through a temporary file next to it, moved into place when the
+    block completes, so readers never see a partial file. On an error the
+    temporary file is removed and path is left as it was.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with opener(tmp_path, mode) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+
 def timestamp_to_datetime(timestamp: int) -> datetime:
     return datetime.fromtimestamp(timestamp)
 
@@ -35,3 +66,25 @@ def parse_datetime_input(dt_str: str) -> datetime:
         raise ValueError(
             "Invalid datetime format. Use YYYY-MM-DD HH:MM:SS format"
         ) from e
+
+
+# Seconds in each named interval, for rollup buckets and histograms
+TIME_INTERVALS = {"minute": 60, "hour": 3600, "day": 86400}
+
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+
+def parse_size(size_str: str) -> int:
+    """Convert a size string such as '512K', '64M' or '1G' to bytes."""
+    value = size_str.strip().upper().rstrip("B")
+    unit = value[-1:] if value[-1:] in SIZE_UNITS else ""
+    number = value[: len(value) - len(unit)]
+    try:
+        size = int(float(number) * SIZE_UNITS[unit])
+    except ValueError as e:
+        raise ValueError(
+            f"Invalid size: {size_str}. Use a number with an optional K, M or G suffix"
+        ) from e
+    if size <= 0:
+        raise ValueError(f"Invalid size: {size_str}. Size must be positive")
+    return size
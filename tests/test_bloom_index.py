@@ -0,0 +1,123 @@
+import os
+import random
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+
+from src.parser import parser
+from src.parser.bloom_index import (
+    BloomFilter,
+    bloom_path,
+    build_bloom_index,
+    candidate_blocks,
+    load_bloom_index,
+)
+
+BASE = 1704067200
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    rng = random.Random(7)
+    path = tmp_path / "app.log"
+    with open(path, "w") as f:
+        for i in range(20000):
+            f.write(f"{BASE + i} host{rng.randint(1, 50)} host{rng.randint(1, 50)}\n")
+            if i == 12345:
+                f.write(f"{BASE + i} host3 rarehost\n{BASE + i} rarehost host4\n")
+    return str(path)
+
+
+def test_bloom_filter_has_no_false_negatives():
+    hosts = [f"host{i}" for i in range(1000)]
+    bloom = BloomFilter.from_hosts(hosts)
+    assert all(host in bloom for host in hosts)
+
+    false_positives = sum(f"other{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+    restored = BloomFilter.from_json(bloom.to_json())
+    assert all(host in restored for host in hosts)
+
+
+def test_blocks_cover_the_file(log_file):
+    blocks = build_bloom_index(log_file, block_size=16 * 1024)
+
+    assert len(blocks) > 10
+    assert blocks[0].start == 0
+    assert blocks[-1].end == os.path.getsize(log_file)
+    for previous, block in zip(blocks, blocks[1:]):
+        assert previous.end == block.start
+    assert load_bloom_index(log_file) is not None
+
+
+def test_rare_host_reads_only_candidate_blocks(log_file):
+    blocks = build_bloom_index(log_file, block_size=16 * 1024)
+    assert len(candidate_blocks(blocks, "rarehost", as_destination=True)) == 1
+    assert candidate_blocks(blocks, "rarehost", as_destination=True) == (
+        candidate_blocks(blocks, "rarehost", as_source=True)
+    )
+    assert candidate_blocks(blocks, "rarehost", True, True, BASE + 15000) == []
+
+    with patch.object(
+        parser, "filter_blocks_by_timerange", wraps=parser.filter_blocks_by_timerange
+    ) as read_blocks:
+        assert parser.find_connected_hosts(log_file, "rarehost") == {"host3"}
+        assert parser.find_hosts_connected_to(log_file, "rarehost") == {"host4"}
+    assert [len(call.args[1]) for call in read_blocks.call_args_list] == [1, 1]
+
+
+def test_bloom_queries_match_full_scans(log_file):
+    start = datetime.fromtimestamp(BASE + 3000)
+    end = datetime.fromtimestamp(BASE + 16000)
+    hosts = ["host1", "host17", "host50", "rarehost", "missing"]
+    expected = [
+        (
+            parser.find_connected_hosts(log_file, host, start, end),
+            parser.find_hosts_connected_to(log_file, host, start, end),
+        )
+        for host in hosts
+    ]
+
+    build_bloom_index(log_file, block_size=16 * 1024)
+    for prefilter in (False, True):
+        assert [
+            (
+                parser.find_connected_hosts(log_file, host, start, end, prefilter),
+                parser.find_hosts_connected_to(log_file, host, start, end, prefilter),
+            )
+            for host in hosts
+        ] == expected
+
+
+def test_last_line_without_newline_is_covered(tmp_path):
+    log_file = str(tmp_path / "tail.log")
+    with open(log_file, "w") as f:
+        f.write("1000 a b\n1001 c b\n1002 d b")
+    expected = parser.find_connected_hosts(log_file, "b")
+    assert expected == {"a", "c", "d"}
+
+    blocks = build_bloom_index(log_file, block_size=8)
+    assert blocks[-1].end == os.path.getsize(log_file)
+    assert "d" in blocks[-1].sources
+    for prefilter in (False, True):
+        assert parser.find_connected_hosts(log_file, "b", prefilter=prefilter) == (
+            expected
+        )
+        assert parser.find_hosts_connected_to(log_file, "d", prefilter=prefilter) == {
+            "b"
+        }
+
+
+def test_stale_index_is_ignored(log_file):
+    build_bloom_index(log_file, block_size=16 * 1024)
+    with open(log_file, "a") as f:
+        f.write(f"{BASE + 30000} newhost rarehost\n")
+
+    assert load_bloom_index(log_file) is None
+    assert parser.find_connected_hosts(log_file, "rarehost") == {"host3", "newhost"}
+
+    with open(bloom_path(log_file), "w") as f:
+        f.write("not json")
+    assert load_bloom_index(log_file) is None
@@ -0,0 +1,76 @@
+import random
+import time
+from unittest.mock import patch
+
+from src.processing.chains import Chain, ChainJoin, process_chains
+
+NOW = 1704067200
+
+
+def test_chain_within_window():
+    join = ChainJoin(60)
+    assert join.add(NOW, "a", "x") == []
+    assert join.add(NOW + 30, "x", "b") == [Chain("a", "x", "b", NOW, NOW + 30)]
+    # Too late for the first connection, and a bounce back is not a pivot
+    assert join.add(NOW + 61, "x", "c") == []
+    assert join.add(NOW + 40, "x", "a") == []
+
+
+def test_second_connection_may_arrive_first():
+    join = ChainJoin(60)
+    join.add(NOW + 30, "x", "b")
+    assert join.add(NOW + 10, "a", "x") == [Chain("a", "x", "b", NOW + 10, NOW + 30)]
+    # Records later than the lateness allowance are dropped
+    join.add(NOW + 10000, "y", "z")
+    assert join.add(NOW, "a", "y") == []
+
+
+def test_repeated_sources_report_earliest_connection():
+    join = ChainJoin(60)
+    for offset in (0, 5, 10):
+        join.add(NOW + offset, "a", "x")
+    join.add(NOW + 12, "c", "x")
+    assert sorted(join.add(NOW + 20, "x", "b")) == [
+        Chain("a", "x", "b", NOW, NOW + 20),
+        Chain("c", "x", "b", NOW + 12, NOW + 20),
+    ]
+
+
+def test_pivots_limit_buffered_hosts():
+    join = ChainJoin(60, pivots=["x"])
+    join.add(NOW, "a", "y")
+    join.add(NOW + 1, "y", "b")
+    join.add(NOW + 2, "a", "x")
+    assert set(join.inbound) == {"x"}
+    assert join.add(NOW + 3, "x", "b") == [Chain("a", "x", "b", NOW + 2, NOW + 3)]
+
+
+def test_state_is_bounded_by_window_and_per_host_limit():
+    rng = random.Random(1)
+    join = ChainJoin(60, max_per_host=50, lateness=0)
+    for i in range(50000):
+        join.add(NOW + i, f"host{rng.randint(1, 20)}", f"host{rng.randint(1, 20)}")
+    # About 60 seconds of records, two entries each
+    assert join.buffered() <= 2 * 61
+    assert len(join.expiry) <= 20
+
+    busy = ChainJoin(60, max_per_host=50)
+    for i in range(200):
+        busy.add(NOW, f"source{i}", "x")
+    assert len(busy.inbound["x"]) == 50
+    assert busy.dropped == 150
+
+
+@patch("time.sleep")
+def test_process_chains_emits_chains_as_read(mock_sleep, tmp_path):
+    now = int(time.time())
+    with open(tmp_path / "a.log", "w") as f:
+        f.write(f"{now - 100} a x\n")
+        f.write(f"{now - 50} c d\n")
+    with open(tmp_path / "b.log", "w") as f:
+        f.write(f"{now - 90} x b\n")
+        f.write(f"{now - 10} x e\n")
+
+    chains = []
+    process_chains(str(tmp_path), 60, max_iterations=3, emit=chains.append)
+    assert chains == [Chain("a", "x", "b", now - 100, now - 90)]
@@ -0,0 +1,147 @@
+import builtins
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+
+from src.parser.formats import (
+    FORMATS,
+    detect_file_format,
+    detect_format,
+    get_format,
+)
+from src.parser.parser import (
+    filter_by_timerange,
+    filter_stream_by_timerange,
+    find_connected_hosts,
+)
+
+RECORDS = [
+    (1704067200, "host1", "host2"),
+    (1704067260, "host3", "host1"),
+    (1704067320, "host2", "host3"),
+    (1704067380, "host4", "host1"),
+]
+
+
+def write_plain(path):
+    with open(path, "w") as f:
+        for timestamp, source, destination in RECORDS:
+            f.write(f"{timestamp} {source} {destination}\n")
+
+
+def write_csv(path):
+    with open(path, "w") as f:
+        f.write("timestamp,src,dst,port,bytes\n")
+        for timestamp, source, destination in RECORDS:
+            f.write(f"{timestamp},{source},{destination},443,1024\n")
+
+
+def write_jsonl(path):
+    with open(path, "w") as f:
+        for timestamp, source, destination in RECORDS:
+            record = {
+                "timestamp": timestamp,
+                "src": source,
+                "dst": destination,
+                "port": 443,
+                "bytes": 1024,
+            }
+            f.write(json.dumps(record) + "\n")
+
+
+WRITERS = {"plain": write_plain, "csv": write_csv, "jsonl": write_jsonl}
+
+
+@pytest.mark.parametrize("name", sorted(WRITERS))
+def test_detect_file_format(tmp_path, name):
+    log_file = str(tmp_path / f"connections.{name}")
+    WRITERS[name](log_file)
+    assert detect_file_format(log_file).name == name
+
+
+@pytest.mark.parametrize("name", sorted(WRITERS))
+def test_formats_produce_same_records(tmp_path, name):
+    log_file = str(tmp_path / f"connections.{name}")
+    WRITERS[name](log_file)
+    assert list(filter_by_timerange(log_file)) == RECORDS
+    assert list(filter_by_timerange(log_file, log_format=name)) == RECORDS
+
+
+@pytest.mark.parametrize("name", sorted(WRITERS))
+def test_scan_opens_the_file_once(tmp_path, name):
+    log_file = str(tmp_path / f"app.{name}")
+    WRITERS[name](log_file)
+    with patch("builtins.open", wraps=builtins.open) as opened:
+        assert list(filter_by_timerange(log_file)) == RECORDS
+    assert opened.call_count == 1
+
+
+@pytest.mark.parametrize("name", sorted(WRITERS))
+def test_prefilter_reads_any_format(tmp_path, name):
+    log_file = str(tmp_path / f"connections.{name}")
+    WRITERS[name](log_file)
+    assert find_connected_hosts(log_file, "host1", prefilter=True) == {"host3", "host4"}
+    assert find_connected_hosts(log_file, "host1") == {"host3", "host4"}
+
+
+@pytest.mark.parametrize("name", sorted(WRITERS))
+def test_stream_reads_any_format(tmp_path, name):
+    log_file = str(tmp_path / f"connections.{name}")
+    WRITERS[name](log_file)
+    with open(log_file, "rb") as f:
+        assert list(filter_stream_by_timerange(f, chunk_size=16)) == RECORDS
+
+
+def test_detect_format_falls_back_to_plain():
+    assert detect_format([]).name == "plain"
+    assert detect_format(["not a log line"]).name == "plain"
+
+
+def test_get_format_unknown():
+    with pytest.raises(ValueError):
+        get_format("xml")
+
+
+def test_csv_parser_skips_header_and_malformed_lines():
+    parse_line = FORMATS["csv"].parse_line
+    assert parse_line("timestamp,src,dst,port,bytes") is None
+    assert parse_line("1704067200,host1") is None
+    assert parse_line("1704067200,,host2") is None
+    assert parse_line("1704067200, host1 , host2 ,22,10\n") == (
+        1704067200,
+        "host1",
+        "host2",
+    )
+
+
+def test_json_key_scan_matches_full_decode():
+    parse_line = FORMATS["jsonl"].parse_line
+    # Key names used as values must not be mistaken for keys
+    assert parse_line('{"src": "dst", "dst": "src", "ts": 1704067200}') == (
+        1704067200,
+        "dst",
+        "src",
+    )
+    # Escaped strings fall back to json.loads
+    assert parse_line('{"ts": 1, "source": "a\\u0062", "destination": "c"}') == (
+        1,
+        "ab",
+        "c",
+    )
+    # Keys of nested objects are not the record's
+    assert parse_line(
+        '{"peer": {"src": "x", "ts": 2}, "ts": 1, "src": "a", "dst": "b"}'
+    ) == (1, "a", "b")
+    assert parse_line('{"ts": "x", "src": "a", "dst": "b"}') is None
+    assert parse_line("{broken") is None
+    assert parse_line("") is None
+
+
+def test_truncated_head_sample(tmp_path):
+    log_file = str(tmp_path / "long.log")
+    with open(log_file, "w") as f:
+        f.write("1704067200 host1 host2\n" * 1000)
+    assert detect_file_format(log_file).name == "plain"
+    assert os.path.getsize(log_file) > 4096
@@ -0,0 +1,74 @@
+import pytest
+import os
+
+from src.parser.parser import find_connected_hosts, count_connections_by_host
+from src.processing.incremental import update_aggregates
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = tmp_path / "conn.log"
+    path.write_text(
+        "1704068314 host22 host29\n"
+        "1704072476 host29 host35\n"
+        "1704073616 host33 host43\n"
+    )
+    return str(path)
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / "cache")
+
+
+def test_update_aggregates_initial_scan(log_file, cache_dir):
+    state = update_aggregates(log_file, "host29", cache_dir=cache_dir)
+
+    assert state["connected"] == ["host22"]
+    assert state["connected_to"] == ["host35"]
+    assert state["counts"] == {"host22": 1, "host29": 1, "host33": 1}
+    assert state["offset"] == os.path.getsize(log_file)
+
+
+def test_update_aggregates_scans_only_tail(log_file, cache_dir):
+    first = update_aggregates(log_file, "host29", cache_dir=cache_dir)
+    first_offset = first["offset"]
+
+    with open(log_file, "a") as f:
+        f.write("1704075119 host92 host29\n")
+        f.write("1704076025 host2 host2")  # incomplete, still being written
+
+    state = update_aggregates(log_file, "host29", cache_dir=cache_dir)
+    assert state["connected"] == ["host22", "host92"]
+    assert state["offset"] == first_offset + len("1704075119 host92 host29\n")
+
+    with open(log_file, "a") as f:
+        f.write("9\n")
+
+    state = update_aggregates(log_file, "host29", cache_dir=cache_dir)
+    assert state["connected"] == sorted(find_connected_hosts(log_file, "host29"))
+    assert state["counts"] == count_connections_by_host(log_file)
+
+
+def test_update_aggregates_rebuilds_after_truncation(log_file, cache_dir):
+    update_aggregates(log_file, "host29", cache_dir=cache_dir)
+
+    with open(log_file, "w") as f:
+        f.write("1704080440 host4 host29\n")
+
+    state = update_aggregates(log_file, "host29", cache_dir=cache_dir)
+    assert state["connected"] == ["host4"]
+    assert state["counts"] == {"host4": 1}
+
+
+def test_update_aggregates_rebuilds_after_rewrite(log_file, cache_dir):
+    update_aggregates(log_file, "host29", cache_dir=cache_dir)
+
+    # Same inode and a larger size, but the content was replaced
+    with open(log_file, "r+") as f:
+        f.write("1704068314 host11 host29\n")
+    with open(log_file, "a") as f:
+        f.write("1704080440 host4 host82\n")
+
+    state = update_aggregates(log_file, "host29", cache_dir=cache_dir)
+    assert state["connected"] == ["host11"]
@@ -0,0 +1,22 @@
+import subprocess
+import sys
+
+
+def test_cli_startup_does_not_load_tui_or_subcommands():
+    """The CLI entry point must not import the TUI or unused subcommand modules."""
+    code = (
+        "import sys\n"
+        "sys.argv = ['log-parser', 'cache', 'stats', '--cache-dir', sys.argv[1]]\n"
+        "import src.__main__\n"
+        "src.__main__.main()\n"
+        "loaded = [m for m in ('textual', 'src.tui', 'src.processing.query_server',"
+        " 'src.processing.rollup', 'src.processing.stream_processor',"
+        " 'src.processing.replay') if m in sys.modules]\n"
+        "assert not loaded, loaded\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code, "/nonexistent-cache-dir"],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
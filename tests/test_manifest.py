@@ -0,0 +1,183 @@
+import os
+import time
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+
+from src.processing.batch_processor import process_batch, process_batch_hosts
+from src.processing.manifest import (
+    MANIFEST_FILE,
+    extend_entry,
+    load_manifest,
+    refresh_manifest,
+    scan_entry,
+    select_log_files,
+)
+
+BASE = 1704067200
+HOUR = 3600
+
+
+def write_lines(path, lines, mode="w"):
+    with open(path, mode) as f:
+        for timestamp, source, destination in lines:
+            f.write(f"{timestamp} {source} {destination}\n")
+
+
+@pytest.fixture
+def rotated_logs(tmp_path):
+    """Three hourly rotated logs, the middle one slightly out of order."""
+    write_lines(
+        tmp_path / "app-1.log", [(BASE + i * 60, "host1", "host2") for i in range(60)]
+    )
+    write_lines(
+        tmp_path / "app-2.log",
+        [(BASE + HOUR + 120, "host3", "host2"), (BASE + HOUR, "host4", "host2")],
+    )
+    write_lines(tmp_path / "app-3.log", [(BASE + 2 * HOUR + 5, "host5", "host2")])
+    (tmp_path / "notes.txt").write_text("not a log\n")
+    return str(tmp_path)
+
+
+def test_refresh_manifest_records_ranges(rotated_logs):
+    manifest = refresh_manifest(rotated_logs)
+
+    assert sorted(manifest) == ["app-1.log", "app-2.log", "app-3.log"]
+    entry = manifest["app-2.log"]
+    assert (entry["min_ts"], entry["max_ts"], entry["line_count"]) == (
+        BASE + HOUR,
+        BASE + HOUR + 120,
+        2,
+    )
+    assert entry["offset"] == os.path.getsize(os.path.join(rotated_logs, "app-2.log"))
+    assert load_manifest(rotated_logs) == manifest
+
+
+def test_select_log_files_prunes_by_time(rotated_logs):
+    start = datetime.fromtimestamp(BASE + HOUR + 60)
+    end = datetime.fromtimestamp(BASE + HOUR + 90)
+    assert select_log_files(rotated_logs, start, end) == [
+        os.path.join(rotated_logs, "app-2.log")
+    ]
+    assert len(select_log_files(rotated_logs)) == 3
+    assert select_log_files(rotated_logs, datetime.fromtimestamp(BASE + 3 * HOUR)) == []
+
+
+def test_scan_entry_reads_only_appended_data(rotated_logs):
+    log_file = os.path.join(rotated_logs, "app-3.log")
+    entry = scan_entry(log_file)
+
+    # Rewrite the covered line in place; an incremental scan does not see it
+    with open(log_file, "r+") as f:
+        f.write(str(BASE - HOUR))
+    write_lines(log_file, [(BASE + 2 * HOUR + 30, "host6", "host2")], mode="a")
+    with open(log_file, "a") as f:
+        f.write(f"{BASE + 2 * HOUR + 40} host7 host2")
+
+    updated = scan_entry(log_file, entry)
+
+    assert updated["min_ts"] == BASE + 2 * HOUR + 5
+    assert updated["line_count"] == 2
+    assert updated["max_ts"] == BASE + 2 * HOUR + 30
+    # The incomplete trailing line is left for the next scan
+    assert updated["offset"] < os.path.getsize(log_file)
+    assert updated["tail_ts"] == BASE + 2 * HOUR + 40
+    assert entry["line_count"] == 1
+
+
+def test_scan_entry_rescans_replaced_file(rotated_logs):
+    log_file = os.path.join(rotated_logs, "app-1.log")
+    entry = scan_entry(log_file)
+
+    os.remove(log_file)
+    write_lines(log_file, [(BASE + 5 * HOUR, "host9", "host2")])
+    rescanned = scan_entry(log_file, entry)
+    assert (rescanned["min_ts"], rescanned["line_count"]) == (BASE + 5 * HOUR, 1)
+
+
+def test_extend_entry_requires_contiguous_range(rotated_logs):
+    manifest = refresh_manifest(rotated_logs)
+    log_file = os.path.join(rotated_logs, "app-3.log")
+    offset = manifest["app-3.log"]["offset"]
+
+    write_lines(log_file, [(BASE + 2 * HOUR + 50, "host6", "host2")], mode="a")
+    size = os.path.getsize(log_file)
+
+    # A gap in coverage is left to scan_entry
+    assert not extend_entry(manifest, log_file, offset + 1, size, 1, 2, 1)
+    assert extend_entry(
+        manifest, log_file, offset, size, BASE + 2 * HOUR + 50, BASE + 2 * HOUR + 50, 1
+    )
+    assert manifest["app-3.log"]["line_count"] == 2
+    assert manifest["app-3.log"]["max_ts"] == BASE + 2 * HOUR + 50
+
+
+def test_process_batch_directory_scans_only_overlapping_files(rotated_logs):
+    start = datetime.fromtimestamp(BASE + HOUR)
+    end = datetime.fromtimestamp(BASE + 2 * HOUR - 1)
+
+    with patch(
+        "src.processing.batch_processor.find_connected_hosts", return_value=set()
+    ) as mock_find:
+        process_batch(rotated_logs, "host2", start, end)
+    scanned = [call.args[0] for call in mock_find.call_args_list]
+    assert scanned == [os.path.join(rotated_logs, "app-2.log")]
+
+    assert process_batch(rotated_logs, "host2", start, end) == {"host3", "host4"}
+    assert process_batch(rotated_logs, "host2") == {"host1", "host3", "host4", "host5"}
+    assert os.path.exists(os.path.join(rotated_logs, MANIFEST_FILE))
+
+
+def test_process_batch_directory_includes_unterminated_last_line(tmp_path):
+    (tmp_path / "x.log").write_text(f"{BASE} a b\n{BASE + 100} c b")
+    (tmp_path / "y.log").write_text(f"{BASE} d b")
+    log_dir = str(tmp_path)
+
+    assert process_batch(log_dir, "b") == {"a", "c", "d"}
+    start = datetime.fromtimestamp(BASE + 50)
+    assert process_batch(log_dir, "b", start) == {"c"}
+
+    # Once the line is complete it is covered like any other
+    with open(tmp_path / "x.log", "a") as f:
+        f.write("\n")
+    entry = refresh_manifest(log_dir)["x.log"]
+    assert (entry["max_ts"], entry["tail_ts"]) == (BASE + 100, None)
+
+
+def test_process_batch_hosts_directory(rotated_logs):
+    results = process_batch_hosts(rotated_logs, ["host2", "host5"])
+    assert results["host2"]["inbound"] == {"host1", "host3", "host4", "host5"}
+    assert results["host5"]["outbound"] == {"host2"}
+
+
+class SteppingClock(datetime):
+    """datetime whose now() advances by two seconds per call."""
+
+    calls = 0
+
+    @classmethod
+    def now(cls, tz=None):
+        cls.calls += 1
+        return datetime.fromtimestamp(BASE + 2 * cls.calls, tz)
+
+
+@patch("time.sleep")
+def test_stream_maintains_manifest(mock_sleep, tmp_path):
+    from src.processing.stream_processor import process_stream
+
+    now = int(time.time())
+    write_lines(
+        tmp_path / "recent.log", [(now - 60 + i, "host1", "host2") for i in range(60)]
+    )
+
+    with patch("src.processing.stream_processor.datetime", SteppingClock), patch(
+        "builtins.print"
+    ):
+        process_stream(str(tmp_path), "host2", max_iterations=3)
+
+    manifest = load_manifest(str(tmp_path))
+    assert manifest["recent.log"]["line_count"] == 60
+    assert manifest["recent.log"]["min_ts"] == now - 60
+    # Entries written by the stream are current, so batch queries skip rescans
+    assert refresh_manifest(str(tmp_path)) == manifest
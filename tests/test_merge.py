@@ -0,0 +1,121 @@
+import os
+import random
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+
+from src.parser.parser import filter_by_timerange
+from src.parser.time_index import (
+    INDEX_SUFFIX,
+    TimeIndexBuilder,
+    load_index,
+    seek_offset,
+)
+from src.processing.merge import (
+    expand_log_paths,
+    merge_logs,
+    reorder,
+    write_merged_log,
+)
+
+BASE = 1704067200
+
+
+@pytest.fixture
+def sensor_logs(tmp_path):
+    """Three sensor logs, each sorted only to within five minutes."""
+    rng = random.Random(3)
+    for sensor in range(3):
+        with open(tmp_path / f"sensor{sensor}.log", "w") as f:
+            timestamp = BASE
+            for _ in range(3000):
+                timestamp += rng.randint(0, 2)
+                jitter = rng.randint(0, 290)
+                f.write(f"{timestamp - jitter} s{sensor} host{rng.randint(1, 30)}\n")
+    return tmp_path
+
+
+def all_records(log_files, start_time=None, end_time=None):
+    records = []
+    for log_file in log_files:
+        records.extend(filter_by_timerange(log_file, start_time, end_time))
+    return records
+
+
+def test_reorder_within_tolerance():
+    records = [(100, "a", "b"), (90, "c", "d"), (400, "e", "f"), (120, "g", "h")]
+    assert [r[0] for r in reorder(records, tolerance=300)] == [90, 100, 120, 400]
+
+
+def test_reorder_yields_records_beyond_tolerance():
+    records = [(1000, "a", "b"), (100, "late", "x"), (1001, "c", "d")]
+    assert sorted(reorder(records, tolerance=300)) == sorted(records)
+
+
+def test_merge_logs_is_time_ordered(sensor_logs):
+    log_files = expand_log_paths([str(sensor_logs)])
+    merged = list(merge_logs(log_files))
+
+    assert [r[0] for r in merged] == sorted(r[0] for r in merged)
+    assert sorted(merged) == sorted(all_records(log_files))
+
+
+def test_merge_logs_time_range(sensor_logs):
+    log_files = expand_log_paths([str(sensor_logs)])
+    start = datetime.fromtimestamp(BASE + 1000)
+    end = datetime.fromtimestamp(BASE + 2000)
+    merged = list(merge_logs(log_files, start, end))
+
+    assert sorted(merged) == sorted(all_records(log_files, start, end))
+    assert all(BASE + 1000 <= r[0] <= BASE + 2000 for r in merged)
+
+
+def test_write_merged_log_with_index(sensor_logs, tmp_path):
+    log_files = expand_log_paths([str(sensor_logs)])
+    output = str(tmp_path / "merged.out")
+    count = write_merged_log(merge_logs(log_files), output, index=True)
+
+    assert count == 9000
+    index = load_index(output)
+    assert index and index[0][1] == 0
+
+    start = datetime.fromtimestamp(BASE + 2500)
+    end = datetime.fromtimestamp(BASE + 2600)
+    expected = sorted(all_records(log_files, start, end))
+    assert sorted(filter_by_timerange(output, start, end)) == expected
+
+    # The indexed scan starts near the range instead of at the beginning
+    with patch("src.parser.parser.seek_offset", wraps=seek_offset) as mock_seek:
+        list(filter_by_timerange(output, start, end))
+    mock_seek.assert_called_once_with(index, BASE + 2500)
+    assert seek_offset(index, BASE + 2500) > 0
+
+
+def test_stale_index_is_ignored(sensor_logs, tmp_path):
+    log_files = expand_log_paths([str(sensor_logs)])
+    output = str(tmp_path / "merged.out")
+    write_merged_log(merge_logs(log_files), output, index=True)
+
+    with open(output, "a") as f:
+        f.write(f"{BASE} appended host1\n")
+    assert load_index(output) is None
+    start = datetime.fromtimestamp(BASE)
+    assert (BASE, "appended", "host1") in filter_by_timerange(output, start)
+
+
+def test_unsorted_output_gets_no_index(tmp_path):
+    output = str(tmp_path / "out.log")
+    records = [(BASE + 100, "a", "b"), (BASE, "c", "d")]
+    write_merged_log(records, output, index=True)
+    assert not os.path.exists(output + INDEX_SUFFIX)
+
+
+def test_index_builder_stride():
+    builder = TimeIndexBuilder(stride=100)
+    for offset in range(0, 1000, 30):
+        builder.add(BASE + offset, offset)
+    offsets = [offset for _, offset in builder.entries]
+    assert offsets == [0, 120, 240, 360, 480, 600, 720, 840, 960]
+    assert seek_offset(builder.entries, BASE) == 0
+    assert seek_offset(builder.entries, BASE + 500) == 480
@@ -0,0 +1,84 @@
+import os
+import time
+import urllib.request
+from unittest.mock import patch
+
+from src.processing.metrics import (
+    Histogram,
+    MetricsRegistry,
+    StreamMetrics,
+    serve_metrics,
+    write_textfile,
+)
+from src.processing.stream_processor import process_stream
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("lag_seconds", "Lag", (1, 5))
+    for value in (0.5, 1, 3, 10):
+        histogram.observe(value)
+    assert histogram.samples() == [
+        'lag_seconds_bucket{le="1"} 2',
+        'lag_seconds_bucket{le="5"} 3',
+        'lag_seconds_bucket{le="+Inf"} 4',
+        "lag_seconds_sum 14.5",
+        "lag_seconds_count 4",
+    ]
+
+
+def test_stream_metrics_exposition():
+    metrics = StreamMetrics()
+    metrics.record_chunk(1000, lines=20, records=18, newest_timestamp=100, now=103)
+    metrics.record_state(tracked_files=3, backlog_bytes=4096)
+    text = metrics.registry.render()
+
+    assert "# TYPE log_parser_lines_total counter" in text
+    assert "log_parser_lines_total 20\n" in text
+    assert "log_parser_bytes_total 1000\n" in text
+    assert "log_parser_parse_errors_total 2\n" in text
+    assert "log_parser_tracked_files 3\n" in text
+    assert "log_parser_backlog_bytes 4096\n" in text
+    assert 'log_parser_ingest_lag_seconds_bucket{le="2.5"} 0\n' in text
+    assert 'log_parser_ingest_lag_seconds_bucket{le="5"} 1\n' in text
+
+
+def test_serve_metrics_and_textfile(tmp_path):
+    registry = MetricsRegistry()
+    registry.register(StreamMetrics().lines).inc(7)
+
+    server = serve_metrics(registry, 0)
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/metrics"
+        with urllib.request.urlopen(url) as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+            assert "log_parser_lines_total 7" in response.read().decode()
+    finally:
+        server.shutdown()
+
+    path = str(tmp_path / "log_parser.prom")
+    write_textfile(registry, path)
+    with open(path) as f:
+        assert f.read() == registry.render()
+
+
+@patch("time.sleep")
+def test_process_stream_records_metrics(mock_sleep, tmp_path):
+    now = int(time.time())
+    log_file = tmp_path / "app.log"
+    with open(log_file, "w") as f:
+        for i in range(8):
+            f.write(f"{now - 10} host{i} host0\n")
+        f.write("garbage\n\n")
+
+    textfile = str(tmp_path / "metrics.prom")
+    metrics = StreamMetrics(textfile)
+    with patch("builtins.print"):
+        process_stream(str(tmp_path), "host0", max_iterations=2, metrics=metrics)
+
+    assert metrics.lines.value == 10
+    assert metrics.parse_errors.value == 2
+    assert metrics.bytes.value == os.path.getsize(log_file)
+    assert metrics.tracked_files.value == 1
+    assert metrics.ingest_lag.count == 1
+    with open(textfile) as f:
+        assert "log_parser_lines_total 10" in f.read()
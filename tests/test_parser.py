@@ -6,11 +6,15 @@ from datetime import datetime, timedelta
 from src.parser.parser import (
     parse_log_line,
     filter_by_timerange,
+    iter_host_lines,
     find_connected_hosts,
     find_hosts_connected_to,
+    find_connections_for_hosts,
     count_connections_by_host,
     find_most_active_host,
+    find_offset_after,
 )
+from src.processing.batch_processor import process_batch_stream
 
 
 @pytest.fixture
@@ -332,3 +336,121 @@ def test_filter_by_timerange_edge_cases(sample_log_file):
     future_time = datetime.now() + timedelta(days=1)
     results = list(filter_by_timerange(log_path, future_time))
     assert len(results) == 0  # Should be empty as it's in the future
+
+
+def test_find_connections_for_hosts(sample_log_file):
+    log_path, time_refs = sample_log_file
+
+    results = find_connections_for_hosts(log_path, ["host1", "host4", "host9"])
+    assert set(results) == {"host1", "host4", "host9"}
+
+    for host in ("host1", "host4"):
+        assert results[host]["inbound"] == find_connected_hosts(log_path, host)
+        assert results[host]["outbound"] == find_hosts_connected_to(log_path, host)
+
+    assert results["host9"] == {"inbound": set(), "outbound": set()}
+
+    recent = find_connections_for_hosts(
+        log_path, ["host1"], start_time=time_refs["mid_time"]
+    )
+    assert recent["host1"]["outbound"] == {"host4"}
+
+
+def test_process_batch_stream_matches_file_scan(sample_log_file):
+    log_path, time_refs = sample_log_file
+    hosts = ["host1", "host3", "host9"]
+
+    for start_time in (None, time_refs["mid_time"]):
+        with open(log_path, "rb") as stream:
+            results = process_batch_stream(stream, hosts, start_time, read_ahead=64)
+        assert results == find_connections_for_hosts(log_path, hosts, start_time)
+
+
+def test_iter_host_lines_token_boundaries(tmp_path):
+    log_path = tmp_path / "conn.log"
+    log_path.write_bytes(
+        b"1704068314 host2 host27\n"
+        b"1704072476 host27 host2\n"
+        b"1704073616 host271 host272\n"
+        b"1704075119 host22 host2\t\n"
+        b"1704076025 xhost2 host20"
+    )
+
+    lines = list(iter_host_lines(str(log_path), "host2"))
+    assert lines == [
+        b"1704068314 host2 host27",
+        b"1704072476 host27 host2",
+        b"1704075119 host22 host2\t",
+    ]
+    assert list(iter_host_lines(str(log_path), "host20")) == [
+        b"1704076025 xhost2 host20"
+    ]
+
+    empty_path = tmp_path / "empty.log"
+    empty_path.write_bytes(b"")
+    assert list(iter_host_lines(str(empty_path), "host2")) == []
+
+
+def test_prefilter_matches_full_scan(sample_log_file, real_log_file):
+    log_path, time_refs = sample_log_file
+
+    for host in ("host1", "host2", "host4", "missing"):
+        for start_time in (None, time_refs["mid_time"]):
+            assert find_connected_hosts(
+                log_path, host, start_time, prefilter=True
+            ) == find_connected_hosts(log_path, host, start_time)
+            assert find_hosts_connected_to(
+                log_path, host, start_time, prefilter=True
+            ) == find_hosts_connected_to(log_path, host, start_time)
+
+    assert find_connected_hosts(real_log_file, "host29", prefilter=True) == {
+        "host22",
+        "host11",
+    }
+
+    with pytest.raises(ValueError):
+        find_connected_hosts(
+            log_path,
+            "host1",
+            time_refs["end_time"],
+            time_refs["start_time"],
+            prefilter=True,
+        )
+
+
+def test_find_offset_after_skips_only_old_lines(tmp_path):
+    log_file = tmp_path / "disordered.log"
+    lines = []
+    for i in range(2000):
+        # Up to four minutes out of order
+        timestamp = 1704067200 + i * 10 - (240 if i % 7 == 0 else 0)
+        lines.append(f"{timestamp} host{i % 13} host{i % 5}\n")
+    lines.insert(500, "garbage line\n")
+    log_file.write_text("".join(lines))
+
+    for target in (1704067200 + 5000, 1704067200 + 12345, 1704067200 + 19990):
+        offset = find_offset_after(str(log_file), target)
+        with open(log_file, "rb") as f:
+            skipped = f.read(offset).decode()
+        assert offset == 0 or skipped.endswith("\n")
+        # No line at or after the target is skipped, and little else is read
+        assert all(
+            int(line.split()[0]) < target
+            for line in skipped.splitlines()
+            if line[0].isdigit()
+        )
+        newer_lines = (1704067200 + 20000 - target) // 10
+        assert len(lines) - len(skipped.splitlines()) <= newer_lines + 60
+
+
+def test_find_offset_after_edges(tmp_path):
+    log_file = tmp_path / "sorted.log"
+    log_file.write_text("1000 a b\n2000 a b\n3000 a b\n")
+
+    assert find_offset_after(str(log_file), 500) == 0
+    assert find_offset_after(str(log_file), 10000) == log_file.stat().st_size
+    assert find_offset_after(str(log_file), 3000, tolerance=0) == 18
+
+    empty_file = tmp_path / "empty.log"
+    empty_file.write_text("")
+    assert find_offset_after(str(empty_file), 1000) == 0
@@ -0,0 +1,144 @@
+import random
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+
+from src.parser.bloom_index import build_bloom_index
+from src.processing import planner
+from src.processing.batch_processor import _scan, process_batch
+from src.processing.incremental import update_aggregates
+from src.processing.merge import write_merged_log
+from src.processing.planner import count_occurrences, plan_query
+from src.processing.rollup import build_rollup, default_rollup_path, save_rollup
+
+BASE = 1704067200
+
+
+@pytest.fixture
+def records():
+    rng = random.Random(3)
+    records = [
+        (BASE + i, f"host{rng.randint(1, 30)}", f"host{rng.randint(1, 30)}")
+        for i in range(20000)
+    ]
+    records.append((BASE + 20000, "lonely", "host7"))
+    return records
+
+
+@pytest.fixture
+def log_file(tmp_path, records):
+    path = str(tmp_path / "app.log")
+    write_merged_log(records, path)
+    return path
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / "cache")
+
+
+def strategies(plans):
+    return [plan.strategy for plan in plans]
+
+
+def test_count_occurrences_estimates_from_samples(log_file):
+    with open(log_file, "rb") as f:
+        exact = f.read().count(b"host7")
+    assert count_occurrences(log_file, "lonely") == 1
+    assert abs(count_occurrences(log_file, "host7") - exact) < exact * 0.2
+
+
+def test_plans_are_ordered_by_cost(log_file, cache_dir):
+    plans = plan_query(log_file, "lonely", cache_dir=cache_dir)
+    assert strategies(plans) == ["mmap", "scan"]
+    assert plans[0].seconds < plans[1].seconds
+
+    # Every line contains the token twice, so searching for it loses
+    assert plan_query(log_file, "host", cache_dir=cache_dir)[0].strategy == "scan"
+
+
+def test_sidecars_and_state_add_plans(log_file, cache_dir):
+    process_batch(log_file, "host7", use_cache=True, cache_dir=cache_dir)
+    update_aggregates(log_file, "host7", cache_dir=cache_dir)
+    save_rollup(build_rollup(log_file), log_file, default_rollup_path(log_file))
+    build_bloom_index(log_file, block_size=16 * 1024)
+
+    plans = plan_query(log_file, "host7", use_cache=True, cache_dir=cache_dir)
+    assert plans[0].strategy == "cache"
+    assert set(strategies(plans)) == {
+        "cache",
+        "incremental",
+        "rollup",
+        "bloom",
+        "mmap",
+        "scan",
+    }
+
+    # The rollup only answers whole minutes
+    start = datetime.fromtimestamp(BASE + 30)
+    assert "rollup" not in strategies(plan_query(log_file, "host7", start))
+
+
+def test_time_index_replaces_scan(records, tmp_path):
+    indexed = str(tmp_path / "indexed.log")
+    write_merged_log(records, indexed, index=True)
+    start = datetime.fromtimestamp(BASE + 1000)
+    end = datetime.fromtimestamp(BASE + 1999)
+    plans = plan_query(indexed, "host", start, end)
+    assert strategies(plans)[0] == "time-index"
+    assert "scan" not in strategies(plans)
+
+
+def test_flags_force_strategies(log_file, cache_dir):
+    assert strategies(plan_query(log_file, "host", prefilter=True)) == ["mmap"]
+    assert strategies(
+        plan_query(log_file, "host7", cache_dir=cache_dir, incremental=True)
+    ) == ["incremental"]
+
+    def scan_plan(cores):
+        plans = plan_query(log_file, "host", cores=cores)
+        return next(plan for plan in plans if plan.strategy == "scan")
+
+    with patch.object(planner, "READ_AHEAD_MIN_BYTES", 0):
+        assert scan_plan(1).read_ahead is None
+        assert scan_plan(4).read_ahead == planner.READ_AHEAD_BUFFER_BYTES
+
+
+def test_every_plan_gives_the_same_result(log_file, cache_dir):
+    start = datetime.fromtimestamp(BASE + 3000)
+    end = datetime.fromtimestamp(BASE + 15599)
+    expected = _scan(log_file, "host7", start, end, cache_dir, False, False, None)
+    assert expected
+
+    update_aggregates(log_file, "host7", start, end, cache_dir)
+    save_rollup(build_rollup(log_file), log_file, default_rollup_path(log_file))
+    build_bloom_index(log_file, block_size=16 * 1024)
+    plans = plan_query(log_file, "host7", start, end, cache_dir=cache_dir)
+    assert len(plans) == 5
+
+    for plan in plans:
+        with patch("src.processing.batch_processor.plan_query", return_value=[plan]):
+            result = _scan(log_file, "host7", start, end, cache_dir, False, False, None)
+        assert result == expected, plan.strategy
+
+
+def test_every_plan_counts_a_last_line_without_newline(log_file, cache_dir):
+    with open(log_file, "a") as f:
+        f.write(f"{BASE + 20001} tailhost host7")
+    expected = _scan(log_file, "host7", None, None, cache_dir, False, False, None)
+    assert "tailhost" in expected
+
+    update_aggregates(log_file, "host7", cache_dir=cache_dir)
+    save_rollup(build_rollup(log_file), log_file, default_rollup_path(log_file))
+    build_bloom_index(log_file, block_size=16 * 1024)
+    plans = plan_query(log_file, "host7", cache_dir=cache_dir)
+    assert set(strategies(plans)) == {"incremental", "rollup", "bloom", "mmap", "scan"}
+
+    for plan in plans:
+        with patch("src.processing.batch_processor.plan_query", return_value=[plan]):
+            result = _scan(log_file, "host7", None, None, cache_dir, False, False, None)
+        assert result == expected, plan.strategy
+    assert process_batch(log_file, "host7", cache_dir=cache_dir, incremental=True) == (
+        expected
+    )
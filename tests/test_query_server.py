@@ -0,0 +1,143 @@
+import pytest
+import os
+import socket
+import threading
+from unittest.mock import patch
+
+from src.parser.parser import (
+    find_connected_hosts,
+    find_hosts_connected_to,
+    count_connections_by_host,
+)
+from src.processing.query_server import (
+    IndexedLogs,
+    QueryServer,
+    answer_query,
+    default_socket_path,
+    query_server,
+    read_new_records,
+    serve,
+)
+
+
+@pytest.fixture
+def log_dir(tmp_path):
+    (tmp_path / "a.log").write_text(
+        "1704068314 host22 host29\n"
+        "1704072476 host29 host35\n"
+        "1704068000 host33 host29\n"  # out of order
+    )
+    (tmp_path / "b.log").write_text("1704080440 host4 host29\n")
+    return tmp_path
+
+
+def test_answer_query_matches_parser(log_dir):
+    logs = IndexedLogs([str(log_dir)])
+    assert logs.refresh() == 4
+
+    log_file = str(log_dir / "a.log")
+    request = {"file": log_file, "host": "host29"}
+
+    result = answer_query(logs, dict(request, query="connected", start=1704068100))
+    assert set(result) == {"host22"}
+
+    result = answer_query(logs, dict(request, query="connected"))
+    assert set(result) == find_connected_hosts(log_file, "host29")
+
+    result = answer_query(logs, dict(request, query="connected_to"))
+    assert set(result) == find_hosts_connected_to(log_file, "host29")
+
+    result = answer_query(logs, {"file": log_file, "query": "counts"})
+    assert result == count_connections_by_host(log_file)
+
+    # Without a file, every served log is queried
+    result = answer_query(logs, {"query": "connected", "host": "host29"})
+    assert set(result) == {"host22", "host33", "host4"}
+
+    with pytest.raises(ValueError):
+        answer_query(logs, {"query": "bogus"})
+    with pytest.raises(ValueError):
+        answer_query(logs, {"query": "counts", "file": str(log_dir / "c.log")})
+
+
+def test_refresh_picks_up_appends_and_truncation(log_dir):
+    logs = IndexedLogs([str(log_dir)])
+    logs.refresh()
+
+    with open(log_dir / "b.log", "a") as f:
+        f.write("1704080500 host5 host29\n")
+    assert logs.refresh() == 1
+
+    with open(log_dir / "b.log", "w") as f:
+        f.write("1704 x y\n")
+    logs.refresh()
+
+    result = answer_query(logs, {"query": "counts", "file": str(log_dir / "b.log")})
+    assert result == {"x": 1}
+
+
+def test_query_over_socket(log_dir, tmp_path):
+    logs = IndexedLogs([str(log_dir)])
+    logs.refresh()
+
+    socket_path = str(tmp_path / "query.sock")
+    server = QueryServer(socket_path, logs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        result = query_server(socket_path, {"query": "most_active"})
+        assert result[1] == 1
+        assert os.stat(socket_path).st_mode & 0o777 == 0o600
+
+        with pytest.raises(ValueError):
+            query_server(socket_path, {"query": "connected"})
+    finally:
+        server.shutdown()
+        server.server_close()
+        os.unlink(socket_path)
+
+
+def test_unreadable_file_does_not_stop_refresh(log_dir):
+    def read_or_fail(tracker):
+        if tracker["file_path"].endswith("a.log"):
+            raise PermissionError("Permission denied")
+        return read_new_records(tracker)
+
+    logs = IndexedLogs([str(log_dir)])
+    with patch("src.processing.query_server.read_new_records", read_or_fail):
+        assert logs.refresh() == 1
+
+    result = answer_query(logs, {"query": "connected", "host": "host29"})
+    assert set(result) == {"host4"}
+
+
+@patch("time.sleep")
+def test_serve_only_replaces_stale_sockets(mock_sleep, log_dir, tmp_path):
+    socket_path = str(tmp_path / "query.sock")
+    with open(socket_path, "w") as f:
+        f.write("not a socket")
+    with pytest.raises(ValueError):
+        serve([str(log_dir)], socket_path, max_iterations=1)
+    assert os.path.isfile(socket_path)
+    os.unlink(socket_path)
+
+    listening = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listening.bind(socket_path)
+    listening.listen()
+    with pytest.raises(ValueError):
+        serve([str(log_dir)], socket_path, max_iterations=1)
+    listening.close()
+
+    # Left behind by a daemon that is gone
+    serve([str(log_dir)], socket_path, max_iterations=1)
+    assert not os.path.exists(socket_path)
+
+
+def test_default_socket_is_per_user(tmp_path):
+    with patch.dict(os.environ, {"XDG_RUNTIME_DIR": str(tmp_path / "run")}):
+        assert default_socket_path() == str(tmp_path / "run" / "log-parser.sock")
+
+    environ = {"LOG_PARSER_CACHE_DIR": str(tmp_path / "cache")}
+    with patch.dict(os.environ, environ):
+        os.environ.pop("XDG_RUNTIME_DIR", None)
+        assert default_socket_path() == str(tmp_path / "cache" / "log-parser.sock")
@@ -0,0 +1,49 @@
+import pytest
+
+from src.parser.parser import filter_by_timerange
+from src.parser.reader import iter_lines_readahead, iter_stream_lines
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = tmp_path / "conn.log"
+    lines = [f"{1704068314 + i} host{i % 7} hôst{i % 5}\n" for i in range(500)]
+    path.write_text("".join(lines) + "1704069000 host1 host2", encoding="utf-8")
+    return str(path)
+
+
+def test_readahead_matches_plain_read(log_file):
+    with open(log_file, "r", encoding="utf-8") as f:
+        expected = [line.rstrip("\n") for line in f]
+
+    # Small buffers force lines and multi-byte characters across boundaries
+    for buffer_size in (7, 64, 1 << 20):
+        assert list(iter_lines_readahead(log_file, buffer_size=buffer_size)) == expected
+
+
+def test_stream_lines_match_plain_read(log_file):
+    with open(log_file, "r", encoding="utf-8") as f:
+        expected = [line.rstrip("\n") for line in f]
+
+    for chunk_size in (7, 64, 1 << 20):
+        with open(log_file, "rb") as f:
+            assert list(iter_stream_lines(f, chunk_size)) == expected
+        with open(log_file, "rb") as f:
+            assert list(iter_lines_readahead(f, buffer_size=chunk_size)) == expected
+
+
+def test_readahead_early_close_stops_reader(log_file):
+    lines = iter_lines_readahead(log_file, buffer_size=16, depth=1)
+    assert next(lines).startswith("1704068314")
+    lines.close()
+
+
+def test_readahead_missing_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        list(iter_lines_readahead(str(tmp_path / "missing.log")))
+
+
+def test_filter_by_timerange_with_readahead(log_file):
+    assert list(filter_by_timerange(log_file, read_ahead=128)) == list(
+        filter_by_timerange(log_file)
+    )
@@ -0,0 +1,88 @@
+import os
+from unittest.mock import patch
+
+from src.parser.parser import filter_by_timerange
+from src.processing.replay import (
+    PROBE_HOST,
+    PROBE_PREFIX,
+    percentile,
+    replay_records,
+    run_replay,
+    synthetic_records,
+)
+
+
+def read_records(path):
+    return list(filter_by_timerange(str(path)))
+
+
+def test_replay_records_fans_out_and_rewrites_timestamps(tmp_path):
+    records = list(synthetic_records(2500, seed=1))
+    with patch("time.time", return_value=1800000000.5):
+        stats = replay_records(
+            records, str(tmp_path), speed=0, fan_out=3, probe_interval=None
+        )
+
+    assert stats["lines"] == 2500 and stats["probes"] == 0
+    replayed = [read_records(tmp_path / f"replay-{i}.log") for i in range(3)]
+    assert [len(lines) for lines in replayed] == [834, 833, 833]
+    assert replayed[1][0] == (1800000000, records[1][1], records[1][2])
+    assert all(record[0] == 1800000000 for lines in replayed for record in lines)
+
+
+def test_replay_records_events(tmp_path):
+    clock = iter(range(0, 10**6, 1))
+
+    # Each call to monotonic() advances one second
+    with patch("time.monotonic", side_effect=lambda: next(clock)), patch(
+        "time.sleep"
+    ):
+        stats = replay_records(
+            synthetic_records(10, seed=2),
+            str(tmp_path),
+            speed=1,
+            fan_out=2,
+            rotate_every=5,
+            truncate_every=7,
+            probe_interval=2,
+        )
+
+    assert stats["lines"] == 10
+    assert stats["probes"] >= 2
+    assert stats["rotations"] >= 1
+    assert stats["truncations"] >= 1
+    assert os.path.exists(tmp_path / "replay-0.log.1")
+    probes = [
+        record
+        for i in range(2)
+        for record in read_records(tmp_path / f"replay-{i}.log")
+        if record[2] == PROBE_HOST
+    ]
+    assert all(source.startswith(PROBE_PREFIX) for _, source, _ in probes)
+
+
+def test_run_replay_measures_ingest_and_latency(tmp_path):
+    result = run_replay(
+        str(tmp_path / "replay"),
+        synthetic_lines=20000,
+        speed=0,
+        fan_out=2,
+        probe_interval=0.05,
+    )
+
+    writer = result["writer"]
+    assert result["ingested_lines"] == writer["lines"] + writer["probes"] == (
+        20000 + writer["probes"]
+    )
+    assert result["parse_errors"] == 0
+    assert result["lost_probes"] == 0
+    assert len(result["latencies"]) == writer["probes"]
+    assert all(0 <= latency < 10 for latency in result["latencies"])
+    assert result["peak_lines_per_second"] > 0
+
+
+def test_percentile():
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 0.5) == 51
+    assert percentile(values, 0.99) == 100
+    assert percentile([3.0], 0.9) == 3.0
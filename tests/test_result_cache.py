@@ -0,0 +1,80 @@
+import pytest
+import time
+from unittest.mock import patch
+
+from src.processing.batch_processor import process_batch
+from src.processing.result_cache import (
+    make_cache_key,
+    cache_get,
+    cache_put,
+    cache_stats,
+    cache_clear,
+    evict_lru,
+)
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = tmp_path / "conn.log"
+    path.write_text(
+        "1704068314 host22 host29\n"
+        "1704072476 host74 host29\n"
+        "1704073616 host33 host43\n"
+    )
+    return str(path)
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / "cache")
+
+
+def test_cache_roundtrip(log_file, cache_dir):
+    key = make_cache_key(log_file, "connected", "host29")
+    assert cache_get(key, cache_dir) is None
+
+    cache_put(key, ["host22", "host74"], cache_dir)
+    assert cache_get(key, cache_dir) == ["host22", "host74"]
+
+    stats = cache_stats(cache_dir)
+    assert stats["entries"] == 1
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_cache_key_changes_with_file_and_query(log_file):
+    key = make_cache_key(log_file, "connected", "host29")
+    assert key != make_cache_key(log_file, "connected", "host43")
+
+    with open(log_file, "a") as f:
+        f.write("1704075119 host92 host29\n")
+    assert key != make_cache_key(log_file, "connected", "host29")
+
+
+def test_process_batch_uses_cache(log_file, cache_dir):
+    first = process_batch(log_file, "host29", use_cache=True, cache_dir=cache_dir)
+    assert first == {"host22", "host74"}
+
+    # A hit must be answered without scanning the log
+    with patch("src.processing.batch_processor.find_connected_hosts") as mock_find:
+        second = process_batch(log_file, "host29", use_cache=True, cache_dir=cache_dir)
+        mock_find.assert_not_called()
+    assert second == first
+    assert cache_stats(cache_dir)["hits"] == 1
+
+
+def test_evict_lru_removes_oldest(log_file, cache_dir):
+    for i in range(3):
+        cache_put(f"key{i}", ["x" * 100], cache_dir)
+        time.sleep(0.01)
+
+    # Touch key0 so key1 becomes the least recently used entry
+    cache_get("key0", cache_dir)
+    entry_size = cache_stats(cache_dir)["total_bytes"] // 3
+
+    assert evict_lru(cache_dir, max_bytes=entry_size * 2) == 1
+    assert cache_get("key1", cache_dir) is None
+    assert cache_get("key0", cache_dir) is not None
+
+    assert cache_clear(cache_dir) == 2
+    assert cache_stats(cache_dir)["entries"] == 0
@@ -0,0 +1,60 @@
+import pytest
+from datetime import datetime
+
+from src.parser.parser import count_connections_by_host
+from src.processing.rollup import (
+    build_rollup,
+    save_rollup,
+    load_rollup,
+    rollup_host_counts,
+    rollup_edge_counts,
+    rollup_histogram,
+)
+
+DAY_START = 1704067200  # 2024-01-01 00:00:00 UTC
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = tmp_path / "conn.log"
+    path.write_text(
+        f"{DAY_START + 10} host1 host2\n"
+        f"{DAY_START + 70} host1 host3\n"
+        f"{DAY_START + 3700} host2 host1\n"
+        f"{DAY_START + 86400 + 5} host1 host2\n"
+        f"{DAY_START + 2 * 86400 + 3600} host3 host1\n"
+    )
+    return str(path)
+
+
+def test_rollup_roundtrip_matches_full_scan(log_file, tmp_path):
+    rollup_path = str(tmp_path / "conn.rollup.json.gz")
+    save_rollup(build_rollup(log_file), log_file, rollup_path)
+    buckets = load_rollup(rollup_path)
+
+    assert rollup_host_counts(buckets) == count_connections_by_host(log_file)
+    assert rollup_edge_counts(buckets)[("host1", "host2")] == 2
+
+
+def test_rollup_range_combines_buckets(log_file):
+    buckets = build_rollup(log_file)
+
+    start = datetime.fromtimestamp(DAY_START + 60)
+    end = datetime.fromtimestamp(DAY_START + 86400 + 59)
+    counts = rollup_host_counts(buckets, start, end)
+    assert counts == count_connections_by_host(log_file, start, end)
+    assert counts == {"host1": 2, "host2": 1}
+
+
+def test_rollup_histogram(log_file):
+    buckets = build_rollup(log_file)
+
+    histogram = rollup_histogram(buckets, 86400)
+    assert [count for _, count in histogram] == [3, 1, 1]
+
+    histogram = rollup_histogram(buckets, 3600, hostname="host1")
+    assert histogram[0] == (DAY_START, 2)
+    assert sum(count for _, count in histogram) == 3
+
+    with pytest.raises(ValueError):
+        rollup_histogram(buckets, 90)
@@ -0,0 +1,92 @@
+import mmap
+from datetime import datetime
+
+import pytest
+
+from src.parser.parser import count_connections_by_host, find_connected_hosts
+from src.processing.sampling import iter_sample_estimates, read_block, sample_batch
+
+
+@pytest.fixture
+def large_log_file(tmp_path):
+    log_file = tmp_path / "large.log"
+    with open(log_file, "w") as f:
+        for i in range(20000):
+            # host0 makes every fifth connection, the rest are spread out
+            source = "host0" if i % 5 == 0 else f"host{1 + i % 40}"
+            f.write(f"{1704067200 + i} {source} host{i % 7}\n")
+    return str(log_file)
+
+
+def test_blocks_partition_lines(large_log_file):
+    with open(large_log_file, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        block_size = 1000
+        blocks = [
+            read_block(buffer, offset, block_size)
+            for offset in range(0, len(buffer), block_size)
+        ]
+        buffer.close()
+
+    lines = [line for block in blocks for line in block.split("\n") if line]
+    with open(large_log_file) as f:
+        assert lines == f.read().splitlines()
+
+
+def test_full_sample_is_exact(large_log_file):
+    sample = sample_batch(large_log_file, "host3", rate=1.0, block_size=4096)
+
+    assert sample["exact"]
+    assert sample["blocks_sampled"] == sample["blocks_total"]
+    assert sample["total"] == (20000, 20000, 20000)
+    expected_counts = count_connections_by_host(large_log_file)
+    assert {host: est.value for host, est in sample["counts"].items()} == expected_counts
+    assert sample["connected_hosts"] == find_connected_hosts(large_log_file, "host3")
+
+
+def test_partial_sample_estimates(large_log_file):
+    sample = sample_batch(large_log_file, "host3", rate=0.3, block_size=4096, seed=7)
+
+    assert not sample["exact"]
+    assert sample["blocks_sampled"] < sample["blocks_total"]
+    total = sample["total"]
+    assert total.low <= 20000 <= total.high
+
+    host, estimate = sample["most_active"]
+    assert host == "host0"
+    assert estimate.low <= 4000 <= estimate.high
+    assert sample["connected_hosts"] <= find_connected_hosts(large_log_file, "host3")
+
+
+def test_time_budget_refines_until_deadline(large_log_file):
+    estimates = list(
+        iter_sample_estimates(large_log_file, "host3", time_budget=0, block_size=4096)
+    )
+
+    # At least one full block is always read, even with no time to spare
+    assert len(estimates) == 1
+    assert estimates[0]["blocks_sampled"] >= 1
+    assert estimates[0]["total"].value > 0
+
+
+def test_sample_time_range(large_log_file):
+    start = datetime.fromtimestamp(1704067200)
+    end = datetime.fromtimestamp(1704067200 + 99)
+    sample = sample_batch(large_log_file, "host3", start, end, rate=1.0)
+    assert sample["total"].value == 100
+
+
+def test_sample_rejects_invalid_rate(large_log_file):
+    with pytest.raises(ValueError):
+        sample_batch(large_log_file, "host3", rate=1.5)
+    with pytest.raises(ValueError):
+        sample_batch(large_log_file, "host3", rate=0)
+
+
+def test_sample_empty_file(tmp_path):
+    log_file = tmp_path / "empty.log"
+    log_file.write_text("")
+    sample = sample_batch(str(log_file), "host3", rate=0.5)
+    assert sample["exact"]
+    assert sample["most_active"] is None
+    assert sample["total"].value == 0
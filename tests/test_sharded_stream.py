@@ -0,0 +1,75 @@
+import os
+import time
+from unittest.mock import patch
+
+import pytest
+
+from src.processing.manifest import load_manifest
+from src.processing.sharded_stream import (
+    merge_partial,
+    new_partial,
+    process_stream_sharded,
+    shard_for,
+)
+from src.processing.spill import SpillingCounter
+
+
+@pytest.fixture
+def busy_log_dir(tmp_path):
+    """Eight recent logs, each with its own sources connecting to host0."""
+    now = int(time.time())
+    for index in range(8):
+        with open(tmp_path / f"app{index}.log", "w") as f:
+            for i in range(100):
+                f.write(f"{now - 100 + i} src{index}-{i % 5} host0\n")
+            f.write(f"{now} host0 dst{index}\n")
+    return tmp_path
+
+
+def test_shard_for_is_stable_and_spreads_files():
+    paths = [f"/var/log/app/app{index}.log" for index in range(64)]
+    shards = [shard_for(path, 4) for path in paths]
+    assert shards == [shard_for(path, 4) for path in paths]
+    assert set(shards) == {0, 1, 2, 3}
+
+
+def test_merge_partial_adds_counts():
+    partial = new_partial(0)
+    partial["connections_to"] = {"a"}
+    partial["connection_counts"] = {"a": 2, "b": 1}
+    connections_to, counts = {"c"}, {"a": 1}
+    merge_partial(partial, connections_to, set(), counts, {})
+    assert connections_to == {"a", "c"}
+    assert counts == {"a": 3, "b": 1}
+
+    with SpillingCounter(max_memory=1) as spilling:
+        merge_partial(partial, set(), set(), spilling, {})
+        merge_partial(partial, set(), set(), spilling, {})
+        assert dict(spilling.items()) == {"a": 4, "b": 2}
+
+
+def test_sharded_stream_merges_all_workers(busy_log_dir):
+    with patch("src.processing.sharded_stream.generate_report") as mock_report:
+        process_stream_sharded(
+            str(busy_log_dir), "host0", workers=3, max_iterations=2
+        )
+
+    mock_report.assert_called_once()
+    target, connections_to, connections_from, counts, backlog = (
+        mock_report.call_args.args
+    )
+    assert target == "host0"
+    assert connections_to == {f"src{i}-{j}" for i in range(8) for j in range(5)}
+    assert connections_from == {f"dst{i}" for i in range(8)}
+    assert counts["host0"] == 8
+    assert sum(counts.values()) == 808
+    assert set(backlog) == {str(busy_log_dir / f"app{i}.log") for i in range(8)}
+    assert not any(backlog.values())
+
+    # Workers only send manifest updates; the coordinator writes the manifest
+    manifest = load_manifest(str(busy_log_dir))
+    assert sorted(manifest) == [f"app{i}.log" for i in range(8)]
+    assert all(entry["line_count"] == 101 for entry in manifest.values())
+    assert not any(
+        name.endswith(".tmp") for name in os.listdir(busy_log_dir)
+    )
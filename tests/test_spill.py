@@ -0,0 +1,88 @@
+import os
+from collections import Counter
+from unittest.mock import patch
+
+import pytest
+
+from src.parser.parser import (
+    count_connections_by_host,
+    find_most_active_host,
+    iter_connections_by_host,
+)
+from src.processing import spill
+from src.processing.spill import SpillingCounter, merge_sorted_counts
+from src.processing.stream_processor import generate_report
+
+
+@pytest.fixture
+def high_cardinality_log(tmp_path):
+    log_file = tmp_path / "many-hosts.log"
+    with open(log_file, "w") as f:
+        for i in range(5000):
+            f.write(f"{1704067200 + i} host{i % 1200} host{i % 3}\n")
+        # host7 is the single most active host
+        for i in range(10):
+            f.write(f"{1704072200 + i} host7 host1\n")
+    return str(log_file)
+
+
+def test_merge_sorted_counts():
+    runs = [[("a", 1), ("c", 2)], [("a", 3), ("b", 1)], [("c", 1)]]
+    assert list(merge_sorted_counts(runs)) == [("a", 4), ("b", 1), ("c", 3)]
+
+
+def test_counter_spills_and_merges_exactly(tmp_path):
+    keys = [f"host{i % 500}" for i in range(3000)]
+    with SpillingCounter(max_memory=2000, spill_dir=str(tmp_path)) as counter:
+        for key in keys:
+            counter.add(key)
+
+        assert counter.spilled_runs > 1
+        assert dict(counter.items()) == Counter(keys)
+        assert counter.most_common()[1] == 6
+        # Reading does not consume the counter
+        assert dict(counter.items()) == Counter(keys)
+
+    # Closing removes the run files
+    assert os.listdir(tmp_path) == []
+
+
+def test_counter_multi_pass_merge(tmp_path):
+    keys = [f"host{i}" for i in range(400)] * 2
+    with patch.object(spill, "MAX_MERGE_FAN_IN", 3):
+        counter = SpillingCounter(max_memory=1000, spill_dir=str(tmp_path))
+        for key in keys:
+            counter.add(key)
+        assert counter.spilled_runs > 3
+        assert dict(counter.items()) == Counter(keys)
+        assert counter.spilled_runs <= 3
+        counter.close()
+
+
+def test_empty_counter():
+    counter = SpillingCounter(max_memory=1000)
+    assert not counter
+    assert list(counter.items()) == []
+    assert counter.most_common() is None
+
+
+def test_count_connections_with_memory_ceiling(high_cardinality_log):
+    expected = count_connections_by_host(high_cardinality_log)
+    assert count_connections_by_host(high_cardinality_log, max_memory=4096) == expected
+    streamed = list(iter_connections_by_host(high_cardinality_log, max_memory=4096))
+    assert streamed == sorted(expected.items())
+    assert find_most_active_host(high_cardinality_log, max_memory=4096) == (
+        find_most_active_host(high_cardinality_log)
+    )
+
+
+def test_generate_report_with_spilling_counter(tmp_path):
+    counter = SpillingCounter(max_memory=200, spill_dir=str(tmp_path))
+    for key in ["host1", "host2", "host2", "host3"]:
+        counter.add(key)
+
+    with patch("builtins.print") as mock_print:
+        generate_report("host1", set(), set(), counter)
+    report_text = "\n".join(str(call.args[0]) for call in mock_print.call_args_list)
+    assert "host2 (2 connections)" in report_text
+    counter.close()
@@ -0,0 +1,147 @@
+import os
+import random
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from src.parser.parser import (
+    count_connections_by_host,
+    find_connected_hosts,
+    find_connections_for_hosts,
+    find_hosts_connected_to,
+)
+from src.processing.sqlite_store import (
+    ingest_logs,
+    open_store,
+    query_connected_hosts,
+    query_connection_counts,
+    query_batch,
+    query_connections_for_hosts,
+    query_hosts_connected_to,
+)
+
+BASE = 1704067200
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    rng = random.Random(5)
+    path = tmp_path / "app.log"
+    with open(path, "w") as f:
+        for i in range(5000):
+            f.write(f"{BASE + i} host{rng.randint(1, 40)} host{rng.randint(1, 40)}\n")
+    return str(path)
+
+
+@pytest.fixture
+def store(tmp_path, log_file):
+    db_path = str(tmp_path / "store.db")
+    assert ingest_logs(db_path, [log_file]) == 5000
+    conn = open_store(db_path)
+    yield conn
+    conn.close()
+
+
+def test_store_queries_match_scans(store, log_file):
+    start = datetime.fromtimestamp(BASE + 1000)
+    end = datetime.fromtimestamp(BASE + 2500)
+    for host in ("host1", "host17"):
+        assert query_connected_hosts(store, host, start, end) == find_connected_hosts(
+            log_file, host, start, end
+        )
+        assert query_hosts_connected_to(store, host) == find_hosts_connected_to(
+            log_file, host
+        )
+    assert query_connections_for_hosts(
+        store, ["host2", "host3"], start
+    ) == find_connections_for_hosts(log_file, ["host2", "host3"], start)
+    assert query_connection_counts(store, end_time=end) == dict(
+        count_connections_by_host(log_file, end_time=end)
+    )
+
+
+def test_store_uses_host_time_indexes(store):
+    plan = store.execute(
+        "EXPLAIN QUERY PLAN SELECT DISTINCT src FROM connections "
+        "WHERE dst = ? AND ts >= ?",
+        ("host1", BASE),
+    ).fetchall()
+    assert "connections_dst_ts" in str(plan)
+    rows = store.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+    indexes = {name for (name,) in rows}
+    assert {"connections_dst_ts", "connections_src_ts"} <= indexes
+
+    plan = store.execute(
+        "EXPLAIN QUERY PLAN DELETE FROM connections WHERE file_id = ?", (1,)
+    ).fetchall()
+    assert "connections_file_id" in str(plan)
+    assert store.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_ingest_only_loads_appended_lines(tmp_path, log_file):
+    db_path = str(tmp_path / "store.db")
+    ingest_logs(db_path, [log_file])
+
+    with open(log_file, "a") as f:
+        f.write(f"{BASE + 9000} newhost host1\n{BASE + 9001} partial")
+    assert ingest_logs(db_path, [log_file]) == 1
+
+    with open(log_file, "a") as f:
+        f.write(" host1\n")
+    assert ingest_logs(db_path, [log_file]) == 1
+    assert ingest_logs(db_path, [log_file]) == 0
+
+    conn = open_store(db_path)
+    assert query_connected_hosts(
+        conn, "host1", datetime.fromtimestamp(BASE + 9000)
+    ) == {"newhost", "partial"}
+    assert conn.execute("SELECT COUNT(*) FROM connections").fetchone()[0] == 5002
+    conn.close()
+
+
+def test_batch_query_reads_unterminated_last_line(tmp_path):
+    log_file = tmp_path / "app.log"
+    log_file.write_text("1000 a b\n1001 c b\n1002 d b")
+    db_path = str(tmp_path / "store.db")
+    assert ingest_logs(db_path, [str(log_file)]) == 2
+
+    conn = open_store(db_path)
+    results = query_batch(conn, ["b", "d"], log_files=[str(log_file)])
+    assert results == find_connections_for_hosts(str(log_file), ["b", "d"])
+    assert results["b"]["inbound"] == {"a", "c", "d"}
+    end = datetime.fromtimestamp(1001)
+    assert query_batch(conn, ["b"], end_time=end, log_files=[str(log_file)]) == (
+        find_connections_for_hosts(str(log_file), ["b"], end_time=end)
+    )
+    conn.close()
+
+
+def test_ingest_reloads_replaced_file(tmp_path, log_file):
+    db_path = str(tmp_path / "store.db")
+    ingest_logs(db_path, [log_file])
+
+    os.remove(log_file)
+    with open(log_file, "w") as f:
+        f.write(f"{BASE} fresh host1\n")
+    assert ingest_logs(db_path, [log_file]) == 1
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT src, dst FROM connections").fetchall() == [
+        ("fresh", "host1")
+    ]
+    conn.close()
+
+
+def test_store_queries_filter_by_file(tmp_path, log_file):
+    other = tmp_path / "other.log"
+    other.write_text(f"{BASE} otherhost host1\n")
+    db_path = str(tmp_path / "store.db")
+    ingest_logs(db_path, [log_file, str(other)])
+
+    conn = open_store(db_path)
+    assert query_connected_hosts(conn, "host1", log_files=[str(other)]) == {
+        "otherhost"
+    }
+    assert "otherhost" not in query_connected_hosts(conn, "host1", log_files=[log_file])
+    conn.close()
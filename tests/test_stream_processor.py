@@ -9,8 +9,10 @@ from unittest.mock import patch, call, MagicMock
 
 from src.processing.stream_processor import (
     create_file_tracker,
+    monitor_directory,
     process_stream,
-    generate_report
+    generate_report,
+    read_new_lines,
 )
 
 @pytest.fixture
@@ -75,7 +77,109 @@ def test_process_stream_basic(mock_sleep, mock_logger, temp_log_dir):
     ], any_order=True)
 
 
+@patch('time.sleep')
+def test_process_stream_backfills_only_the_window(mock_sleep, tmp_path):
+    now = int(datetime.now().timestamp())
+    log_file = tmp_path / "existing.log"
+    with open(log_file, "w") as f:
+        for i in range(5000):
+            f.write(f"{now - 2 * 3600 + i // 10} old{i % 50} host1\n")
+        f.write(f"{now - 30} recent host1\n")
+
+    lines_read = []
+
+    def counting_read_new_lines(tracker, *quotas):
+        for line in read_new_lines(tracker, *quotas):
+            lines_read.append(line)
+            yield line
+
+    with patch('src.processing.stream_processor.generate_report') as mock_report, \
+            patch('src.processing.stream_processor.read_new_lines',
+                  counting_read_new_lines):
+        process_stream(str(tmp_path), "host1", max_iterations=1)
+
+    # The old records were skipped without being read
+    assert len(lines_read) == 1
+    assert mock_report.call_args.args[1] == {"recent"}
+
+
+def test_read_new_lines_quota_and_backlog(tmp_path):
+    log_file = tmp_path / "big.log"
+    log_file.write_text(
+        "".join(f"{1704067200 + i} host{i} host0\n" for i in range(100))
+    )
+    tracker = create_file_tracker(str(log_file))
+
+    first = list(read_new_lines(tracker, max_lines=30))
+    assert len(first) == 30
+    assert tracker["backlog"] == log_file.stat().st_size - tracker["last_position"]
 
+    rest = []
+    while tracker["backlog"]:
+        rest.extend(read_new_lines(tracker, max_bytes=500))
+    assert first + rest == log_file.read_text().splitlines()
 
 
+def test_read_new_lines_keeps_partial_line(tmp_path):
+    log_file = tmp_path / "growing.log"
+    log_file.write_bytes(b"1704067200 host1 host2\n1704067201 ho")
+    tracker = create_file_tracker(str(log_file))
 
+    assert list(read_new_lines(tracker)) == ["1704067200 host1 host2"]
+    assert tracker["partial"] == b"1704067201 ho"
+    assert tracker["last_position"] == log_file.stat().st_size
+
+    with open(log_file, "ab") as f:
+        f.write(b"st3 host4\n1704067202 host5 h\xc3")
+    assert list(read_new_lines(tracker)) == ["1704067201 host3 host4"]
+
+    # A multi-byte character split across reads is decoded intact
+    with open(log_file, "ab") as f:
+        f.write(b"\xa9\n")
+    assert list(read_new_lines(tracker)) == ["1704067202 host5 h\u00e9"]
+    assert tracker["partial"] == b""
+
+
+@patch('time.sleep')
+def test_process_stream_large_append_does_not_starve_other_files(mock_sleep, tmp_path):
+    now = int(datetime.now().timestamp())
+    with open(tmp_path / "busy.log", "w") as f:
+        for i in range(10000):
+            f.write(f"{now - 60} busy{i % 10} host9\n")
+    with open(tmp_path / "quiet.log", "w") as f:
+        f.write(f"{now - 30} quiet host1\n")
+
+    with patch('src.processing.stream_processor.generate_report') as mock_report:
+        process_stream(str(tmp_path), "host1", max_iterations=2, chunk_lines=1000)
+
+    args = mock_report.call_args.args
+    assert args[1] == {"quiet"}
+    # Only two chunks of the busy file were read, the rest is reported as backlog
+    assert sum(args[3].values()) == 2001
+    backlog = args[4]
+    assert backlog[str(tmp_path / "busy.log")] > 0
+    assert backlog[str(tmp_path / "quiet.log")] == 0
+    # With a backlog the loop keeps reading instead of sleeping
+    mock_sleep.assert_not_called()
+
+
+@patch('time.sleep')
+def test_monitor_directory_include_and_handle_update(mock_sleep, tmp_path):
+    now = int(datetime.now().timestamp())
+    for name in ("mine.log", "other.log"):
+        with open(tmp_path / name, "w") as f:
+            f.write(f"{now - 30} {name[:-4]} host1\n")
+
+    records, updates = [], []
+    monitor_directory(
+        str(tmp_path),
+        records.extend,
+        max_iterations=1,
+        include=lambda path: path.endswith("mine.log"),
+        handle_update=lambda path, update: updates.append((path, update)),
+    )
+
+    assert records == [(now - 30, "mine", "host1")]
+    assert [path for path, update in updates] == [str(tmp_path / "mine.log")]
+    # The caller keeps the manifest, so the loop does not write one
+    assert not os.path.exists(tmp_path / ".log-parser-manifest.json")
@@ -0,0 +1,138 @@
+import json
+import time
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+
+from src.processing.subscriptions import (
+    SubscriptionState,
+    build_dispatch,
+    dispatch_records,
+    load_subscriptions,
+    process_subscriptions,
+)
+
+NOW = 1704067200
+
+
+def write_config(tmp_path, subscriptions):
+    config_file = tmp_path / "subscriptions.json"
+    config_file.write_text(json.dumps({"subscriptions": subscriptions}))
+    return str(config_file)
+
+
+def test_load_subscriptions_defaults(tmp_path):
+    config_file = write_config(
+        tmp_path,
+        [
+            {"name": "web", "hosts": ["host1"]},
+            {
+                "name": "db",
+                "hosts": ["host2"],
+                "from_hosts": ["host9"],
+                "window": 60,
+                "interval": 5,
+            },
+        ],
+    )
+    web, db = load_subscriptions(config_file)
+    assert web == {
+        "name": "web",
+        "hosts": ["host1"],
+        "from_hosts": [],
+        "window": 3600,
+        "interval": 10,
+    }
+    assert (db["from_hosts"], db["window"], db["interval"]) == (["host9"], 60, 5)
+
+
+@pytest.mark.parametrize(
+    "subscriptions",
+    [
+        [],
+        [{"name": "web"}],
+        [{"name": "web", "hosts": []}],
+        [{"name": "web", "hosts": "host1"}],
+        [{"name": "web", "hosts": ["host1"], "interval": 0}],
+        [{"name": "web", "hosts": ["host1"]}, {"name": "web", "hosts": ["host2"]}],
+    ],
+)
+def test_load_subscriptions_rejects_invalid_config(tmp_path, subscriptions):
+    with pytest.raises(ValueError):
+        load_subscriptions(write_config(tmp_path, subscriptions))
+
+
+def subscription(name, hosts, from_hosts=(), window=3600, interval=10):
+    return {
+        "name": name,
+        "hosts": hosts,
+        "from_hosts": list(from_hosts),
+        "window": window,
+        "interval": interval,
+    }
+
+
+def test_dispatch_records_by_host_and_window():
+    short = SubscriptionState(subscription("short", ["host1"], window=60))
+    wide = SubscriptionState(subscription("wide", ["host1", "host2"], ["host7"]))
+    by_destination, by_source = build_dispatch([short, wide])
+    records = [
+        (NOW - 30, "host3", "host1"),
+        (NOW - 600, "host4", "host1"),
+        (NOW - 10, "host1", "host5"),
+        (NOW - 10, "host7", "host6"),
+        (NOW - 10, "host8", "host9"),
+    ]
+    dispatch_records(records, by_destination, by_source, now=NOW)
+
+    assert short.connections_to == {"host3"}
+    assert short.connections_from == {"host5"}
+    assert short.connection_counts == {"host3": 1}
+    assert wide.connections_to == {"host3", "host4"}
+    assert wide.connections_from == {"host5", "host6"}
+    assert wide.connection_counts == {"host3": 1, "host4": 1}
+
+
+class SteppingClock(datetime):
+    """datetime whose now() advances by one second per call."""
+
+    calls = 0
+
+    @classmethod
+    def now(cls, tz=None):
+        cls.calls += 1
+        return datetime.fromtimestamp(NOW + cls.calls, tz)
+
+
+@patch("time.sleep")
+def test_process_subscriptions_reports_each_at_its_interval(mock_sleep, tmp_path):
+    now = int(time.time())
+    with open(tmp_path / "app.log", "w") as f:
+        for i in range(50):
+            f.write(f"{now - 50 + i} host{i % 5} host0\n")
+        f.write(f"{now} host0 host9\n")
+    subscriptions = [
+        subscription("fast", ["host0"], interval=2),
+        subscription("slow", ["host9"], interval=600),
+    ]
+    reports = []
+
+    def collect(subscribed, connections_to, connections_from, counts, backlog):
+        reports.append((subscribed["name"], set(connections_to), dict(counts)))
+
+    with patch("src.processing.subscriptions.datetime", SteppingClock), patch(
+        "src.processing.stream_processor.datetime", SteppingClock
+    ):
+        process_subscriptions(
+            str(tmp_path), subscriptions, max_iterations=6, report_fn=collect
+        )
+
+    fast = [report for report in reports if report[0] == "fast"]
+    slow = [report for report in reports if report[0] == "slow"]
+    # The fast subscription reports every other iteration, the slow one only
+    # in the final report
+    assert len(fast) >= 2
+    assert fast[0][1] == {f"host{i}" for i in range(5)}
+    assert sum(fast[0][2].values()) == 50
+    assert slow == [("slow", {"host0"}, {"host0": 1})]
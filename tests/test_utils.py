@@ -1,6 +1,7 @@
 import pytest
 from datetime import datetime, timedelta
 from src.utils.utils import (
+    atomic_write,
     timestamp_to_datetime,
     is_within_last_hour,
     is_in_timerange,
@@ -98,4 +99,21 @@ def test_parse_datetime_input():
         parse_datetime_input("2024-01-32 12:34:56")  # Invalid day
 
     with pytest.raises(ValueError):
-        parse_datetime_input("2024-01-01 25:34:56")  # Invalid hour
\ No newline at end of file
+        parse_datetime_input("2024-01-01 25:34:56")  # Invalid hour
+
+
+def test_atomic_write_replaces_only_on_success(tmp_path):
+    path = tmp_path / "state.json"
+    path.write_text("old")
+
+    with pytest.raises(RuntimeError):
+        with atomic_write(str(path)) as f:
+            f.write("partial")
+            raise RuntimeError("interrupted")
+    assert path.read_text() == "old"
+    assert list(tmp_path.iterdir()) == [path]
+
+    with atomic_write(str(path)) as f:
+        f.write("new")
+    assert path.read_text() == "new"
+    assert list(tmp_path.iterdir()) == [path]